@@ -46,12 +46,15 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
+    'core.middleware.CoalescingMiddleware',
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -88,6 +91,41 @@ DATABASES = {
     }
 }
 
+# Read replicas as "host:weight,host:weight", e.g. DB_REPLICAS=replica:1
+# Pointing a replica at DB_HOST mirrors the primary for local testing.
+DATABASE_REPLICAS = {}
+for index, replica in enumerate(
+        filter(None, os.environ.get('DB_REPLICAS', '').split(',')), 1):
+    host, _, weight = replica.partition(':')
+    alias = f'replica{index}'
+    DATABASES[alias] = dict(
+        DATABASES['default'],
+        HOST=host,
+        TEST={'MIRROR': 'default'}
+    )
+    DATABASE_REPLICAS[alias] = int(weight or 1)
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+# Cache shared by the workers, e.g. CACHE_BACKEND=
+# django.core.cache.backends.db.DatabaseCache with CACHE_LOCATION=app_cache
+# after running createcachetable
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# Safe requests under these paths may be served by a replica
+REPLICA_ROUTED_PATHS = ('/api/recipe/', '/api/users/')
+
+# Seconds a client stays on the primary after a write
+REPLICA_PIN_SECONDS = int(os.environ.get('DB_REPLICA_PIN_SECONDS', 5))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
@@ -135,6 +173,97 @@ MEDIA_URL = '/media/'
 
 STATIC_ROOT = '/vol/web/static'
 MEDIA_ROOT = '/vol/web/media'
+# Identical uploads share one file, unused files are removed by gc_media
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+
+# Uploads are always streamed to disk, never held in memory
+FILE_UPLOAD_HANDLERS = ['core.uploads.BoundedTemporaryFileUploadHandler']
+MAX_UPLOAD_SIZE = int(os.environ.get('MAX_UPLOAD_SIZE', 20 * 1024 * 1024))
+# Images over this many pixels are rejected before being decoded
+MAX_IMAGE_PIXELS = 40 * 1000 * 1000
+# Larger recipe images are downscaled on upload, 0 keeps the original
+RECIPE_IMAGE_MAX_DIMENSION = 2048
 
 
 AUTH_USER_MODEL = 'core.User'
+
+# Most recipes one multi-get or shopping list request may name
+RECIPE_MULTI_GET_MAX = 100
+RECIPE_SHOPPING_LIST_MAX = 100
+
+# Idempotency-Key handling: how long responses are replayed, how long a
+# request holds its key and how long a concurrent retry waits for it
+IDEMPOTENCY_TTL = 24 * 60 * 60
+IDEMPOTENCY_LOCK_SECONDS = 60
+IDEMPOTENCY_WAIT_SECONDS = 5
+
+# Response compression, brotli is used when the brotli package is installed
+COMPRESSION_MIN_LENGTH = 200
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+COMPRESSION_BROTLI_QUALITY = int(
+    os.environ.get('COMPRESSION_BROTLI_QUALITY', 5)
+)
+
+# Change feed: objects of each kind per sync page, and how long deletions
+# are kept, clients with an older cursor have to sync from scratch
+SYNC_PAGE_SIZE = 500
+SYNC_TOMBSTONE_RETENTION = 30 * 24 * 60 * 60
+# How far the feed may lag behind a long running transaction, changes it
+# commits later than this are missed by clients that synced meanwhile
+SYNC_HORIZON_MAX_LAG = 5 * 60
+
+# Rows deleted per transaction when an account is deleted, and the most
+# recipes one bulk delete request may name
+DELETION_BATCH_SIZE = 1000
+RECIPE_BULK_DELETE_MAX = 1000
+
+# Memory the per process ingredient indexes of the cookable search may use,
+# and the most recipes one search returns
+INGREDIENT_INDEX_MAX_BYTES = 32 * 1024 * 1024
+RECIPE_COOKABLE_MAX = 100
+
+# Unfiltered admin changelists of tables estimated to hold at least this
+# many rows show the estimate instead of running an exact count
+ADMIN_ESTIMATED_COUNT_MIN = 100000
+
+# Canonical ingredient catalogue: the most names popular and search return,
+# and how many ingredients must share a name before it is listed
+INGREDIENT_CATALOGUE_MAX = 50
+INGREDIENT_CATALOGUE_MIN_ALIASES = 2
+
+# Background jobs: workers run_worker starts, how long an idle worker sleeps
+# between polls when no notification arrives, retry backoff doubling from
+# JOB_RETRY_BACKOFF seconds, how long a running job may take before it is
+# treated as left behind by a dead worker, how long finished jobs are kept
+# and the most jobs the job list returns
+JOB_WORKER_CONCURRENCY = int(os.environ.get('JOB_WORKER_CONCURRENCY', 4))
+JOB_POLL_INTERVAL = 5
+JOB_MAX_ATTEMPTS = 3
+JOB_RETRY_BACKOFF = 10
+JOB_RETRY_BACKOFF_MAX = 60 * 60
+JOB_STALE_SECONDS = 6 * 60 * 60
+JOB_MAINTENANCE_INTERVAL = 60
+JOB_RETENTION = 7 * 24 * 60 * 60
+JOB_LIST_MAX = 100
+
+# Recipe imports: rows validated and written per transaction, the most rows
+# one import request may hold, rejected rows reported and the longest line
+IMPORT_CHUNK_SIZE = 500
+IMPORT_MAX_ROWS = 100000
+IMPORT_MAX_ERRORS = 1000
+IMPORT_MAX_LINE_BYTES = 64 * 1024
+
+# Identical concurrent safe requests under these paths run once and share
+# the response, followers wait at most COALESCE_WAIT_SECONDS. With
+# COALESCE_SHARED processes coordinate through the cache, which then has to
+# be shared between them. Batches are listed so their writes count as well
+COALESCE_PATHS = ('/api/recipe/', '/api/users/', '/api/batch')
+COALESCE_WAIT_SECONDS = 10
+COALESCE_SHARED = os.environ.get('COALESCE_SHARED', '') == '1'
+COALESCE_GENERATION_TTL = 60 * 60
+
+# Batch requests: the paths sub-requests may target, the most requests one
+# batch may hold and the threads running the reads of a parallel batch
+BATCH_PATHS = ('/api/recipe/', '/api/users/')
+BATCH_MAX_REQUESTS = 20
+BATCH_MAX_WORKERS = 4
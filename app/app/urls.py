@@ -18,9 +18,12 @@ from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
 
+from core.batch import BatchView
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/users/', include('users.urls')),
     path('api/recipe/', include('recipe.urls')),
+    path('api/batch', BatchView.as_view(), name='batch'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -11,6 +11,12 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from core import preload
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
+# APP_PRELOAD=1 warms the application when this module is imported, for
+# servers importing it once before forking workers, like gunicorn --preload
+preload.begin()
 application = get_wsgi_application()
+preload.complete()
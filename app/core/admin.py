@@ -1,8 +1,13 @@
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
 from django.utils.translation import gettext as _
 
 from core import models
+from core.canonical import normalize_name
 
 
 class UserAdmin(BaseUserAdmin):
@@ -25,7 +30,84 @@ class UserAdmin(BaseUserAdmin):
     )
 
 
+def estimated_count(model):
+    """Returns the planner's estimate of the rows in the model's table"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [connection.ops.quote_name(model._meta.db_table)]
+        )
+        row = cursor.fetchone()
+    return row[0] if row else -1
+
+
+class EstimatedCountPaginator(Paginator):
+    """Counts large unfiltered changelists from the table statistics
+    instead of a COUNT(*) scanning the whole table"""
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            estimate = estimated_count(self.object_list.model)
+            if estimate >= settings.ADMIN_ESTIMATED_COUNT_MIN:
+                return estimate
+        return super().count
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """Changelists and forms that stay fast on tables with millions of
+    rows, searches go through the UPPER(...) pattern indexes"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+
+
+class NameAdmin(ScalableAdmin):
+    list_display = ('name', 'user')
+    search_fields = ('^name',)
+
+
+class IngredientAdmin(NameAdmin):
+    # linked on save by core.signals
+    readonly_fields = ('canonical',)
+
+
+class CanonicalIngredientAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_display = ('name', 'alias_count')
+    search_fields = ('^name',)
+    readonly_fields = ('alias_count',)
+
+    def get_search_results(self, request, queryset, search_term):
+        """Names are stored normalized, so the prefix search is served by
+        the name pattern index without UPPER()"""
+        if not search_term:
+            return queryset, False
+        return queryset.filter(
+            name__startswith=normalize_name(search_term)
+        ), False
+
+
+class RecipeAdmin(ScalableAdmin):
+    list_display = ('title', 'user', 'time_minutes', 'price')
+    search_fields = ('^title',)
+    autocomplete_fields = ('tags', 'ingredient')
+
+
+class JobAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_display = ('task', 'status', 'priority', 'attempts', 'run_at',
+                    'created_at')
+    list_filter = ('status',)
+    raw_id_fields = ('user',)
+
+
 admin.site.register(models.User, UserAdmin)
-admin.site.register(models.Tag)
-admin.site.register(models.Ingredient)
-admin.site.register(models.Recipe)
+admin.site.register(models.Tag, NameAdmin)
+admin.site.register(models.Ingredient, IngredientAdmin)
+admin.site.register(models.Recipe, RecipeAdmin)
+admin.site.register(models.CanonicalIngredient, CanonicalIngredientAdmin)
+admin.site.register(models.Job, JobAdmin)
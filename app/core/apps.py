@@ -3,3 +3,15 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from PIL import Image
+        from django.conf import settings
+        from django.utils.module_loading import autodiscover_modules
+        from core import signals  # noqa: F401
+
+        # registers the background job tasks of every app
+        autodiscover_modules('tasks')
+
+        # Pillow's decompression bomb guard as a backstop for any decode
+        Image.MAX_IMAGE_PIXELS = settings.MAX_IMAGE_PIXELS
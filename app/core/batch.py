@@ -0,0 +1,237 @@
+import contextvars
+import io
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote_to_bytes, urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections, transaction
+from django.urls import Resolver404, resolve
+from rest_framework import authentication, permissions, serializers, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.idempotency import idempotent
+
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+# headers of the batch request every sub-request carries as well
+INHERITED_HEADERS = (
+    'HTTP_AUTHORIZATION', 'HTTP_COOKIE', 'HTTP_HOST',
+    'HTTP_ACCEPT_LANGUAGE', 'HTTP_USER_AGENT',
+)
+
+
+class SubRequestSerializer(serializers.Serializer):
+    """Serializer for one request of a batch"""
+    method = serializers.ChoiceField(
+        choices=('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE'),
+        default='GET'
+    )
+    path = serializers.CharField(max_length=2048)
+    body = serializers.JSONField(required=False)
+    headers = serializers.DictField(
+        child=serializers.CharField(), required=False
+    )
+
+    def validate_path(self, value):
+        parts = urlsplit(value)
+        if parts.scheme or parts.netloc or \
+                not parts.path.startswith(settings.BATCH_PATHS):
+            raise serializers.ValidationError(
+                'Only paths under {} can be batched.'.format(
+                    ', '.join(settings.BATCH_PATHS)
+                )
+            )
+        return value
+
+
+class BatchSerializer(serializers.Serializer):
+    """Serializer for a batch of requests"""
+    requests = SubRequestSerializer(many=True, allow_empty=False)
+    atomic = serializers.BooleanField(default=False)
+    parallel = serializers.BooleanField(default=False)
+
+    def validate_requests(self, value):
+        if len(value) > settings.BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(
+                f'At most {settings.BATCH_MAX_REQUESTS} requests '
+                f'can be batched.'
+            )
+        return value
+
+    def validate(self, attrs):
+        # a key would store the response of a write the batch may roll back
+        if attrs['atomic'] and any(
+            name.lower() == 'idempotency-key'
+            for item in attrs['requests']
+            for name in item.get('headers', {})
+        ):
+            raise serializers.ValidationError({
+                'requests': 'Requests of an atomic batch cannot carry an '
+                            'Idempotency-Key, send one for the batch.'
+            })
+        return attrs
+
+
+def build_request(request, item):
+    """Returns the Django request of a batch item, authenticated as the
+    user of the batch request without running authentication again"""
+    parts = urlsplit(item['path'])
+    environ = {
+        key: value for key, value in request.META.items()
+        if not key.startswith(('HTTP_', 'CONTENT_'))
+    }
+    environ.update(
+        (key, request.META[key])
+        for key in INHERITED_HEADERS if key in request.META
+    )
+    for name, value in item.get('headers', {}).items():
+        key = 'HTTP_' + name.upper().replace('-', '_')
+        if key not in INHERITED_HEADERS:
+            environ[key] = value
+
+    body = b''
+    if 'body' in item:
+        body = json.dumps(item['body']).encode()
+        environ['CONTENT_TYPE'] = 'application/json'
+    environ.update({
+        'REQUEST_METHOD': item['method'],
+        'PATH_INFO': unquote_to_bytes(parts.path).decode('iso-8859-1'),
+        'QUERY_STRING': parts.query,
+        'CONTENT_LENGTH': str(len(body)),
+        'HTTP_ACCEPT': 'application/json',
+        'wsgi.input': io.BytesIO(body),
+    })
+
+    sub_request = WSGIRequest(environ)
+    sub_request._force_auth_user = request.user
+    sub_request._force_auth_token = request.auth
+    return sub_request
+
+
+def _response_body(response, method):
+    if method == 'HEAD':
+        return None
+    if isinstance(response, Response):
+        # rendered once, as part of the batch response
+        return response.data
+    if response.streaming:
+        content = b''.join(response.streaming_content)
+    else:
+        content = response.content
+    return content.decode(response.charset, errors='replace')
+
+
+def _response_headers(response):
+    headers = dict(response.items())
+    renderer = getattr(response, 'accepted_renderer', None)
+    if isinstance(response, Response) and renderer is not None and \
+            not response.is_rendered:
+        # not rendered, so the header is still Django's text/html default
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += f'; charset={renderer.charset}'
+        headers['Content-Type'] = content_type
+    return headers
+
+
+def run_request(request, item):
+    """Runs a batch item through the view its path resolves to and returns
+    its status, headers and body"""
+    sub_request = build_request(request, item)
+    try:
+        match = resolve(sub_request.path_info)
+    except Resolver404:
+        return {
+            'status': status.HTTP_404_NOT_FOUND,
+            'headers': {},
+            'body': {'detail': 'Not found.'},
+        }
+    sub_request.resolver_match = match
+
+    try:
+        response = match.func(sub_request, *match.args, **match.kwargs)
+    except Exception:
+        logger.exception('Batched %s %s failed',
+                         item['method'], item['path'])
+        return {
+            'status': status.HTTP_500_INTERNAL_SERVER_ERROR,
+            'headers': {},
+            'body': {'detail': 'Server error.'},
+        }
+    return {
+        'status': response.status_code,
+        'headers': _response_headers(response),
+        'body': _response_body(response, item['method']),
+    }
+
+
+def _run_in_thread(request, item):
+    try:
+        return run_request(request, item)
+    finally:
+        connections.close_all()
+
+
+def run_parallel(request, items):
+    """Runs read only batch items on a thread pool, each thread uses
+    connections of its own"""
+    workers = min(settings.BATCH_MAX_WORKERS, len(items))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            # the read alias the request was routed to is a context var
+            executor.submit(
+                contextvars.copy_context().run,
+                _run_in_thread, request, item
+            )
+            for item in items
+        ]
+        return [future.result() for future in futures]
+
+
+def run_atomic(request, items):
+    """Runs batch items in one transaction, stopping at the first failed
+    one and rolling back the others. Returns the results and whether the
+    batch was rolled back."""
+    results = []
+    with transaction.atomic():
+        for item in items:
+            result = run_request(request, item)
+            results.append(result)
+            if result['status'] >= 400:
+                transaction.set_rollback(True)
+                return results, True
+    return results, False
+
+
+class BatchView(APIView):
+    """Run many API requests of the authenticated user in one call"""
+    authentication_classes = (authentication.TokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+
+    @idempotent
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data['requests']
+
+        if serializer.validated_data['atomic']:
+            results, rolled_back = run_atomic(request, items)
+            if rolled_back:
+                return Response(
+                    {'responses': results, 'rolled_back': True},
+                    status=results[-1]['status']
+                )
+        elif serializer.validated_data['parallel'] and len(items) > 1 and \
+                all(item['method'] in SAFE_METHODS for item in items):
+            results = run_parallel(request, items)
+        else:
+            results = [run_request(request, item) for item in items]
+
+        return Response({'responses': results}, status=status.HTTP_200_OK)
@@ -0,0 +1,44 @@
+from django.db import connection
+
+from core.models import CanonicalIngredient
+
+
+def normalize_name(name):
+    """Returns the catalogue form of an ingredient name"""
+    return ' '.join(name.split()).casefold()
+
+
+def canonical_ids(names):
+    """Returns the ids of the canonical ingredients of the names, in their
+    order, creating the missing ones in a single statement"""
+    normalized = [normalize_name(name) for name in names]
+    wanted = list(dict.fromkeys(normalized))
+    if not wanted:
+        return []
+
+    sql = """
+        WITH wanted AS (SELECT unnest(%s::varchar[]) AS name),
+        inserted AS (
+          INSERT INTO {table} (name, alias_count)
+          SELECT name, 0 FROM wanted
+          ON CONFLICT (name) DO NOTHING
+          RETURNING id, name
+        )
+        SELECT id, name FROM inserted
+        UNION ALL
+        SELECT c.id, c.name FROM {table} c JOIN wanted USING (name)
+    """.format(table=connection.ops.quote_name(
+        CanonicalIngredient._meta.db_table
+    ))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [wanted])
+        found = {name: pk for pk, name in cursor.fetchall()}
+    # names committed by another transaction after the statement started
+    raced = [name for name in wanted if name not in found]
+    if raced:
+        found.update(
+            CanonicalIngredient.objects.filter(name__in=raced)
+                                       .values_list('name', 'id')
+        )
+
+    return [found[name] for name in normalized]
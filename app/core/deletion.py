@@ -0,0 +1,142 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+
+from core.ingredient_index import invalidate_ingredient_index
+from core.jobs import enqueue
+from core.models import Tag, Ingredient, Recipe, Tombstone, \
+                        UserRecipeStats, UserTagStats
+from core.relations import ID_ARRAY_FIELDS, m2m_tables, relations_changed
+from core.stats import adjust_recipe_stats
+
+
+def _delete_links(cursor, relation, column, ids):
+    """Deletes the through rows of a relation whose column is in ids"""
+    tables = m2m_tables(relation)
+    cursor.execute(
+        'DELETE FROM {through} WHERE {column} = ANY(%s)'.format(
+            through=tables['through'],
+            column=tables[column]
+        ),
+        [ids]
+    )
+
+
+def delete_recipes(user_id, recipe_ids, update_related=True):
+    """Deletes the user's recipes with set based statements instead of
+    Django's collector, through rows first, and returns the deleted ids.
+    With update_related the stats and the change feed follow, as the
+    signals of a single delete would do."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        recipe_ids = list(
+            Recipe.objects.select_for_update()
+                          .filter(user_id=user_id, id__in=recipe_ids)
+                          .values_list('id', flat=True)
+        )
+        if not recipe_ids:
+            return []
+        for relation in ID_ARRAY_FIELDS:
+            _delete_links(cursor, relation, 'recipe_col', recipe_ids)
+        cursor.execute(
+            """
+            DELETE FROM {recipe} WHERE id = ANY(%s)
+            RETURNING id, time_minutes, price, tag_ids, ingredient_ids
+            """.format(recipe=connection.ops.quote_name(
+                Recipe._meta.db_table
+            )),
+            [recipe_ids]
+        )
+        rows = cursor.fetchall()
+        if update_related:
+            adjust_recipe_stats(
+                user_id,
+                -len(rows),
+                -sum(row[1] for row in rows),
+                -sum(row[2] for row in rows)
+            )
+            for index, relation in enumerate(ID_ARRAY_FIELDS, start=3):
+                relations_changed.send(
+                    sender=Recipe,
+                    relation=relation,
+                    changes=[
+                        (row[0], user_id, row[index], [])
+                        for row in rows if row[index]
+                    ]
+                )
+            invalidate_ingredient_index([user_id])
+            Tombstone.objects.bulk_create(
+                Tombstone(user_id=user_id, kind=Tombstone.RECIPE,
+                          object_id=row[0])
+                for row in rows
+            )
+        # images are left to gc_media, other recipes may share the file
+        return [row[0] for row in rows]
+
+
+def _delete_named(model, ids):
+    """Deletes tags or ingredients along with their links and stats"""
+    relation = 'tags' if model is Tag else 'ingredient'
+    with transaction.atomic(), connection.cursor() as cursor:
+        _delete_links(cursor, relation, 'target_col', ids)
+        if model is Tag:
+            UserTagStats.objects.filter(tag_id__in=ids).delete()
+        cursor.execute(
+            'DELETE FROM {table} WHERE id = ANY(%s)'.format(
+                table=connection.ops.quote_name(model._meta.db_table)
+            ),
+            [ids]
+        )
+        return cursor.rowcount
+
+
+def _batches(model, user_id, batch_size):
+    """Yields the ids of the user's objects a batch at a time"""
+    while True:
+        ids = list(
+            model.objects.filter(user_id=user_id)
+                         .order_by('id')
+                         .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return
+        yield ids
+
+
+def delete_account(user_id, on_deleted=None, batch_size=None):
+    """Deletes everything of the user in bounded transactions, then the
+    user, calling on_deleted with the number of objects of each batch"""
+    batch_size = batch_size or settings.DELETION_BATCH_SIZE
+    steps = (
+        (Recipe, lambda ids: len(delete_recipes(user_id, ids, False))),
+        (Tag, lambda ids: _delete_named(Tag, ids)),
+        (Ingredient, lambda ids: _delete_named(Ingredient, ids)),
+    )
+    for model, delete in steps:
+        for ids in _batches(model, user_id, batch_size):
+            deleted = delete(ids)
+            if on_deleted is not None:
+                on_deleted(deleted)
+
+    UserRecipeStats.objects.filter(user_id=user_id).delete()
+    user = get_user_model().objects.filter(pk=user_id).first()
+    if user is not None:
+        user.delete()
+
+
+def request_account_deletion(user):
+    """Deactivates the user at once and queues the deletion of the account,
+    which workers start once the transaction commits. Returns the job, the
+    one already queued if the deletion was requested before."""
+    with transaction.atomic():
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+        total = sum(
+            model.objects.filter(user=user).count()
+            for model in (Recipe, Tag, Ingredient)
+        )
+        return enqueue(
+            'delete_account',
+            {'user_id': user.pk, 'total': total},
+            user=user,
+            dedup_key=f'delete_account:{user.pk}'
+        )
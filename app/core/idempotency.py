@@ -0,0 +1,93 @@
+import functools
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import UploadedFile
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+
+def _value_fingerprint(value):
+    if isinstance(value, UploadedFile):
+        return [value.name, value.size, value.content_type]
+    return value
+
+
+def request_fingerprint(request):
+    """Returns a digest of the request data, files by name and size"""
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = {
+            key: [_value_fingerprint(value) for value in values]
+            for key, values in data.lists()
+        }
+    body = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def _wait_for_response(cache_key, lock_key):
+    """Waits for a concurrent request with the same key to finish"""
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        stored = cache.get(cache_key)
+        if stored is not None or cache.get(lock_key) is None:
+            return stored
+        time.sleep(0.05)
+    return None
+
+
+def idempotent(view_method):
+    """Stores the response of a request sent with an Idempotency-Key header
+    and replays it to retries with the same key, without running the view
+    again. A retry arriving while the first request runs waits for it."""
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.META.get('HTTP_IDEMPOTENCY_KEY')
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > 255:
+            raise ValidationError({'Idempotency-Key': 'Key is too long.'})
+
+        scope = f'{request.user.pk}:{request.method}:{request.path}:{key}'
+        cache_key = 'idempotency:' + hashlib.sha256(scope.encode()).hexdigest()
+        lock_key = cache_key + ':lock'
+        fingerprint = request_fingerprint(request)
+
+        stored = cache.get(cache_key)
+        if stored is None:
+            if cache.add(lock_key, 1, settings.IDEMPOTENCY_LOCK_SECONDS):
+                try:
+                    response = view_method(self, request, *args, **kwargs)
+                    if response.status_code < 500:
+                        cache.set(cache_key, {
+                            'fingerprint': fingerprint,
+                            'status': response.status_code,
+                            'data': response.data,
+                        }, settings.IDEMPOTENCY_TTL)
+                    return response
+                finally:
+                    cache.delete(lock_key)
+
+            stored = _wait_for_response(cache_key, lock_key)
+            if stored is None:
+                return Response(
+                    {'detail': 'A request with this Idempotency-Key '
+                               'is in progress.'},
+                    status=status.HTTP_409_CONFLICT
+                )
+
+        if stored['fingerprint'] != fingerprint:
+            return Response(
+                {'detail': 'Idempotency-Key was used for another request.'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        response = Response(stored['data'], status=stored['status'])
+        response['Idempotent-Replayed'] = 'true'
+        return response
+
+    return wrapper
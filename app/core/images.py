@@ -0,0 +1,68 @@
+import io
+import warnings
+
+from PIL import Image
+from django.conf import settings
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from rest_framework.exceptions import ValidationError
+
+
+ALLOWED_FORMATS = ('JPEG', 'PNG', 'WEBP', 'GIF')
+
+
+def read_image_header(upload):
+    """Opens an upload lazily, only its header is parsed, and checks the
+    format and pixel count before anything is decoded"""
+    upload.seek(0)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', Image.DecompressionBombWarning)
+            image = Image.open(upload)
+    except (Image.DecompressionBombWarning, Image.DecompressionBombError):
+        raise ValidationError('Image has too many pixels.')
+    except Exception:
+        raise ValidationError('Upload a valid image.')
+
+    if image.format not in ALLOWED_FORMATS:
+        raise ValidationError(f'Unsupported image format {image.format}.')
+    width, height = image.size
+    if width * height > settings.MAX_IMAGE_PIXELS:
+        raise ValidationError('Image has too many pixels.')
+    return image
+
+
+def downscale_image(upload, image):
+    """Re-encodes images larger than RECIPE_IMAGE_MAX_DIMENSION, JPEGs are
+    decoded at a reduced scale to save memory. The result is bounded by the
+    maximum dimension so it is kept in memory."""
+    max_dimension = settings.RECIPE_IMAGE_MAX_DIMENSION
+    if not max_dimension or max(image.size) <= max_dimension:
+        upload.seek(0)
+        return upload
+
+    image_format = image.format
+    image.draft('RGB', (max_dimension, max_dimension))
+    image.thumbnail((max_dimension, max_dimension))
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, quality=85)
+    buffer.seek(0)
+    upload.close()
+    return InMemoryUploadedFile(
+        buffer,
+        None,
+        upload.name,
+        upload.content_type,
+        buffer.getbuffer().nbytes,
+        None
+    )
+
+
+def prepare_image(upload):
+    """Validates an uploaded image with bounded memory and downscales it"""
+    if upload.size > settings.MAX_UPLOAD_SIZE:
+        raise ValidationError('Image file is too large.')
+    image = read_image_header(upload)
+    return downscale_image(upload, image)
@@ -0,0 +1,148 @@
+import heapq
+import sys
+import threading
+import uuid
+from array import array
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.models import Recipe
+
+
+def _version_key(user_id):
+    return f'ingredient-index:{user_id}'
+
+
+def _popcount(mask):
+    return bin(mask).count('1')
+
+
+class IngredientIndex:
+    """Ingredients of every recipe of a user as one bitmap per recipe,
+    with a bit per distinct ingredient of the user"""
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.bits = {}
+        recipe_ids = []
+        self.masks = []
+        for recipe_id, ingredient_ids in rows:
+            mask = 0
+            for ingredient_id in ingredient_ids:
+                mask |= 1 << self.bits.setdefault(ingredient_id,
+                                                  len(self.bits))
+            recipe_ids.append(recipe_id)
+            self.masks.append(mask)
+        self.recipe_ids = array('q', recipe_ids)
+        self.ingredient_ids = sorted(self.bits, key=self.bits.get)
+        self.size = (
+            self.recipe_ids.buffer_info()[1] * self.recipe_ids.itemsize +
+            sum(sys.getsizeof(mask) for mask in self.masks) +
+            sys.getsizeof(self.bits) * 2
+        )
+
+    def _ids_of(self, mask):
+        ids = []
+        while mask:
+            low = mask & -mask
+            ids.append(self.ingredient_ids[low.bit_length() - 1])
+            mask ^= low
+        return ids
+
+    def cookable(self, ingredient_ids, max_missing=0, limit=None):
+        """Returns (recipe id, missing ingredient ids) of the recipes lacking
+        at most max_missing ingredients, fewest missing and newest first"""
+        have = 0
+        for ingredient_id in ingredient_ids:
+            if ingredient_id in self.bits:
+                have |= 1 << self.bits[ingredient_id]
+
+        matches = []
+        for recipe_id, mask in zip(self.recipe_ids, self.masks):
+            missing = mask & ~have
+            if not missing:
+                matches.append((0, -recipe_id, missing))
+            elif max_missing:
+                count = _popcount(missing)
+                if count <= max_missing:
+                    matches.append((count, -recipe_id, missing))
+
+        ranked = heapq.nsmallest(limit, matches) if limit else sorted(matches)
+        return [
+            (-negative_id, self._ids_of(missing))
+            for count, negative_id, missing in ranked
+        ]
+
+
+class IngredientIndexCache:
+    """Per process LRU of ingredient indexes, bounded by their size. Entries
+    are checked against a version in the shared cache that writes replace,
+    so every process sees an invalidation."""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def _current_version(self, user_id):
+        version = cache.get(_version_key(user_id))
+        if version is None:
+            cache.add(_version_key(user_id), uuid.uuid4().hex, None)
+            version = cache.get(_version_key(user_id))
+        return version
+
+    def get(self, user_id):
+        version = self._current_version(user_id)
+        with self._lock:
+            index = self._entries.get(user_id)
+            if index is not None and index.version == version:
+                self._entries.move_to_end(user_id)
+                return index
+
+        # the version is read first, a write committing meanwhile replaces
+        # it and this index is rebuilt on the next request
+        index = IngredientIndex(
+            version,
+            Recipe.objects.filter(user_id=user_id)
+                          .values_list('id', 'ingredient_ids')
+                          .iterator()
+        )
+        self._store(user_id, index)
+        return index
+
+    def _store(self, user_id, index):
+        with self._lock:
+            old = self._entries.pop(user_id, None)
+            if old is not None:
+                self._size -= old.size
+            if index.size > settings.INGREDIENT_INDEX_MAX_BYTES:
+                return
+            self._entries[user_id] = index
+            self._size += index.size
+            while self._size > settings.INGREDIENT_INDEX_MAX_BYTES:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted.size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+index_cache = IngredientIndexCache()
+
+
+def invalidate_ingredient_index(user_ids):
+    """Replaces the index version of the users, now for this transaction
+    and again after it commits for indexes built from the old data"""
+    def replace():
+        cache.set_many(
+            {_version_key(user_id): uuid.uuid4().hex for user_id in user_ids},
+            None
+        )
+    user_ids = set(user_ids)
+    replace()
+    transaction.on_commit(replace)
@@ -0,0 +1,259 @@
+import contextvars
+import json
+import logging
+import os
+import random
+import select
+import signal
+import socket
+import time
+import traceback
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import Job
+
+
+logger = logging.getLogger(__name__)
+
+# channel a committed enqueue notifies, waking idle workers at once
+CHANNEL = 'core_job'
+
+Task = namedtuple('Task', ['func', 'max_attempts'])
+
+TASKS = {}
+
+# the job run_job is running in this thread
+_current_job = contextvars.ContextVar('current_job', default=None)
+
+
+def task(name, max_attempts=None):
+    """Registers the function as the task run for jobs of the given name,
+    its keyword arguments come from the job payload"""
+    def register(func):
+        TASKS[name] = Task(func, max_attempts or settings.JOB_MAX_ATTEMPTS)
+        return func
+    return register
+
+
+def enqueue(name, payload=None, user=None, priority=0, dedup_key=None,
+            delay=0, max_attempts=None):
+    """Queues a job in the current transaction, workers see it once that
+    commits. Returns the queued or running job with the same dedup key
+    instead of queueing another one."""
+    fields = {
+        'task': name,
+        'payload': payload or {},
+        'user': user,
+        'priority': priority,
+        'dedup_key': dedup_key,
+        'run_at': timezone.now() + timedelta(seconds=delay),
+        'max_attempts': max_attempts or TASKS[name].max_attempts,
+    }
+    while True:
+        try:
+            with transaction.atomic():
+                job = Job.objects.create(**fields)
+                with connection.cursor() as cursor:
+                    cursor.execute(f'NOTIFY {CHANNEL}')
+                return job
+        except IntegrityError:
+            if dedup_key is None:
+                raise
+        # the active job may finish in between, then queue again
+        job = Job.objects.filter(
+            dedup_key=dedup_key,
+            status__in=Job.ACTIVE_STATUSES
+        ).first()
+        if job is not None:
+            return job
+
+
+def claim_job(worker):
+    """Marks the next due job running for the worker and returns it, jobs
+    locked by other workers are skipped instead of waited for"""
+    jobs = Job.objects.raw(
+        """
+        UPDATE core_job SET status = %s, attempts = attempts + 1,
+          locked_at = statement_timestamp(), locked_by = %s
+        WHERE id = (
+          SELECT id FROM core_job
+          WHERE status = %s AND run_at <= statement_timestamp()
+          ORDER BY priority DESC, run_at
+          LIMIT 1 FOR UPDATE SKIP LOCKED
+        )
+        RETURNING *
+        """,
+        [Job.RUNNING, worker, Job.QUEUED]
+    )
+    return next(iter(jobs), None)
+
+
+def current_job():
+    """Returns the job whose task is running, None outside of a task"""
+    return _current_job.get()
+
+
+def report_progress(**progress):
+    """Records the progress of the running task as the job's result, kept
+    across failed attempts and replaced by what the task returns"""
+    job = current_job()
+    if job is None:
+        return
+    Job.objects.filter(pk=job.pk).update(result=progress)
+    job.result = progress
+
+
+def retry_delay(attempts):
+    """Returns the jittered exponential backoff after a failed attempt"""
+    delay = min(
+        settings.JOB_RETRY_BACKOFF * 2 ** (attempts - 1),
+        settings.JOB_RETRY_BACKOFF_MAX
+    )
+    return delay * random.uniform(0.5, 1)
+
+
+def run_job(job):
+    """Runs a claimed job and records its result, a failed attempt is
+    queued again after a backoff until the job runs out of attempts"""
+    token = _current_job.set(job)
+    try:
+        result = TASKS[job.task].func(**job.payload)
+    except Exception:
+        logger.exception('Job %s (%s) failed', job.pk, job.task)
+        now = timezone.now()
+        if job.attempts < job.max_attempts and job.task in TASKS:
+            changes = {
+                'status': Job.QUEUED,
+                'run_at': now + timedelta(seconds=retry_delay(job.attempts)),
+            }
+        else:
+            changes = {'status': Job.FAILED, 'finished_at': now}
+        Job.objects.filter(pk=job.pk).update(
+            error=traceback.format_exc(),
+            locked_at=None,
+            locked_by='',
+            **changes
+        )
+    else:
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.DONE,
+            result=json.loads(json.dumps(result, default=str)),
+            error='',
+            locked_at=None,
+            locked_by='',
+            finished_at=timezone.now()
+        )
+    finally:
+        _current_job.reset(token)
+    job.refresh_from_db()
+    return job
+
+
+def requeue_stale_jobs():
+    """Queues again the jobs of workers that died while running them,
+    failing those without attempts left"""
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        locked_at__lt=now - timedelta(seconds=settings.JOB_STALE_SECONDS)
+    )
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED,
+        error='The worker stopped while running the job.',
+        locked_at=None,
+        finished_at=now
+    )
+    requeued = stale.update(status=Job.QUEUED, locked_at=None, locked_by='')
+    return requeued, failed
+
+
+def prune_jobs():
+    """Deletes a batch of jobs finished longer than JOB_RETENTION ago"""
+    expired = Job.objects.filter(
+        status__in=[Job.DONE, Job.FAILED],
+        finished_at__lt=timezone.now() - timedelta(
+            seconds=settings.JOB_RETENTION
+        )
+    ).values('pk')[:1000]
+    return Job.objects.filter(pk__in=expired).delete()[0]
+
+
+class Worker:
+    """Claims and runs jobs one at a time until stopped"""
+
+    def __init__(self, name=None, poll_interval=None):
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self.poll_interval = poll_interval or settings.JOB_POLL_INTERVAL
+        # the connection LISTEN was issued on
+        self.listening = None
+        self.maintained_at = None
+
+    def run_once(self):
+        """Runs the next due job, returns it or None when none is due"""
+        job = claim_job(self.name)
+        if job is not None:
+            run_job(job)
+        return job
+
+    def wait(self, stop):
+        """Waits for a notification of a new job or the poll interval,
+        checking every second whether the worker should stop"""
+        connection.ensure_connection()
+        pg_connection = connection.connection
+        if self.listening is not pg_connection:
+            with connection.cursor() as cursor:
+                cursor.execute(f'LISTEN {CHANNEL}')
+            self.listening = pg_connection
+        deadline = time.monotonic() + self.poll_interval
+        while not stop.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if select.select([pg_connection], [], [], min(remaining, 1))[0]:
+                pg_connection.poll()
+                pg_connection.notifies.clear()
+                return
+
+    def maintain(self):
+        """Requeues the jobs of dead workers and prunes old jobs, at most
+        once per JOB_MAINTENANCE_INTERVAL"""
+        now = time.monotonic()
+        if self.maintained_at is not None and \
+                now - self.maintained_at < settings.JOB_MAINTENANCE_INTERVAL:
+            return
+        self.maintained_at = now
+        requeued, failed = requeue_stale_jobs()
+        if requeued or failed:
+            logger.warning('%s stale jobs requeued, %s failed',
+                           requeued, failed)
+        prune_jobs()
+
+    def run(self, stop, burst=False):
+        """Runs jobs until stop is set, or the queue is empty with burst"""
+        while not stop.is_set():
+            self.maintain()
+            if self.run_once() is None:
+                if burst:
+                    break
+                self.wait(stop)
+
+
+def run_worker_thread(name, poll_interval, stop, burst):
+    """Entry point of a worker thread, which has a connection of its own"""
+    try:
+        Worker(name, poll_interval).run(stop, burst)
+    finally:
+        connection.close()
+
+
+def run_worker_process(name, poll_interval, stop, burst):
+    """Entry point of a worker process, the parent handles the signals"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    run_worker_thread(name, poll_interval, stop, burst)
@@ -0,0 +1,87 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core.canonical import canonical_ids
+from core.models import CanonicalIngredient, Ingredient
+
+
+class Command(BaseCommand):
+    """command to link ingredients to the canonical catalogue and recount
+    how many ingredients share each canonical name"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--relink', action='store_true',
+            help='Link every ingredient again, not only unlinked ones'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def _link(self, ingredients):
+        """Links a batch of (id, name) ingredients in one UPDATE"""
+        ids, names = zip(*ingredients)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE core_ingredient i SET canonical_id = l.canonical_id
+                FROM unnest(%s::integer[], %s::integer[])
+                  AS l(id, canonical_id)
+                WHERE i.id = l.id
+                  AND i.canonical_id IS DISTINCT FROM l.canonical_id
+                """,
+                [list(ids), canonical_ids(names)]
+            )
+            return cursor.rowcount
+
+    def _recount(self, ids):
+        """Recounts the aliases of a batch of canonical ingredients"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE core_canonicalingredient c SET alias_count = n.count
+                FROM (
+                  SELECT c.id, (
+                    SELECT COUNT(*) FROM core_ingredient
+                    WHERE canonical_id = c.id
+                  ) AS count
+                  FROM core_canonicalingredient c WHERE c.id = ANY(%s)
+                ) n
+                WHERE c.id = n.id AND c.alias_count <> n.count
+                """,
+                [ids]
+            )
+            return cursor.rowcount
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ingredients = Ingredient.objects.order_by('id')
+        if not options['relink']:
+            ingredients = ingredients.filter(canonical__isnull=True)
+
+        linked = 0
+        last_id = 0
+        while True:
+            batch = list(
+                ingredients.filter(id__gt=last_id)
+                           .values_list('id', 'name')[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1][0]
+            linked += self._link(batch)
+
+        recounted = 0
+        last_id = 0
+        canonicals = CanonicalIngredient.objects.order_by('id')
+        while True:
+            ids = list(
+                canonicals.filter(id__gt=last_id)
+                          .values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            recounted += self._recount(ids)
+
+        self.stdout.write(f'{linked} ingredients linked')
+        self.stdout.write(f'{recounted} alias counts updated')
+        self.stdout.write(self.style.SUCCESS('Ingredients canonicalized'))
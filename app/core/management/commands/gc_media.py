@@ -0,0 +1,84 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+
+
+class Command(BaseCommand):
+    """command to delete recipe images no recipe refers to anymore"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-seconds', type=int, default=3600,
+            help='Keep files touched this recently, they may belong to an '
+                 'upload that is still in flight'
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def _walk(self, path):
+        """Yields every file below path without listing it all at once"""
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    yield from self._walk(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry
+
+    def _is_recent(self, path):
+        return os.stat(path).st_mtime > self.cutoff
+
+    def _collect(self, storage, name):
+        """Moves the blob aside before checking it was not reused
+        meanwhile, an upload arriving after the move stores a new copy"""
+        path = storage.path(name)
+        trash = path + '.gc'
+        try:
+            os.rename(path, trash)
+        except FileNotFoundError:
+            return False
+        if (self._is_recent(trash) or
+                Recipe.objects.filter(image=name).exists()):
+            os.replace(trash, path)
+            return False
+        os.remove(trash)
+        return True
+
+    def _collect_batch(self, storage, batch, dry_run):
+        referenced = set(
+            Recipe.objects.filter(image__in=[name for name, _ in batch])
+                          .values_list('image', flat=True)
+        )
+        deleted = 0
+        for name, mtime in batch:
+            if name in referenced or mtime > self.cutoff:
+                continue
+            if dry_run:
+                deleted += 1
+            elif self._collect(storage, name):
+                deleted += 1
+        return deleted
+
+    def handle(self, *args, **options):
+        storage = Recipe._meta.get_field('image').storage
+        root = storage.path('uploads/recipe')
+        self.cutoff = time.time() - options['grace_seconds']
+        scanned = deleted = 0
+        batch = []
+
+        if os.path.isdir(root):
+            for entry in self._walk(root):
+                scanned += 1
+                name = os.path.relpath(entry.path, storage.location)
+                batch.append((name, entry.stat().st_mtime))
+                if len(batch) >= options['batch_size']:
+                    deleted += self._collect_batch(
+                        storage, batch, options['dry_run']
+                    )
+                    batch = []
+            deleted += self._collect_batch(storage, batch, options['dry_run'])
+
+        verb = 'would delete' if options['dry_run'] else 'deleted'
+        self.stdout.write(f'Scanned {scanned} files, {verb} {deleted}')
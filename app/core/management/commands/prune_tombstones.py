@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Tombstone
+
+
+class Command(BaseCommand):
+    """command to delete tombstones older than the sync retention"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(
+            seconds=settings.SYNC_TOMBSTONE_RETENTION
+        )
+        expired = Tombstone.objects.filter(deleted_at__lt=cutoff)
+        pruned = 0
+        while True:
+            ids = list(
+                expired.values_list('id', flat=True)[:options['batch_size']]
+            )
+            if not ids:
+                break
+            pruned += Tombstone.objects.filter(id__in=ids).delete()[0]
+
+        self.stdout.write(f'Pruned {pruned} tombstones')
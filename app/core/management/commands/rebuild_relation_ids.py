@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.models import Recipe
+from core.relations import ID_ARRAY_FIELDS, m2m_tables, refresh_relation_ids
+
+
+class Command(BaseCommand):
+    """command to verify and rebuild the denormalized recipe id arrays"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report recipes whose id arrays are out of date'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def _stale_ids(self, relation, ids):
+        """Returns the ids whose array differs from the through table"""
+        sql = """
+            SELECT r.id FROM {recipe} r
+            WHERE r.id = ANY(%s) AND r.{array} IS DISTINCT FROM ARRAY(
+              SELECT {target_col} FROM {through}
+              WHERE {recipe_col} = r.id ORDER BY {target_col}
+            )
+        """.format(**m2m_tables(relation))
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [ids])
+            return [row[0] for row in cursor.fetchall()]
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        stale = dict.fromkeys(ID_ARRAY_FIELDS, 0)
+        last_id = 0
+        while True:
+            ids = list(
+                Recipe.objects.filter(id__gt=last_id)
+                              .order_by('id')
+                              .values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            for relation in ID_ARRAY_FIELDS:
+                stale_ids = self._stale_ids(relation, ids)
+                stale[relation] += len(stale_ids)
+                if stale_ids and not options['check']:
+                    refresh_relation_ids(relation, stale_ids)
+
+        for relation, count in stale.items():
+            self.stdout.write(f'{relation}: {count} stale recipes')
+        if options['check']:
+            # fails the command so cron and CI checks notice the drift
+            if any(stale.values()):
+                raise CommandError('Id arrays out of date')
+            self.stdout.write(self.style.SUCCESS('Id arrays consistent'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Id arrays rebuilt'))
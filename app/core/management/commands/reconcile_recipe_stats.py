@@ -0,0 +1,98 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+
+from core.models import Recipe, UserRecipeStats, UserTagStats
+
+
+class Command(BaseCommand):
+    """command to recompute the recipe statistics and repair drift"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report statistics that drifted'
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def _reconcile_recipes(self, user_ids, fix):
+        actual = {
+            row['user_id']: (row['count'], row['time'], row['price'])
+            for row in Recipe.objects.filter(user_id__in=user_ids)
+                                     .values('user_id')
+                                     .annotate(count=Count('id'),
+                                               time=Sum('time_minutes'),
+                                               price=Sum('price'))
+                                     .order_by()
+        }
+        stored = {
+            stats.user_id: (stats.recipe_count, stats.total_time_minutes,
+                            stats.total_price)
+            for stats in UserRecipeStats.objects.filter(user_id__in=user_ids)
+        }
+
+        drifted = 0
+        for user_id in actual.keys() | stored.keys():
+            expected = actual.get(user_id, (0, 0, Decimal(0)))
+            if stored.get(user_id) == expected:
+                continue
+            drifted += 1
+            if fix:
+                UserRecipeStats.objects.update_or_create(
+                    user_id=user_id,
+                    defaults={
+                        'recipe_count': expected[0],
+                        'total_time_minutes': expected[1],
+                        'total_price': expected[2],
+                    }
+                )
+        return drifted
+
+    def _reconcile_tags(self, user_ids, fix):
+        actual = {
+            (row['recipe__user_id'], row['tag_id']): row['count']
+            for row in Recipe.tags.through.objects
+                             .filter(recipe__user_id__in=user_ids)
+                             .values('recipe__user_id', 'tag_id')
+                             .annotate(count=Count('id'))
+                             .order_by()
+        }
+        stored = {
+            (stats.user_id, stats.tag_id): stats.recipe_count
+            for stats in UserTagStats.objects.filter(user_id__in=user_ids)
+        }
+
+        drifted = 0
+        for user_id, tag_id in actual.keys() | stored.keys():
+            expected = actual.get((user_id, tag_id), 0)
+            if stored.get((user_id, tag_id), 0) == expected:
+                continue
+            drifted += 1
+            if fix:
+                UserTagStats.objects.update_or_create(
+                    user_id=user_id,
+                    tag_id=tag_id,
+                    defaults={'recipe_count': expected}
+                )
+        return drifted
+
+    def handle(self, *args, **options):
+        fix = not options['check']
+        users = get_user_model().objects.order_by('id')
+        recipes_drifted = tags_drifted = 0
+        last_id = 0
+        while True:
+            batch = users.filter(id__gt=last_id).values_list('id', flat=True)
+            user_ids = list(batch[:options['batch_size']])
+            if not user_ids:
+                break
+            last_id = user_ids[-1]
+            recipes_drifted += self._reconcile_recipes(user_ids, fix)
+            tags_drifted += self._reconcile_tags(user_ids, fix)
+
+        self.stdout.write(f'recipe stats: {recipes_drifted} drifted')
+        self.stdout.write(f'tag stats: {tags_drifted} drifted')
+        if fix:
+            self.stdout.write(self.style.SUCCESS('Recipe stats reconciled'))
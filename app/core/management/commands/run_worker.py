@@ -0,0 +1,86 @@
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.jobs import Worker, run_worker_process, run_worker_thread
+
+
+class Command(BaseCommand):
+    """command to run queued background jobs with a pool of workers"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int,
+            default=settings.JOB_WORKER_CONCURRENCY,
+            help='Number of jobs run at the same time'
+        )
+        parser.add_argument(
+            '--processes', action='store_true',
+            help='Run the workers in processes instead of threads'
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Exit once no job is due'
+        )
+        parser.add_argument('--poll-interval', type=float,
+                            default=settings.JOB_POLL_INTERVAL)
+
+    def _run_pool(self, options, stop):
+        base = f'{socket.gethostname()}:{os.getpid()}'
+        args = (options['poll_interval'], stop, options['burst'])
+        if options['processes']:
+            # forked workers must open connections of their own
+            connections.close_all()
+            pool = [
+                multiprocessing.Process(
+                    target=run_worker_process,
+                    args=(f'{base}/p{i}',) + args
+                )
+                for i in range(options['concurrency'])
+            ]
+        else:
+            pool = [
+                threading.Thread(
+                    target=run_worker_thread,
+                    args=(f'{base}/t{i}',) + args
+                )
+                for i in range(options['concurrency'])
+            ]
+        for worker in pool:
+            worker.start()
+        for worker in pool:
+            worker.join()
+
+    def handle(self, *args, **options):
+        if options['processes']:
+            stop = multiprocessing.Event()
+        else:
+            stop = threading.Event()
+
+        def request_stop(signum, frame):
+            self.stdout.write('Stopping after the running jobs')
+            stop.set()
+
+        handlers = {
+            signum: signal.signal(signum, request_stop)
+            for signum in (signal.SIGINT, signal.SIGTERM)
+        }
+        try:
+            if options['concurrency'] == 1 and not options['processes']:
+                # a single worker needs no pool
+                Worker(poll_interval=options['poll_interval']).run(
+                    stop,
+                    options['burst']
+                )
+            else:
+                self._run_pool(options, stop)
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+        self.stdout.write(self.style.SUCCESS('Worker stopped'))
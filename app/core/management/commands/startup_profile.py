@@ -0,0 +1,153 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# runs in a fresh interpreter, where imports are not cached yet
+PROBE = r'''
+import asyncio
+import io
+import json
+import sys
+import time
+
+target, path, host = sys.argv[1:4]
+
+
+def wsgi_request(application):
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '',
+        'SERVER_NAME': host, 'SERVER_PORT': '80', 'HTTP_HOST': host,
+        'SERVER_PROTOCOL': 'HTTP/1.1', 'HTTP_ACCEPT': 'application/json',
+        'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+        'wsgi.url_scheme': 'http', 'wsgi.version': (1, 0),
+        'wsgi.multithread': False, 'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    statuses = []
+    response = application(
+        environ, lambda status, headers, exc_info=None: statuses.append(status)
+    )
+    b''.join(response)
+    response.close()
+    return int(statuses[0].split()[0])
+
+
+def asgi_request(application):
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': path,
+        'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+        'headers': [(b'host', host.encode()),
+                    (b'accept', b'application/json')],
+        'server': (host, 80), 'client': ('127.0.0.1', 0),
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(application(scope, receive, send))
+    return messages[0]['status']
+
+
+started = time.perf_counter()
+module = __import__('app.' + target, fromlist=['application'])
+imported = time.perf_counter()
+request = wsgi_request if target == 'wsgi' else asgi_request
+status = request(module.application)
+first = time.perf_counter()
+request(module.application)
+second = time.perf_counter()
+print(json.dumps({
+    'import': imported - started,
+    'first_request': first - imported,
+    'second_request': second - first,
+    'status': status,
+}))
+'''
+
+
+def parse_importtime(output):
+    """Returns (module, self us, cumulative us) of -X importtime output"""
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        try:
+            imports.append(
+                (fields[2].strip(), int(fields[0]), int(fields[1]))
+            )
+        except (IndexError, ValueError):
+            continue
+    return imports
+
+
+class Command(BaseCommand):
+    """command to report import time and time to first request"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target', action='append', choices=('wsgi', 'asgi'),
+            help='Application module to profile, both by default'
+        )
+        parser.add_argument('--path', default='/api/recipe/',
+                            help='Path of the first request')
+        parser.add_argument('--host', default='localhost')
+        parser.add_argument('--top', type=int, default=15,
+                            help='Number of slowest imports listed')
+        parser.add_argument('--preload', action='store_true',
+                            help='Profile with APP_PRELOAD enabled')
+
+    def _profile(self, target, options):
+        env = dict(os.environ, APP_PRELOAD='1' if options['preload'] else '')
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROBE, target,
+             options['path'], options['host']],
+            cwd=settings.BASE_DIR,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True
+        )
+        if result.returncode:
+            raise CommandError(
+                f'Profiling app.{target} failed:\n{result.stderr[-2000:]}'
+            )
+        return json.loads(result.stdout.splitlines()[-1]), \
+            parse_importtime(result.stderr)
+
+    def _write_imports(self, imports, top):
+        self.stdout.write('  slowest imports, cumulative ms:')
+        for name, _, cumulative in sorted(
+                imports, key=lambda i: i[2], reverse=True)[:top]:
+            self.stdout.write(f'    {cumulative / 1000:9.1f}  {name}')
+
+        packages = {}
+        for name, own, _ in imports:
+            package = name.split('.')[0]
+            packages[package] = packages.get(package, 0) + own
+        self.stdout.write('  import time by package, own ms:')
+        for package, own in sorted(
+                packages.items(), key=lambda p: p[1], reverse=True)[:top]:
+            self.stdout.write(f'    {own / 1000:9.1f}  {package}')
+
+    def handle(self, *args, **options):
+        for target in options['target'] or ('wsgi', 'asgi'):
+            timings, imports = self._profile(target, options)
+            self.stdout.write(
+                f'app.{target}: imported in {timings["import"] * 1000:.1f}ms,'
+                f' {len(imports)} modules, first request '
+                f'{timings["first_request"] * 1000:.1f}ms '
+                f'({timings["status"]}), second '
+                f'{timings["second_request"] * 1000:.1f}ms'
+            )
+            self._write_imports(imports, options['top'])
@@ -0,0 +1,308 @@
+import hashlib
+import re
+import threading
+import time
+import uuid
+import zlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from core.routers import choose_replica, set_read_alias, reset_read_alias
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaRoutingMiddleware:
+    """Routes safe requests to a replica unless the client wrote recently"""
+    cookie_name = 'db_pin'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def _pin_key(self, request):
+        auth = request.META.get('HTTP_AUTHORIZATION')
+        if not auth:
+            return None
+        digest = hashlib.sha256(auth.encode()).hexdigest()
+        return f'db-pin:{digest}'
+
+    def _is_pinned(self, request):
+        if self.cookie_name in request.COOKIES:
+            return True
+        key = self._pin_key(request)
+        return key is not None and cache.get(key) is not None
+
+    def _is_routed(self, request):
+        return (
+            request.method in SAFE_METHODS and
+            request.path.startswith(settings.REPLICA_ROUTED_PATHS) and
+            not self._is_pinned(request)
+        )
+
+    def _pin(self, request, response):
+        seconds = settings.REPLICA_PIN_SECONDS
+        response.set_cookie(
+            self.cookie_name, '1', max_age=seconds, httponly=True
+        )
+        key = self._pin_key(request)
+        if key is not None:
+            cache.set(key, 1, seconds)
+
+    def __call__(self, request):
+        alias = choose_replica() if self._is_routed(request) else None
+        token = set_read_alias(alias)
+        try:
+            response = self.get_response(request)
+        finally:
+            reset_read_alias(token)
+
+        if (settings.DATABASE_REPLICAS and
+                request.method not in SAFE_METHODS and
+                response.status_code < 400):
+            self._pin(request, response)
+        return response
+
+
+class CompressionMiddleware:
+    """Compresses responses with brotli, when installed, or gzip. Streaming
+    responses are compressed chunk by chunk instead of being buffered."""
+    # media that is already compressed, checked by content type prefix
+    incompressible_types = (
+        'image/jpeg', 'image/png', 'image/gif', 'image/webp',
+        'video/', 'audio/', 'application/zip', 'application/gzip',
+        'font/woff',
+    )
+    accept_re = re.compile(r'^\s*([^\s;]+)\s*(?:;\s*q=([0-9.]+))?\s*$')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def _encoding(self, request):
+        """Returns the best encoding the client accepts, or None"""
+        accepted = {}
+        for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+            match = self.accept_re.match(part)
+            if match:
+                accepted[match.group(1).lower()] = float(match.group(2) or 1)
+        if brotli is not None and accepted.get('br', 0) > 0:
+            return 'br'
+        if accepted.get('gzip', 0) > 0:
+            return 'gzip'
+        return None
+
+    def _compressor(self, encoding):
+        """Returns the compress, flush and finish functions of a stream"""
+        if encoding == 'br':
+            compressor = brotli.Compressor(
+                quality=settings.COMPRESSION_BROTLI_QUALITY
+            )
+            return compressor.process, compressor.flush, compressor.finish
+        compressor = zlib.compressobj(
+            settings.COMPRESSION_GZIP_LEVEL,
+            zlib.DEFLATED,
+            16 + zlib.MAX_WBITS
+        )
+        return (
+            compressor.compress,
+            lambda: compressor.flush(zlib.Z_SYNC_FLUSH),
+            compressor.flush
+        )
+
+    def _compress_stream(self, encoding, chunks):
+        compress, flush, finish = self._compressor(encoding)
+        for chunk in chunks:
+            data = compress(chunk)
+            # hand each chunk to the client as soon as it is produced
+            data += flush()
+            if data:
+                yield data
+        yield finish()
+
+    def _compress(self, encoding, content):
+        compress, flush, finish = self._compressor(encoding)
+        return compress(content) + finish()
+
+    def _is_compressible(self, response):
+        content_type = response.get('Content-Type', '').lower()
+        return (
+            response.status_code not in (204, 304) and
+            not response.has_header('Content-Encoding') and
+            not content_type.startswith(self.incompressible_types)
+        )
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self._is_compressible(response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = self._encoding(request)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = self._compress_stream(
+                encoding,
+                response.streaming_content
+            )
+            del response['Content-Length']
+        else:
+            if len(response.content) < settings.COMPRESSION_MIN_LENGTH:
+                return response
+            compressed = self._compress(encoding, response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+
+class Flight:
+    """An in flight request the identical requests arriving meanwhile wait
+    for, snapshot holds its response once done, None if not shareable"""
+
+    def __init__(self, identity):
+        self.identity = identity
+        self.done = threading.Event()
+        self.snapshot = None
+
+
+class CoalescingMiddleware:
+    """Runs identical concurrent safe requests once: a request arriving
+    while the same one from the same client is in flight waits for it and
+    gets a copy of its response. With COALESCE_SHARED the flights of other
+    processes are joined through the cache as well."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.lock = threading.Lock()
+        self.flights = {}
+
+    def _identity(self, request):
+        """Returns a digest of the credentials the request carries"""
+        credentials = '\n'.join((
+            request.META.get('HTTP_AUTHORIZATION', ''),
+            request.META.get('HTTP_COOKIE', ''),
+        ))
+        return hashlib.sha256(credentials.encode()).hexdigest()
+
+    def _key(self, request, identity):
+        parts = [
+            identity,
+            request.method,
+            request.get_full_path(),
+            request.META.get('HTTP_ACCEPT', ''),
+            request.META.get('HTTP_ACCEPT_LANGUAGE', ''),
+        ]
+        if settings.COALESCE_SHARED:
+            # bumped by writes, so later reads never join an older flight
+            parts.append(str(cache.get(f'coalesce-gen:{identity}', 0)))
+        return hashlib.sha256('\n'.join(parts).encode()).hexdigest()
+
+    def _snapshot(self, response):
+        """Returns what a copy of the response needs, None for responses
+        that cannot be shared"""
+        if response.streaming or response.cookies:
+            return None
+        return (response.status_code, list(response.items()),
+                response.content)
+
+    def _replay(self, snapshot):
+        status, headers, content = snapshot
+        response = HttpResponse(content, status=status)
+        for header, value in headers:
+            response[header] = value
+        response['Coalesced'] = 'true'
+        return response
+
+    def _forget(self, identity):
+        """Stops reads of the client joining flights begun before a write"""
+        with self.lock:
+            for key, flight in list(self.flights.items()):
+                if flight.identity == identity:
+                    del self.flights[key]
+        if settings.COALESCE_SHARED:
+            key = f'coalesce-gen:{identity}'
+            cache.add(key, 0, settings.COALESCE_GENERATION_TTL)
+            try:
+                cache.incr(key)
+            except ValueError:
+                pass
+
+    def _wait_shared(self, lock_key, flight_id):
+        """Polls the cache for the response of another process's flight"""
+        result_key = f'{lock_key}:{flight_id}'
+        deadline = time.monotonic() + settings.COALESCE_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            snapshot = cache.get(result_key)
+            if snapshot is not None or cache.get(lock_key) != flight_id:
+                return snapshot or cache.get(result_key)
+            time.sleep(0.01)
+        return None
+
+    def _lead(self, request, key):
+        """Runs the request, in shared mode unless a process runs it"""
+        if not settings.COALESCE_SHARED:
+            return self.get_response(request)
+        lock_key = f'coalesce:{key}'
+        flight_id = uuid.uuid4().hex
+        if not cache.add(lock_key, flight_id, settings.COALESCE_WAIT_SECONDS):
+            leader = cache.get(lock_key)
+            snapshot = self._wait_shared(lock_key, leader) if leader else None
+            if snapshot is not None:
+                return self._replay(snapshot)
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+            snapshot = self._snapshot(response)
+            if snapshot is not None:
+                cache.set(f'{lock_key}:{flight_id}', snapshot,
+                          settings.COALESCE_WAIT_SECONDS)
+            return response
+        finally:
+            cache.delete(lock_key)
+
+    def __call__(self, request):
+        if not request.path.startswith(settings.COALESCE_PATHS):
+            return self.get_response(request)
+        identity = self._identity(request)
+        if request.method not in ('GET', 'HEAD'):
+            response = self.get_response(request)
+            self._forget(identity)
+            return response
+
+        key = self._key(request, identity)
+        with self.lock:
+            flight = self.flights.get(key)
+            leading = flight is None
+            if leading:
+                flight = self.flights[key] = Flight(identity)
+
+        if not leading:
+            flight.done.wait(settings.COALESCE_WAIT_SECONDS)
+            if flight.snapshot is not None:
+                return self._replay(flight.snapshot)
+            return self.get_response(request)
+
+        try:
+            response = self._lead(request, key)
+            flight.snapshot = self._snapshot(response)
+            return response
+        finally:
+            with self.lock:
+                if self.flights.get(key) is flight:
+                    del self.flights[key]
+            flight.done.set()
@@ -0,0 +1,83 @@
+# Generated by Django 3.0.14 on 2026-10-19 09:21
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('core', '0007_auto_20200528_1228'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredient_ids',
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.IntegerField(),
+                blank=True,
+                default=list,
+                editable=False,
+                size=None),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='tag_ids',
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.IntegerField(),
+                blank=True,
+                default=list,
+                editable=False,
+                size=None),
+        ),
+        migrations.RunSQL(
+            sql="""
+                UPDATE core_recipe r SET
+                  tag_ids = ARRAY(
+                    SELECT tag_id FROM core_recipe_tags
+                    WHERE recipe_id = r.id ORDER BY tag_id
+                  ),
+                  ingredient_ids = ARRAY(
+                    SELECT ingredient_id FROM core_recipe_ingredient
+                    WHERE recipe_id = r.id ORDER BY ingredient_id
+                  )
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='groups',
+            field=models.ManyToManyField(
+                blank=True,
+                help_text='The groups this user belongs to. A user will get \
+                           all permissions granted to each of their groups.',
+                related_name='user_set',
+                related_query_name='user',
+                to='auth.Group',
+                verbose_name='groups'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='is_superuser',
+            field=models.BooleanField(
+                default=False,
+                help_text='Designates that this user has all permissions \
+                           without explicitly assigning them.',
+                verbose_name='superuser status'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=['tag_ids'],
+                name='core_recipe_tag_ids_03d71b_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=['ingredient_ids'],
+                name='core_recipe_ingredi_5e8a2b_gin'),
+        ),
+    ]
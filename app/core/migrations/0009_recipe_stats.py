@@ -0,0 +1,95 @@
+# Generated by Django 3.0.14 on 2026-10-19 09:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('core', '0008_recipe_relation_ids'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserRecipeStats',
+            fields=[
+                ('user', models.OneToOneField(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    primary_key=True,
+                    related_name='recipe_stats',
+                    serialize=False,
+                    to=settings.AUTH_USER_MODEL)),
+                ('recipe_count', models.IntegerField(default=0)),
+                ('total_time_minutes', models.BigIntegerField(default=0)),
+                ('total_price', models.DecimalField(
+                    decimal_places=2,
+                    default=0,
+                    max_digits=14)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='groups',
+            field=models.ManyToManyField(
+                blank=True,
+                help_text='The groups this user belongs to. A user will get \
+                           all permissions granted to each of their groups.',
+                related_name='user_set',
+                related_query_name='user',
+                to='auth.Group',
+                verbose_name='groups'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='is_superuser',
+            field=models.BooleanField(
+                default=False,
+                help_text='Designates that this user has all permissions \
+                           without explicitly assigning them.',
+                verbose_name='superuser status'),
+        ),
+        migrations.CreateModel(
+            name='UserTagStats',
+            fields=[
+                ('id', models.AutoField(
+                    auto_created=True,
+                    primary_key=True,
+                    serialize=False,
+                    verbose_name='ID')),
+                ('recipe_count', models.IntegerField(default=0)),
+                ('tag', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    to='core.Tag')),
+                ('user', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='usertagstats',
+            constraint=models.UniqueConstraint(
+                fields=('user', 'tag'),
+                name='unique_user_tag_stats'),
+        ),
+        migrations.RunSQL(
+            sql=[
+                """
+                INSERT INTO core_userrecipestats
+                  (user_id, recipe_count, total_time_minutes, total_price)
+                SELECT user_id, COUNT(*), SUM(time_minutes), SUM(price)
+                FROM core_recipe GROUP BY user_id
+                """,
+                """
+                INSERT INTO core_usertagstats (user_id, tag_id, recipe_count)
+                SELECT r.user_id, rt.tag_id, COUNT(*)
+                FROM core_recipe_tags rt
+                JOIN core_recipe r ON r.id = rt.recipe_id
+                GROUP BY r.user_id, rt.tag_id
+                """,
+            ],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,121 @@
+# Generated by Django 3.0.14 on 2026-10-19 09:27
+
+from django.db import migrations, models
+
+
+# Folds duplicate names of a user into the oldest object before the
+# unique constraints are added, keeping arrays and tag stats in step.
+MERGE_DUPLICATE_TAGS = [
+    """
+    CREATE TEMPORARY TABLE tag_merge AS
+    SELECT id AS old_id, new_id FROM (
+      SELECT id, MIN(id) OVER (PARTITION BY user_id, name) AS new_id
+      FROM core_tag
+    ) t WHERE id <> new_id
+    """,
+    """
+    INSERT INTO core_recipe_tags (recipe_id, tag_id)
+    SELECT rt.recipe_id, m.new_id
+    FROM core_recipe_tags rt JOIN tag_merge m ON m.old_id = rt.tag_id
+    ON CONFLICT DO NOTHING
+    """,
+    "DELETE FROM core_recipe_tags WHERE tag_id IN "
+    "(SELECT old_id FROM tag_merge)",
+    """
+    UPDATE core_recipe r SET tag_ids = ARRAY(
+      SELECT tag_id FROM core_recipe_tags
+      WHERE recipe_id = r.id ORDER BY tag_id
+    ) WHERE r.tag_ids && ARRAY(SELECT old_id FROM tag_merge)
+    """,
+    "DELETE FROM core_usertagstats WHERE tag_id IN "
+    "(SELECT old_id FROM tag_merge)",
+    """
+    INSERT INTO core_usertagstats (user_id, tag_id, recipe_count)
+    SELECT t.user_id, t.id, COUNT(*)
+    FROM core_tag t JOIN core_recipe_tags rt ON rt.tag_id = t.id
+    WHERE t.id IN (SELECT new_id FROM tag_merge)
+    GROUP BY t.user_id, t.id
+    ON CONFLICT (user_id, tag_id) DO UPDATE
+    SET recipe_count = EXCLUDED.recipe_count
+    """,
+    "DELETE FROM core_tag WHERE id IN (SELECT old_id FROM tag_merge)",
+    "DROP TABLE tag_merge",
+]
+
+MERGE_DUPLICATE_INGREDIENTS = [
+    """
+    CREATE TEMPORARY TABLE ingredient_merge AS
+    SELECT id AS old_id, new_id FROM (
+      SELECT id, MIN(id) OVER (PARTITION BY user_id, name) AS new_id
+      FROM core_ingredient
+    ) i WHERE id <> new_id
+    """,
+    """
+    INSERT INTO core_recipe_ingredient (recipe_id, ingredient_id)
+    SELECT ri.recipe_id, m.new_id
+    FROM core_recipe_ingredient ri
+    JOIN ingredient_merge m ON m.old_id = ri.ingredient_id
+    ON CONFLICT DO NOTHING
+    """,
+    "DELETE FROM core_recipe_ingredient WHERE ingredient_id IN "
+    "(SELECT old_id FROM ingredient_merge)",
+    """
+    UPDATE core_recipe r SET ingredient_ids = ARRAY(
+      SELECT ingredient_id FROM core_recipe_ingredient
+      WHERE recipe_id = r.id ORDER BY ingredient_id
+    ) WHERE r.ingredient_ids && ARRAY(SELECT old_id FROM ingredient_merge)
+    """,
+    "DELETE FROM core_ingredient WHERE id IN "
+    "(SELECT old_id FROM ingredient_merge)",
+    "DROP TABLE ingredient_merge",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('core', '0009_recipe_stats'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            # fire the deferred foreign key checks before altering tables
+            sql=MERGE_DUPLICATE_TAGS + MERGE_DUPLICATE_INGREDIENTS +
+            ['SET CONSTRAINTS ALL IMMEDIATE'],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='groups',
+            field=models.ManyToManyField(
+                blank=True,
+                help_text='The groups this user belongs to. A user will get \
+                           all permissions granted to each of their groups.',
+                related_name='user_set',
+                related_query_name='user',
+                to='auth.Group',
+                verbose_name='groups'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='is_superuser',
+            field=models.BooleanField(
+                default=False,
+                help_text='Designates that this user has all permissions \
+                           without explicitly assigning them.',
+                verbose_name='superuser status'),
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(
+                fields=('user', 'name'),
+                name='unique_user_ingredient_name'),
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(
+                fields=('user', 'name'),
+                name='unique_user_tag_name'),
+        ),
+    ]
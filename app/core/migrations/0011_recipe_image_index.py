@@ -0,0 +1,44 @@
+# Generated by Django 3.0.14 on 2026-10-19 09:34
+
+import core.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('core', '0010_unique_tag_ingredient_names'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(
+                db_index=True,
+                null=True,
+                upload_to=core.models.recipe_image_file_path),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='groups',
+            field=models.ManyToManyField(
+                blank=True,
+                help_text='The groups this user belongs to. A user will get \
+                           all permissions granted to each of their groups.',
+                related_name='user_set',
+                related_query_name='user',
+                to='auth.Group',
+                verbose_name='groups'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='is_superuser',
+            field=models.BooleanField(
+                default=False,
+                help_text='Designates that this user has all permissions \
+                           without explicitly assigning them.',
+                verbose_name='superuser status'),
+        ),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 3.0.14 on 2026-10-19 09:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('core', '0011_recipe_image_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.AutoField(
+                    auto_created=True,
+                    primary_key=True,
+                    serialize=False,
+                    verbose_name='ID')),
+                ('kind', models.CharField(
+                    choices=[
+                        ('recipe', 'Recipe'),
+                        ('tag', 'Tag'),
+                        ('ingredient', 'Ingredient')],
+                    max_length=16)),
+                ('object_id', models.IntegerField()),
+                ('deleted_at', models.DateTimeField(
+                    default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='groups',
+            field=models.ManyToManyField(
+                blank=True,
+                help_text='The groups this user belongs to. A user will get \
+                           all permissions granted to each of their groups.',
+                related_name='user_set',
+                related_query_name='user',
+                to='auth.Group',
+                verbose_name='groups'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='is_superuser',
+            field=models.BooleanField(
+                default=False,
+                help_text='Designates that this user has all permissions \
+                           without explicitly assigning them.',
+                verbose_name='superuser status'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(
+                fields=['user', 'updated_at', 'id'],
+                name='core_ingred_user_id_0b3f62_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(
+                fields=['user', 'updated_at', 'id'],
+                name='core_recipe_user_id_33045b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(
+                fields=['user', 'updated_at', 'id'],
+                name='core_tag_user_id_37d9da_idx'),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='user',
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name='+',
+                to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(
+                fields=['user', 'deleted_at', 'id'],
+                name='core_tombst_user_id_5cab1c_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_recipe_range_indexes'),
+    ]
+
+    # the admin's ^field searches filter on UPPER(field::text) LIKE 'X%'
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                CREATE INDEX core_tag_name_upper_like
+                ON core_tag (UPPER(name::text) text_pattern_ops)
+            """,
+            reverse_sql='DROP INDEX core_tag_name_upper_like',
+        ),
+        migrations.RunSQL(
+            sql="""
+                CREATE INDEX core_ingredient_name_upper_like
+                ON core_ingredient (UPPER(name::text) text_pattern_ops)
+            """,
+            reverse_sql='DROP INDEX core_ingredient_name_upper_like',
+        ),
+        migrations.RunSQL(
+            sql="""
+                CREATE INDEX core_recipe_title_upper_like
+                ON core_recipe (UPPER(title::text) text_pattern_ops)
+            """,
+            reverse_sql='DROP INDEX core_recipe_title_upper_like',
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 3.0.14 on 2026-10-19 09:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('core', '0015_admin_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CanonicalIngredient',
+            fields=[
+                ('id', models.AutoField(
+                    auto_created=True,
+                    primary_key=True,
+                    serialize=False,
+                    verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('alias_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='groups',
+            field=models.ManyToManyField(
+                blank=True,
+                help_text='The groups this user belongs to. A user will get \
+                           all permissions granted to each of their groups.',
+                related_name='user_set',
+                related_query_name='user',
+                to='auth.Group',
+                verbose_name='groups'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='is_superuser',
+            field=models.BooleanField(
+                default=False,
+                help_text='Designates that this user has all permissions \
+                           without explicitly assigning them.',
+                verbose_name='superuser status'),
+        ),
+        migrations.AddIndex(
+            model_name='canonicalingredient',
+            index=models.Index(
+                fields=['alias_count'],
+                name='core_canoni_alias_c_97682b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='canonicalingredient',
+            index=models.Index(
+                fields=['name'],
+                name='core_canonicalingr_name_like',
+                opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='canonical',
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name='aliases',
+                to='core.CanonicalIngredient'),
+        ),
+    ]
@@ -0,0 +1,113 @@
+# Generated by Django 3.0.14 on 2026-10-19 10:02
+
+from django.conf import settings
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('core', '0016_canonical_ingredients'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='groups',
+            field=models.ManyToManyField(
+                blank=True,
+                help_text='The groups this user belongs to. A user will get \
+                           all permissions granted to each of their groups.',
+                related_name='user_set',
+                related_query_name='user',
+                to='auth.Group',
+                verbose_name='groups'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='is_superuser',
+            field=models.BooleanField(
+                default=False,
+                help_text='Designates that this user has all permissions \
+                           without explicitly assigning them.',
+                verbose_name='superuser status'),
+        ),
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.UUIDField(
+                    default=uuid.uuid4,
+                    editable=False,
+                    primary_key=True,
+                    serialize=False)),
+                ('task', models.CharField(max_length=100)),
+                ('payload', django.contrib.postgres.fields.jsonb.JSONField(
+                    blank=True,
+                    default=dict)),
+                ('status', models.CharField(
+                    choices=[
+                        ('queued', 'Queued'),
+                        ('running', 'Running'),
+                        ('done', 'Done'),
+                        ('failed', 'Failed'),
+                    ],
+                    default='queued',
+                    max_length=16)),
+                ('priority', models.IntegerField(default=0)),
+                ('dedup_key', models.CharField(
+                    blank=True,
+                    max_length=255,
+                    null=True)),
+                ('attempts', models.IntegerField(default=0)),
+                ('max_attempts', models.IntegerField(default=1)),
+                ('run_at', models.DateTimeField(
+                    default=django.utils.timezone.now)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('locked_by', models.CharField(blank=True, max_length=255)),
+                ('result', django.contrib.postgres.fields.jsonb.JSONField(
+                    blank=True,
+                    null=True)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(
+                    blank=True,
+                    null=True,
+                    on_delete=django.db.models.deletion.SET_NULL,
+                    related_name='+',
+                    to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(
+                condition=models.Q(status='queued'),
+                fields=['-priority', 'run_at'],
+                name='core_job_queued_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(
+                condition=models.Q(status='running'),
+                fields=['locked_at'],
+                name='core_job_running_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(
+                fields=['user', 'created_at'],
+                name='core_job_user_id_a22251_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(
+                condition=models.Q(status__in=['queued', 'running']),
+                fields=('dedup_key',),
+                name='unique_active_job_dedup_key'),
+        ),
+    ]
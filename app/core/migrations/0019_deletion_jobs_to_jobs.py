@@ -0,0 +1,76 @@
+# Generated by Django 3.0.14 on 2026-10-19 10:34
+
+from django.db import migrations, models
+
+
+STATUSES = {
+    'pending': 'queued',
+    'running': 'queued',
+    'done': 'done',
+    'failed': 'failed',
+}
+
+
+def move_deletion_jobs(apps, schema_editor):
+    """Queues the account deletions as delete_account jobs, keeping their
+    ids so the status urls handed out keep working"""
+    DeletionJob = apps.get_model('core', 'DeletionJob')
+    Job = apps.get_model('core', 'Job')
+
+    for deletion in DeletionJob.objects.all():
+        status = STATUSES[deletion.status]
+        Job.objects.create(
+            id=deletion.id,
+            user_id=deletion.user_id,
+            task='delete_account',
+            payload={'user_id': deletion.user_id, 'total': deletion.total},
+            status=status,
+            dedup_key=(
+                f'delete_account:{deletion.user_id}'
+                if status == 'queued' else None
+            ),
+            max_attempts=5,
+            result={'total': deletion.total, 'deleted': deletion.deleted},
+            error=deletion.error,
+            finished_at=deletion.finished_at,
+        )
+        # auto_now_add ignores the value given on create
+        Job.objects.filter(id=deletion.id).update(
+            created_at=deletion.created_at
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('core', '0018_database_timestamps'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='groups',
+            field=models.ManyToManyField(
+                blank=True,
+                help_text='The groups this user belongs to. A user will get \
+                           all permissions granted to each of their groups.',
+                related_name='user_set',
+                related_query_name='user',
+                to='auth.Group',
+                verbose_name='groups'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='is_superuser',
+            field=models.BooleanField(
+                default=False,
+                help_text='Designates that this user has all permissions \
+                           without explicitly assigning them.',
+                verbose_name='superuser status'),
+        ),
+        migrations.RunPython(move_deletion_jobs, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='DeletionJob',
+        ),
+    ]
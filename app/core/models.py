@@ -2,9 +2,13 @@ import uuid
 import os
 
 from django.db import models
+from django.db.models.signals import post_save
+from django.contrib.postgres.fields import ArrayField, JSONField
+from django.contrib.postgres.indexes import GinIndex
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
                                         PermissionsMixin
 from django.conf import settings
+from django.utils import timezone
 
 
 def recipe_image_file_path(instance, filename):
@@ -15,6 +19,38 @@ def recipe_image_file_path(instance, filename):
     return os.path.join('uploads/recipe/', filename)
 
 
+class StatementTimestamp(models.Func):
+    """The start of the current statement by the database clock"""
+    template = 'statement_timestamp()'
+    output_field = models.DateTimeField()
+
+
+class DatabaseTimestampField(models.DateTimeField):
+    """Stamped with the database clock, on every save with auto_now or else
+    on inserts without a value, as the raw SQL writers stamp it. The clock
+    of an app server may be skewed from the transaction times the sync
+    horizon is read from."""
+    # inserts return the stamped value, updates read it back
+    db_returning = True
+
+    def contribute_to_class(self, cls, name, **kwargs):
+        super().contribute_to_class(cls, name, **kwargs)
+        if not cls._meta.abstract:
+            post_save.connect(self._load_stamped_value, sender=cls,
+                              weak=False)
+
+    def pre_save(self, model_instance, add):
+        if self.auto_now or \
+                add and getattr(model_instance, self.attname) is None:
+            return StatementTimestamp()
+        return getattr(model_instance, self.attname)
+
+    def _load_stamped_value(self, sender, instance, created, raw,
+                            **kwargs):
+        if self.auto_now and not created and not raw:
+            instance.refresh_from_db(fields=[self.attname])
+
+
 class UserManager(BaseUserManager):
 
     def create_user(self, email, password=None, **extra_fields):
@@ -56,6 +92,38 @@ class Tag(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    updated_at = DatabaseTimestampField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_user_tag_name'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'updated_at', 'id']),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class CanonicalIngredient(models.Model):
+    """Ingredient name shared by the ingredients of every user"""
+    name = models.CharField(max_length=255, unique=True)
+    # ingredients linked to the name, recounted by canonicalize_ingredients
+    alias_count = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['alias_count']),
+            models.Index(
+                fields=['name'],
+                name='core_canonicalingr_name_like',
+                opclasses=['varchar_pattern_ops']
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -68,6 +136,25 @@ class Ingredient(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    canonical = models.ForeignKey(
+        'CanonicalIngredient',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='aliases'
+    )
+    updated_at = DatabaseTimestampField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_user_ingredient_name'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'updated_at', 'id']),
+        ]
 
     def __str__(self):
         return self.name
@@ -85,7 +172,196 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255, blank=True)
     tags = models.ManyToManyField('Tag')
     ingredient = models.ManyToManyField('Ingredient')
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    # indexed for gc_media, which looks up the files recipes still use
+    image = models.ImageField(
+        null=True,
+        db_index=True,
+        upload_to=recipe_image_file_path
+    )
+    # denormalized copies of the m2m ids, kept in sync by core.signals
+    tag_ids = ArrayField(
+        models.IntegerField(),
+        default=list,
+        blank=True,
+        editable=False
+    )
+    ingredient_ids = ArrayField(
+        models.IntegerField(),
+        default=list,
+        blank=True,
+        editable=False
+    )
+    updated_at = DatabaseTimestampField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['tag_ids']),
+            GinIndex(fields=['ingredient_ids']),
+            models.Index(fields=['user', 'updated_at', 'id']),
+            models.Index(fields=['user', 'time_minutes', 'id']),
+            models.Index(fields=['user', 'price', 'id']),
+        ]
+
+    # written only by core.relations, from the through tables
+    relation_id_fields = ('tag_ids', 'ingredient_ids')
 
     def __str__(self):
         return self.title
+
+    def save(self, *args, **kwargs):
+        """Saves the row without the id arrays, an instance loaded before
+        a relation changed would otherwise write its stale copy back"""
+        if not self._state.adding and not kwargs.get('force_insert') and \
+                kwargs.get('update_fields') is None:
+            skipped = self.get_deferred_fields().union(
+                self.relation_id_fields
+            )
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skipped
+            ]
+        super().save(*args, **kwargs)
+
+
+class UserRecipeStats(models.Model):
+    """Running recipe totals of a user, maintained by core.signals"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='recipe_stats'
+    )
+    recipe_count = models.IntegerField(default=0)
+    total_time_minutes = models.BigIntegerField(default=0)
+    total_price = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0
+    )
+
+    @property
+    def average_time_minutes(self):
+        if not self.recipe_count:
+            return None
+        return round(self.total_time_minutes / self.recipe_count, 2)
+
+    @property
+    def average_price(self):
+        if not self.recipe_count:
+            return None
+        return round(self.total_price / self.recipe_count, 2)
+
+
+class UserTagStats(models.Model):
+    """Running number of recipes of a user carrying a tag"""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    tag = models.ForeignKey('Tag', on_delete=models.CASCADE)
+    recipe_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'tag'],
+                name='unique_user_tag_stats'
+            ),
+        ]
+
+
+class Tombstone(models.Model):
+    """Records a deleted recipe, tag or ingredient for the sync feed"""
+    RECIPE = 'recipe'
+    TAG = 'tag'
+    INGREDIENT = 'ingredient'
+    KIND_CHOICES = (
+        (RECIPE, 'Recipe'),
+        (TAG, 'Tag'),
+        (INGREDIENT, 'Ingredient'),
+    )
+
+    # no constraint, the objects of a deleted user are deleted after the
+    # user's tombstones were collected and would leave new ones behind
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+'
+    )
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    object_id = models.IntegerField()
+    deleted_at = DatabaseTimestampField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'deleted_at', 'id']),
+        ]
+
+
+class Job(models.Model):
+    """Background task queued in the database and run by run_worker"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+    ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4,
+                          editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='+'
+    )
+    task = models.CharField(max_length=100)
+    payload = JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=16,
+        choices=STATUS_CHOICES,
+        default=QUEUED
+    )
+    # higher runs first
+    priority = models.IntegerField(default=0)
+    # at most one queued or running job per key
+    dedup_key = models.CharField(max_length=255, null=True, blank=True)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=1)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=255, blank=True)
+    result = JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedup_key'],
+                condition=models.Q(status__in=['queued', 'running']),
+                name='unique_active_job_dedup_key'
+            ),
+        ]
+        indexes = [
+            # the worker's claim query, only over jobs still waiting
+            models.Index(
+                fields=['-priority', 'run_at'],
+                condition=models.Q(status='queued'),
+                name='core_job_queued_idx'
+            ),
+            models.Index(
+                fields=['locked_at'],
+                condition=models.Q(status='running'),
+                name='core_job_running_idx'
+            ),
+            models.Index(fields=['user', 'created_at']),
+        ]
@@ -0,0 +1,88 @@
+import gc
+import logging
+import os
+
+
+logger = logging.getLogger(__name__)
+
+
+def enabled():
+    """Returns whether APP_PRELOAD asks for a preloaded application"""
+    return os.environ.get('APP_PRELOAD', '').lower() in ('1', 'true', 'yes')
+
+
+def begin():
+    """Stops the collector while the application is imported, so the long
+    lived objects are not spread over pages freed by collections"""
+    if enabled():
+        gc.disable()
+
+
+def _warm_urls(resolver):
+    # the lookup tables are built on first access
+    resolver.reverse_dict
+    for pattern in resolver.url_patterns:
+        if hasattr(pattern, 'url_patterns'):
+            _warm_urls(pattern)
+
+
+def _warm_models():
+    from django.apps import apps
+
+    for model in apps.get_models(include_auto_created=True):
+        model._meta.get_fields(include_hidden=True)
+
+
+def _project_serializers():
+    from django.apps import apps
+    from django.conf import settings
+    from rest_framework.serializers import Serializer
+
+    local = {
+        config.name for config in apps.get_app_configs()
+        if config.path.startswith(settings.BASE_DIR)
+    }
+    classes = [Serializer]
+    while classes:
+        cls = classes.pop()
+        classes.extend(cls.__subclasses__())
+        if cls.__module__.split('.')[0] in local:
+            yield cls
+
+
+def _warm_serializers():
+    for serializer_class in _project_serializers():
+        try:
+            serializer_class().fields
+        except Exception:
+            logger.debug('Could not warm %s', serializer_class, exc_info=True)
+
+
+def _warm_templates():
+    from django.template.loader import get_template
+
+    for name in ('rest_framework/api.html', 'admin/login.html'):
+        get_template(name)
+
+
+def complete():
+    """Imports and warms what requests use, URL resolvers, model metadata,
+    serializer fields, Pillow's plugins and templates, then moves every
+    object to the permanent generation. Workers forked afterwards share
+    these pages copy-on-write instead of each building their own."""
+    if not enabled():
+        return
+    from django.db import connections
+    from django.urls import get_resolver
+    from PIL import Image
+
+    _warm_urls(get_resolver())
+    _warm_models()
+    _warm_serializers()
+    _warm_templates()
+    Image.init()
+
+    # a connection opened in the parent must not be shared by workers
+    connections.close_all()
+    gc.freeze()
+    gc.enable()
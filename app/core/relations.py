@@ -0,0 +1,151 @@
+from django.db import connection, transaction
+from django.dispatch import Signal
+
+from core.canonical import canonical_ids
+from core.models import Ingredient, Recipe
+
+
+# sent with changes as (recipe id, user id, old ids, new ids) tuples
+relations_changed = Signal(providing_args=['relation', 'changes'])
+
+# denormalized id array kept on Recipe for every m2m relation
+ID_ARRAY_FIELDS = {
+    'tags': 'tag_ids',
+    'ingredient': 'ingredient_ids',
+}
+
+
+def m2m_tables(relation):
+    """Returns quoted table and column names for a recipe m2m relation"""
+    field = Recipe._meta.get_field(relation)
+    qn = connection.ops.quote_name
+    return {
+        'through': qn(field.remote_field.through._meta.db_table),
+        'recipe': qn(Recipe._meta.db_table),
+        'target': qn(field.related_model._meta.db_table),
+        'recipe_col': qn(field.m2m_column_name()),
+        'target_col': qn(field.m2m_reverse_name()),
+        'array': qn(ID_ARRAY_FIELDS[relation]),
+    }
+
+
+def refresh_relation_ids(relation, recipe_ids):
+    """Rebuilds the denormalized id array of the recipes from the through
+    table and sends relations_changed for the recipes whose ids changed"""
+    recipe_ids = list(set(recipe_ids))
+    if not recipe_ids:
+        return []
+
+    sql = """
+        UPDATE {recipe} r SET {array} = ARRAY(
+          SELECT {target_col} FROM {through}
+          WHERE {recipe_col} = r.id ORDER BY {target_col}
+        ), updated_at = statement_timestamp()
+        FROM (
+          SELECT id, {array} FROM {recipe}
+          WHERE id = ANY(%s) FOR UPDATE
+        ) old
+        WHERE r.id = old.id
+        RETURNING r.id, r.user_id, old.{array}, r.{array}
+    """.format(**m2m_tables(relation))
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql, [recipe_ids])
+        changes = [row for row in cursor.fetchall() if row[2] != row[3]]
+        if changes:
+            relations_changed.send(
+                sender=Recipe,
+                relation=relation,
+                changes=changes
+            )
+    return changes
+
+
+def attach_relations(user, relation, recipe_ids, object_ids):
+    """Links every object to every recipe of the user in one INSERT,
+    returns the ids of the recipes that actually gained a row"""
+    sql = """
+        INSERT INTO {through} ({recipe_col}, {target_col})
+        SELECT r.id, t.id
+        FROM {recipe} r CROSS JOIN {target} t
+        WHERE r.user_id = %s AND r.id = ANY(%s)
+          AND t.user_id = %s AND t.id = ANY(%s)
+        ON CONFLICT DO NOTHING
+        RETURNING {recipe_col}
+    """.format(**m2m_tables(relation))
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            sql,
+            [user.id, list(recipe_ids), user.id, list(object_ids)]
+        )
+        changed = [row[0] for row in cursor.fetchall()]
+        refresh_relation_ids(relation, changed)
+        return changed
+
+
+def detach_relations(user, relation, recipe_ids, object_ids):
+    """Unlinks the objects from the user's recipes in one DELETE,
+    returns the ids of the recipes that actually lost a row"""
+    sql = """
+        DELETE FROM {through}
+        WHERE {target_col} = ANY(%s)
+          AND {recipe_col} IN (
+            SELECT id FROM {recipe} WHERE user_id = %s AND id = ANY(%s)
+          )
+        RETURNING {recipe_col}
+    """.format(**m2m_tables(relation))
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql, [list(object_ids), user.id, list(recipe_ids)])
+        changed = [row[0] for row in cursor.fetchall()]
+        refresh_relation_ids(relation, changed)
+        return changed
+
+
+def resolve_names(model, user, names):
+    """Returns the user's tags or ingredients with the given names, missing
+    ones are created with a single INSERT ... ON CONFLICT DO NOTHING and
+    new ingredients are linked to their canonical ingredient"""
+    names = list(dict.fromkeys(
+        name.strip() for name in names if name.strip()
+    ))
+    found = {
+        obj.name: obj
+        for obj in model.objects.filter(user=user, name__in=names)
+    }
+    missing = [name for name in names if name not in found]
+
+    if missing:
+        sql = """
+            INSERT INTO {table} (user_id, name, updated_at)
+            SELECT %s, unnest(%s::varchar[]), statement_timestamp()
+            ON CONFLICT (user_id, name) DO NOTHING
+            RETURNING id, name
+        """
+        params = [user.id, missing]
+        if model is Ingredient:
+            sql = """
+                INSERT INTO {table} (user_id, name, canonical_id, updated_at)
+                SELECT %s, unnest(%s::varchar[]), unnest(%s::integer[]),
+                  statement_timestamp()
+                ON CONFLICT (user_id, name) DO NOTHING
+                RETURNING id, name
+            """
+            params.append(canonical_ids(missing))
+        sql = sql.format(
+            table=connection.ops.quote_name(model._meta.db_table)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            for pk, name in cursor.fetchall():
+                found[name] = model(id=pk, user=user, name=name)
+        # names inserted concurrently by another request
+        raced = [name for name in missing if name not in found]
+        if raced:
+            found.update(
+                (obj.name, obj)
+                for obj in model.objects.filter(user=user, name__in=raced)
+            )
+
+    return [found[name] for name in names]
@@ -0,0 +1,47 @@
+import contextvars
+import random
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+_read_alias = contextvars.ContextVar('read_alias', default=None)
+
+
+def choose_replica():
+    """Returns a replica alias picked by weight, or None without replicas"""
+    replicas = getattr(settings, 'DATABASE_REPLICAS', {})
+    if not replicas:
+        return None
+    aliases, weights = zip(*replicas.items())
+    return random.choices(aliases, weights=weights)[0]
+
+
+def set_read_alias(alias):
+    """Routes reads of the current request to alias, returns a reset token"""
+    return _read_alias.set(alias)
+
+
+def reset_read_alias(token):
+    _read_alias.reset(token)
+
+
+class ReplicaRouter:
+    """Sends reads of replica routed requests to the chosen replica"""
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in getattr(settings, 'DATABASE_REPLICAS', {}):
+            return False
+        return None
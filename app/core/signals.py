@@ -0,0 +1,182 @@
+from django.db.models.signals import m2m_changed, pre_delete, post_delete, \
+                                     post_init, pre_save, post_save
+from django.contrib.auth import get_user_model
+from django.dispatch import receiver
+
+from core.canonical import canonical_ids, normalize_name
+from core.ingredient_index import invalidate_ingredient_index
+from core.models import Tag, Ingredient, Recipe, Tombstone
+from core.relations import ID_ARRAY_FIELDS, refresh_relation_ids, \
+                           relations_changed
+from core.stats import adjust_recipe_stats, adjust_tag_stats, \
+                       as_stats_values, tag_deltas
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredient.through)
+def refresh_ids_on_m2m_change(sender, instance, action, reverse, pk_set,
+                              **kwargs):
+    """Keeps the denormalized id arrays in step with m2m writes"""
+    relation = 'tags' if sender is Recipe.tags.through else 'ingredient'
+    if reverse and action == 'pre_clear':
+        instance._cleared_recipe_ids = list(
+            instance.recipe_set.values_list('id', flat=True)
+        )
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        for change in refresh_relation_ids(relation, [instance.pk]):
+            setattr(instance, ID_ARRAY_FIELDS[relation], change[3])
+    elif action == 'post_clear':
+        refresh_relation_ids(relation, instance._cleared_recipe_ids)
+    else:
+        refresh_relation_ids(relation, pk_set or [])
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def remember_recipes_before_delete(sender, instance, **kwargs):
+    """Collects the recipes whose through rows the delete will cascade"""
+    instance._deleted_recipe_ids = list(
+        instance.recipe_set.values_list('id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def refresh_ids_after_delete(sender, instance, **kwargs):
+    relation = 'tags' if sender is Tag else 'ingredient'
+    refresh_relation_ids(relation, instance._deleted_recipe_ids)
+
+
+@receiver(post_init, sender=Recipe)
+def remember_stats_values(sender, instance, **kwargs):
+    """Keeps the loaded values the stats were last counted with"""
+    values = instance.__dict__
+    if 'time_minutes' in values and 'price' in values:
+        instance._stats_values = (values['time_minutes'], values['price'])
+    else:
+        instance._stats_values = None
+
+
+@receiver(pre_save, sender=Recipe)
+def load_deferred_stats_values(sender, instance, raw, **kwargs):
+    if raw or instance._state.adding or instance._stats_values is not None:
+        return
+    instance._stats_values = (
+        Recipe.objects.filter(pk=instance.pk)
+                      .values_list('time_minutes', 'price')
+                      .first()
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def count_saved_recipe(sender, instance, created, raw, **kwargs):
+    """Adds a new recipe, or the change of an edited one, to the stats"""
+    if raw:
+        return
+    time_minutes, price = as_stats_values(instance.time_minutes,
+                                          instance.price)
+    if created:
+        adjust_recipe_stats(instance.user_id, 1, time_minutes, price)
+    elif instance._stats_values is not None:
+        old_time, old_price = as_stats_values(*instance._stats_values)
+        if (time_minutes, price) != (old_time, old_price):
+            adjust_recipe_stats(instance.user_id, 0,
+                                time_minutes - old_time, price - old_price)
+    instance._stats_values = (time_minutes, price)
+
+
+@receiver(pre_delete, sender=Recipe)
+def remember_stats_before_delete(sender, instance, **kwargs):
+    """Reads the stored values, the instance may be out of date"""
+    instance._deleted_stats_values = (
+        Recipe.objects.filter(pk=instance.pk)
+                      .values_list('time_minutes', 'price', 'tag_ids')
+                      .first()
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def uncount_deleted_recipe(sender, instance, **kwargs):
+    if instance._deleted_stats_values is None:
+        return
+    time_minutes, price, tag_ids = instance._deleted_stats_values
+    adjust_recipe_stats(instance.user_id, -1, -time_minutes, -price)
+    adjust_tag_stats(instance.user_id, {tag: -1 for tag in tag_ids})
+
+
+@receiver(relations_changed, sender=Recipe)
+def count_changed_tags(sender, relation, changes, **kwargs):
+    if relation != 'tags':
+        return
+    for user_id, deltas in tag_deltas(changes).items():
+        adjust_tag_stats(user_id, deltas)
+
+
+@receiver(relations_changed, sender=Recipe)
+def invalidate_changed_ingredients(sender, relation, changes, **kwargs):
+    if relation == 'ingredient':
+        invalidate_ingredient_index(change[1] for change in changes)
+
+
+@receiver(post_save, sender=Recipe)
+def invalidate_created_recipe(sender, instance, created, raw, **kwargs):
+    """A new recipe enters the index even without ingredients"""
+    if created and not raw:
+        invalidate_ingredient_index([instance.user_id])
+
+
+@receiver(post_delete, sender=Recipe)
+def invalidate_deleted_recipe(sender, instance, **kwargs):
+    invalidate_ingredient_index([instance.user_id])
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def record_tombstone(sender, instance, **kwargs):
+    """Logs the deletion for clients syncing with the change feed"""
+    Tombstone.objects.create(
+        user_id=instance.user_id,
+        kind=sender._meta.model_name,
+        object_id=instance.pk
+    )
+
+
+@receiver(post_delete, sender=get_user_model())
+def delete_tombstones_of_user(sender, instance, **kwargs):
+    """Removes the tombstones written while the user's objects cascaded"""
+    Tombstone.objects.filter(user_id=instance.pk).delete()
+
+
+@receiver(post_init, sender=Ingredient)
+def remember_ingredient_name(sender, instance, **kwargs):
+    """Keeps the name the ingredient was loaded with"""
+    instance._stored_name = instance.__dict__.get('name')
+
+
+@receiver(post_save, sender=Ingredient)
+def remember_saved_ingredient_name(sender, instance, update_fields,
+                                   **kwargs):
+    if update_fields is None or 'name' in update_fields:
+        instance._stored_name = instance.name
+
+
+@receiver(pre_save, sender=Ingredient)
+def link_canonical_ingredient(sender, instance, raw, update_fields,
+                              **kwargs):
+    """Points a created or renamed ingredient at its catalogue entry"""
+    if raw or not instance.name:
+        return
+    if update_fields is not None and 'name' not in update_fields:
+        return
+    if (not instance._state.adding and
+            instance.canonical_id is not None and
+            instance._stored_name is not None and
+            normalize_name(instance._stored_name) ==
+            normalize_name(instance.name)):
+        return
+    instance.canonical_id = canonical_ids([instance.name])[0]
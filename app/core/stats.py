@@ -0,0 +1,75 @@
+from collections import Counter
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import F
+
+from core.models import UserRecipeStats, UserTagStats
+
+
+def as_stats_values(time_minutes, price):
+    """Returns recipe values in the types the stats columns add up"""
+    return int(time_minutes), Decimal(str(price))
+
+
+def adjust_recipe_stats(user_id, count, time_minutes, price):
+    """Adds the deltas to the user's recipe totals in one statement"""
+    if count > 0:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO core_userrecipestats AS s
+                  (user_id, recipe_count, total_time_minutes, total_price)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (user_id) DO UPDATE SET
+                  recipe_count = s.recipe_count + EXCLUDED.recipe_count,
+                  total_time_minutes =
+                    s.total_time_minutes + EXCLUDED.total_time_minutes,
+                  total_price = s.total_price + EXCLUDED.total_price
+                """,
+                [user_id, count, time_minutes, price]
+            )
+    else:
+        # a shrinking total always has a row, unless the user is going away
+        UserRecipeStats.objects.filter(user_id=user_id).update(
+            recipe_count=F('recipe_count') + count,
+            total_time_minutes=F('total_time_minutes') + time_minutes,
+            total_price=F('total_price') + price
+        )
+
+
+def adjust_tag_stats(user_id, deltas):
+    """Adds the per tag recipe count deltas of a user, one statement for
+    the tags that gained recipes and one for those that lost some"""
+    gained = {tag: delta for tag, delta in deltas.items() if delta > 0}
+    lost = {tag: delta for tag, delta in deltas.items() if delta < 0}
+
+    if gained:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO core_usertagstats AS s
+                  (user_id, tag_id, recipe_count)
+                SELECT %s, tag_id, delta
+                FROM unnest(%s::integer[], %s::integer[]) AS d(tag_id, delta)
+                ON CONFLICT (user_id, tag_id) DO UPDATE SET
+                  recipe_count = s.recipe_count + EXCLUDED.recipe_count
+                """,
+                [user_id, list(gained), list(gained.values())]
+            )
+    # deleted tags have already lost their row, so never insert here
+    for delta in set(lost.values()):
+        UserTagStats.objects.filter(
+            user_id=user_id,
+            tag_id__in=[tag for tag, d in lost.items() if d == delta]
+        ).update(recipe_count=F('recipe_count') + delta)
+
+
+def tag_deltas(changes):
+    """Folds relations_changed changes into per user tag count deltas"""
+    deltas = {}
+    for recipe_id, user_id, old_ids, new_ids in changes:
+        counter = deltas.setdefault(user_id, Counter())
+        counter.update(set(new_ids) - set(old_ids))
+        counter.subtract(set(old_ids) - set(new_ids))
+    return deltas
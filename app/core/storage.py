@@ -0,0 +1,44 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Stores every distinct file once, named by the sha256 of its content
+    inside the directory of the name it was saved under"""
+    chunk_size = 64 * 1024
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks(self.chunk_size):
+            digest.update(chunk)
+        content.seek(0)
+
+        hexdigest = digest.hexdigest()
+        ext = os.path.splitext(name)[1].lower()
+        return os.path.join(
+            os.path.dirname(name),
+            hexdigest[:2],
+            hexdigest[2:4],
+            hexdigest + ext
+        )
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, content)
+        path = self.path(name)
+        try:
+            # an existing blob is reused; touching it tells gc_media that
+            # an upload referencing it may be in flight
+            os.utime(path)
+            return name
+        except FileNotFoundError:
+            pass
+
+        temp_name = super()._save(
+            self.get_available_name(name + '.tmp'),
+            content
+        )
+        os.replace(self.path(temp_name), path)
+        return name
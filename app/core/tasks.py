@@ -0,0 +1,19 @@
+from core import deletion
+from core.jobs import current_job, report_progress, task
+
+
+@task('delete_account', max_attempts=5)
+def delete_account(user_id, total):
+    """Deletes the account of the user, counting on from where a failed
+    attempt stopped"""
+    progress = {'total': total, 'deleted': 0}
+    job = current_job()
+    if job is not None and job.result:
+        progress.update(job.result)
+
+    def deleted(count):
+        progress['deleted'] += count
+        report_progress(**progress)
+
+    deletion.delete_account(user_id, deleted)
+    return progress
@@ -1,7 +1,12 @@
-from django.test import TestCase, Client
+from unittest.mock import patch
+
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
+from core import models
+from core.admin import EstimatedCountPaginator
+
 
 class AdminSiteTests(TestCase):
 
@@ -40,3 +45,42 @@ class AdminSiteTests(TestCase):
         res = self.client.get(url)
 
         self.assertEqual(res.status_code, 200)
+
+    def test_recipe_pages(self):
+        """Test the recipe changelist, search and change page work"""
+        tag = models.Tag.objects.create(user=self.user, name='vegan')
+        recipe = models.Recipe.objects.create(
+            user=self.user,
+            title='beef fry',
+            time_minutes=5,
+            price=5.90
+        )
+        recipe.tags.add(tag)
+
+        res = self.client.get(
+            reverse('admin:core_recipe_changelist'),
+            {'q': 'BEEF'}
+        )
+        self.assertContains(res, recipe.title)
+
+        res = self.client.get(
+            reverse('admin:core_recipe_change', args=[recipe.id])
+        )
+        self.assertEqual(res.status_code, 200)
+        self.assertContains(res, 'vegan')
+
+    @override_settings(ADMIN_ESTIMATED_COUNT_MIN=1000)
+    def test_estimated_count_paginator(self):
+        """Test large unfiltered lists are counted from the statistics"""
+        models.Tag.objects.create(user=self.user, name='vegan')
+
+        with patch('core.admin.estimated_count', return_value=5000):
+            paginator = EstimatedCountPaginator(
+                models.Tag.objects.order_by('id'), 100
+            )
+            filtered = EstimatedCountPaginator(
+                models.Tag.objects.filter(name='vegan').order_by('id'), 100
+            )
+
+            self.assertEqual(paginator.count, 5000)
+            self.assertEqual(filtered.count, 1)
@@ -0,0 +1,248 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import batch
+from core.models import Tag, Ingredient, Recipe
+
+
+BATCH_URL = reverse('batch')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+RECIPES_URL = reverse('recipe:recipe-list')
+ME_URL = reverse('users:me')
+
+
+def authenticated_client(email):
+    """Returns a client sending the token of a new user and the user"""
+    user = get_user_model().objects.create_user(email, 'testpass')
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}'
+    )
+    return client, user
+
+
+class BatchApiTests(TestCase):
+
+    def setUp(self):
+        self.client, self.user = authenticated_client('batch@test.com')
+
+    def test_login_required(self):
+        res = APIClient().post(
+            BATCH_URL, {'requests': [{'path': TAGS_URL}]}, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_reads_match_separate_requests(self):
+        """Test the responses of a batch equal those of single requests"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        Ingredient.objects.create(user=self.user, name='Salt')
+        Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price=2
+        )
+        paths = [TAGS_URL, INGREDIENTS_URL, RECIPES_URL + '?limit=1', ME_URL]
+
+        res = self.client.post(
+            BATCH_URL,
+            {'requests': [{'path': path} for path in paths]},
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        responses = res.json()['responses']
+        self.assertEqual(len(responses), len(paths))
+        for path, response in zip(paths, responses):
+            single = self.client.get(path)
+            self.assertEqual(response['status'], single.status_code)
+            self.assertEqual(response['body'], single.json())
+
+    def test_authenticates_once(self):
+        """Test the token is looked up for the batch, not each request"""
+        with mock.patch.object(
+            TokenAuthentication, 'authenticate_credentials',
+            autospec=True,
+            side_effect=TokenAuthentication.authenticate_credentials
+        ) as authenticate:
+            res = self.client.post(
+                BATCH_URL,
+                {'requests': [{'path': TAGS_URL}, {'path': ME_URL}]},
+                format='json'
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(authenticate.call_count, 1)
+        self.assertEqual(
+            res.json()['responses'][1]['body']['email'], self.user.email
+        )
+
+    def test_sub_response_content_type(self):
+        """Test a sub-response reports the type its body is rendered as"""
+        res = self.client.post(
+            BATCH_URL,
+            {'requests': [{'path': TAGS_URL}, {'path': ME_URL}]},
+            format='json'
+        )
+
+        for response in res.json()['responses']:
+            self.assertEqual(
+                response['headers']['Content-Type'], 'application/json'
+            )
+
+    def test_paths_outside_api_rejected(self):
+        for path in ('/admin/', BATCH_URL, 'http://evil.com/api/users/me'):
+            res = self.client.post(
+                BATCH_URL, {'requests': [{'path': path}]}, format='json'
+            )
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_too_many_requests_rejected(self):
+        with self.settings(BATCH_MAX_REQUESTS=2):
+            res = self.client.post(
+                BATCH_URL,
+                {'requests': [{'path': TAGS_URL}] * 3},
+                format='json'
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unknown_path_not_found(self):
+        res = self.client.post(
+            BATCH_URL,
+            {'requests': [{'path': '/api/recipe/missing/'}]},
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.json()['responses'][0]['status'], status.HTTP_404_NOT_FOUND
+        )
+
+    def test_writes_are_independent(self):
+        """Test a failed write leaves the other writes of a batch in place"""
+        res = self.client.post(BATCH_URL, {'requests': [
+            {'method': 'POST', 'path': TAGS_URL, 'body': {'name': 'Dessert'}},
+            {'method': 'POST', 'path': TAGS_URL, 'body': {'name': ''}},
+        ]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        statuses = [r['status'] for r in res.json()['responses']]
+        self.assertEqual(
+            statuses,
+            [status.HTTP_201_CREATED, status.HTTP_400_BAD_REQUEST]
+        )
+        self.assertTrue(
+            Tag.objects.filter(user=self.user, name='Dessert').exists()
+        )
+
+    def test_atomic_batch_rolled_back(self):
+        """Test a failed write of an atomic batch undoes the others"""
+        res = self.client.post(BATCH_URL, {'atomic': True, 'requests': [
+            {'method': 'POST', 'path': TAGS_URL, 'body': {'name': 'Dessert'}},
+            {'method': 'POST', 'path': TAGS_URL, 'body': {'name': ''}},
+            {'method': 'POST', 'path': TAGS_URL, 'body': {'name': 'Vegan'}},
+        ]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(res.json()['rolled_back'])
+        self.assertEqual(len(res.json()['responses']), 2)
+        self.assertFalse(Tag.objects.filter(user=self.user).exists())
+
+    def test_atomic_batch_committed(self):
+        res = self.client.post(BATCH_URL, {'atomic': True, 'requests': [
+            {'method': 'POST', 'path': TAGS_URL, 'body': {'name': 'Dessert'}},
+            {'method': 'POST', 'path': TAGS_URL, 'body': {'name': 'Vegan'}},
+        ]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_sub_request_headers(self):
+        """Test an item's headers reach its view, credentials excepted"""
+        item = {
+            'method': 'POST',
+            'path': TAGS_URL,
+            'body': {'name': 'Dessert'},
+            'headers': {'Idempotency-Key': 'abc', 'Authorization': 'x'},
+        }
+
+        res = self.client.post(
+            BATCH_URL, {'requests': [item, item]}, format='json'
+        )
+
+        responses = res.json()['responses']
+        self.assertEqual(responses[0]['status'], status.HTTP_201_CREATED)
+        self.assertEqual(
+            responses[1]['headers'].get('Idempotent-Replayed'), 'true'
+        )
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+
+    def test_atomic_batch_rejects_item_idempotency_keys(self):
+        """Test items of an atomic batch cannot store responses that the
+        batch may roll back"""
+        res = self.client.post(BATCH_URL, {'atomic': True, 'requests': [
+            {'method': 'POST', 'path': TAGS_URL, 'body': {'name': 'Dessert'},
+             'headers': {'Idempotency-Key': 'abc'}},
+            {'method': 'POST', 'path': TAGS_URL, 'body': {'name': ''}},
+        ]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Tag.objects.filter(user=self.user).exists())
+
+        res = self.client.post(
+            TAGS_URL, {'name': 'Dessert'}, HTTP_IDEMPOTENCY_KEY='abc'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', res)
+
+    def test_atomic_batch_idempotency_key(self):
+        """Test a retried atomic batch replays instead of writing again"""
+        body = {'atomic': True, 'requests': [
+            {'method': 'POST', 'path': TAGS_URL, 'body': {'name': 'Dessert'}},
+            {'method': 'POST', 'path': TAGS_URL, 'body': {'name': 'Vegan'}},
+        ]}
+
+        first = self.client.post(
+            BATCH_URL, body, format='json', HTTP_IDEMPOTENCY_KEY='abc'
+        )
+        retry = self.client.post(
+            BATCH_URL, body, format='json', HTTP_IDEMPOTENCY_KEY='abc'
+        )
+
+        self.assertEqual(retry.status_code, status.HTTP_200_OK)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+
+class ParallelBatchApiTests(TransactionTestCase):
+
+    def test_parallel_reads(self):
+        """Test reads run on the thread pool answer like sequential ones"""
+        client, user = authenticated_client('parallel@test.com')
+        for name in ('Vegan', 'Dessert', 'Quick'):
+            Tag.objects.create(user=user, name=name)
+        body = {'requests': [
+            {'path': TAGS_URL}, {'path': ME_URL}, {'path': INGREDIENTS_URL},
+        ]}
+
+        sequential = client.post(BATCH_URL, body, format='json')
+        with mock.patch.object(batch, 'run_parallel',
+                               wraps=batch.run_parallel) as run_parallel:
+            parallel = client.post(
+                BATCH_URL, dict(body, parallel=True), format='json'
+            )
+
+        run_parallel.assert_called_once()
+        self.assertEqual(parallel.status_code, status.HTTP_200_OK)
+        self.assertEqual(parallel.json(), sequential.json())
@@ -0,0 +1,120 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import SimpleTestCase, RequestFactory, override_settings
+
+from core.middleware import CoalescingMiddleware
+
+
+URL = '/api/recipe/recipes/'
+
+
+class CoalescingMiddlewareTests(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.calls = []
+        self.release = threading.Event()
+        self.middleware = CoalescingMiddleware(self._view)
+
+    def _view(self, request):
+        self.calls.append(request)
+        self.release.wait(5)
+        return HttpResponse(f'response {len(self.calls)}',
+                            content_type='application/json')
+
+    def _concurrently(self, *requests):
+        """Runs the requests in threads, the first one leading"""
+        responses = [None] * len(requests)
+
+        def run(index):
+            responses[index] = self.middleware(requests[index])
+
+        threads = [threading.Thread(target=run, args=(index,))
+                   for index in range(len(requests))]
+        threads[0].start()
+        while not self.calls:
+            pass
+        for thread in threads[1:]:
+            thread.start()
+        # time for the followers to reach the flight before it lands
+        time.sleep(0.2)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        return responses
+
+    def test_identical_requests_share_response(self):
+        """Test identical concurrent requests run the view once"""
+        responses = self._concurrently(
+            *[self.factory.get(URL, HTTP_AUTHORIZATION='Token a')] * 3
+        )
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual({r.content for r in responses}, {b'response 1'})
+        self.assertEqual([r.get('Coalesced') for r in responses],
+                         [None, 'true', 'true'])
+        self.assertEqual(responses[1]['Content-Type'], 'application/json')
+        self.assertIsNot(responses[1], responses[2])
+
+    def test_other_clients_and_queries_not_shared(self):
+        """Test requests of other clients or queries run on their own"""
+        self._concurrently(
+            self.factory.get(URL, HTTP_AUTHORIZATION='Token a'),
+            self.factory.get(URL, HTTP_AUTHORIZATION='Token b'),
+            self.factory.get(URL, {'tags': '1'}, HTTP_AUTHORIZATION='Token a'),
+        )
+
+        self.assertEqual(len(self.calls), 3)
+
+    def test_write_forgets_flights(self):
+        """Test reads after a write do not join flights begun before it"""
+        leader = threading.Thread(
+            target=self.middleware,
+            args=(self.factory.get(URL, HTTP_AUTHORIZATION='Token a'),)
+        )
+        leader.start()
+        while not self.calls:
+            pass
+
+        release = self.release
+        self.release = threading.Event()
+        self.release.set()
+        self.middleware(self.factory.post(URL, HTTP_AUTHORIZATION='Token a'))
+        response = self.middleware(
+            self.factory.get(URL, HTTP_AUTHORIZATION='Token a')
+        )
+        release.set()
+        leader.join()
+
+        self.assertEqual(len(self.calls), 3)
+        self.assertFalse(response.has_header('Coalesced'))
+
+    def test_uncoalesced_paths(self):
+        """Test requests outside COALESCE_PATHS are left alone"""
+        self.release.set()
+        self.middleware(self.factory.get('/admin/'))
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertFalse(self.middleware.flights)
+
+    @override_settings(COALESCE_SHARED=True)
+    def test_shared_flight_of_other_process(self):
+        """Test a request joins a flight another process runs"""
+        request = self.factory.get(URL, HTTP_AUTHORIZATION='Token a')
+        key = 'coalesce:' + self.middleware._key(
+            request,
+            self.middleware._identity(request)
+        )
+        cache.set(key, 'other')
+        cache.set(key + ':other', (200, [('Content-Type', 'text/csv')],
+                                   b'shared'))
+        self.addCleanup(cache.delete_many, [key, key + ':other'])
+
+        response = self.middleware(request)
+
+        self.assertEqual(self.calls, [])
+        self.assertEqual(response.content, b'shared')
+        self.assertEqual(response['Content-Type'], 'text/csv')
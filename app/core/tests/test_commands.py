@@ -1,7 +1,14 @@
+from datetime import timedelta
+from io import StringIO
 from unittest.mock import patch
-from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
 from django.db.utils import OperationalError
 from django.test import TestCase
+from django.utils import timezone
+
+from core.models import Recipe, Tag, Tombstone, UserRecipeStats, \
+                        UserTagStats
 
 
 class CommandTests(TestCase):
@@ -20,3 +27,89 @@ class CommandTests(TestCase):
             gi.side_effect = [OperationalError] * 5 + [True]
             call_command('wait_for_db')
             self.assertEqual(gi.call_count, 6)
+
+    def test_rebuild_relation_ids(self):
+        """Test stale id arrays are reported and rebuilt"""
+        user = get_user_model().objects.create_user(
+            'test@pokemail.net',
+            'pass3'
+        )
+        recipe = Recipe.objects.create(
+            user=user,
+            title='beef fry',
+            time_minutes=5,
+            price=5.90
+        )
+        tag = Tag.objects.create(user=user, name='vegan')
+        recipe.tags.add(tag)
+        Recipe.objects.filter(id=recipe.id).update(tag_ids=[])
+
+        out = StringIO()
+        with self.assertRaisesMessage(CommandError, 'out of date'):
+            call_command('rebuild_relation_ids', '--check', stdout=out)
+        self.assertIn('tags: 1 stale recipes', out.getvalue())
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.tag_ids, [])
+
+        call_command('rebuild_relation_ids', stdout=StringIO())
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.tag_ids, [tag.id])
+
+        out = StringIO()
+        call_command('rebuild_relation_ids', '--check', stdout=out)
+        self.assertIn('Id arrays consistent', out.getvalue())
+
+    def test_reconcile_recipe_stats(self):
+        """Test drifted recipe statistics are recomputed"""
+        user = get_user_model().objects.create_user(
+            'test@pokemail.net',
+            'pass3'
+        )
+        recipe = Recipe.objects.create(
+            user=user,
+            title='beef fry',
+            time_minutes=5,
+            price=5.90
+        )
+        recipe.tags.add(Tag.objects.create(user=user, name='vegan'))
+        Recipe.objects.filter(id=recipe.id).update(time_minutes=7)
+        UserTagStats.objects.update(recipe_count=3)
+
+        out = StringIO()
+        call_command('reconcile_recipe_stats', stdout=out)
+
+        self.assertIn('recipe stats: 1 drifted', out.getvalue())
+        self.assertIn('tag stats: 1 drifted', out.getvalue())
+        stats = UserRecipeStats.objects.get(user=user)
+        self.assertEqual(stats.total_time_minutes, 7)
+        self.assertEqual(UserTagStats.objects.get().recipe_count, 1)
+
+    def test_prune_tombstones(self):
+        """Test only tombstones past the sync retention are pruned"""
+        user = get_user_model().objects.create_user(
+            'test@pokemail.net',
+            'pass3'
+        )
+        kept = Tombstone.objects.create(user=user, kind='tag', object_id=1)
+        Tombstone.objects.create(
+            user=user,
+            kind='tag',
+            object_id=2,
+            deleted_at=timezone.now() - timedelta(days=365)
+        )
+
+        out = StringIO()
+        call_command('prune_tombstones', stdout=out)
+
+        self.assertEqual(list(Tombstone.objects.all()), [kept])
+        self.assertIn('Pruned 1 tombstones', out.getvalue())
+
+    def test_startup_profile(self):
+        """Test import and first request times of the application"""
+        out = StringIO()
+        call_command('startup_profile', target=['wsgi'], top=3, stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('app.wsgi: imported in', output)
+        self.assertIn('slowest imports', output)
+        self.assertIn('django', output)
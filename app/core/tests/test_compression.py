@@ -0,0 +1,78 @@
+import gzip
+import unittest
+import zlib
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import SimpleTestCase, RequestFactory
+
+from core import middleware
+from core.middleware import CompressionMiddleware
+
+
+BODY = b'{"title": "soup"}' * 100
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def _call(self, response, accept='gzip, deflate'):
+        request = self.factory.get('/', HTTP_ACCEPT_ENCODING=accept)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_gzip_response(self):
+        """Test large bodies are gzipped for clients accepting gzip"""
+        response = self._call(
+            HttpResponse(BODY, content_type='application/json')
+        )
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(int(response['Content-Length']),
+                         len(response.content))
+        self.assertEqual(gzip.decompress(response.content), BODY)
+
+    def test_not_accepted(self):
+        """Test clients not accepting gzip get the plain body"""
+        response = self._call(HttpResponse(BODY), accept='gzip;q=0')
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, BODY)
+
+    def test_small_and_compressed_bodies_skipped(self):
+        """Test small bodies and compressed media are left as is"""
+        small = self._call(HttpResponse(b'{}'))
+        jpeg = self._call(HttpResponse(BODY, content_type='image/jpeg'))
+
+        self.assertFalse(small.has_header('Content-Encoding'))
+        self.assertFalse(jpeg.has_header('Content-Encoding'))
+        self.assertEqual(jpeg.content, BODY)
+
+    def test_streaming_response(self):
+        """Test streaming bodies are compressed chunk by chunk"""
+        produced = []
+
+        def chunks():
+            for i in range(3):
+                produced.append(i)
+                yield BODY
+
+        response = self._call(StreamingHttpResponse(chunks()))
+        stream = iter(response.streaming_content)
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        first = decompressor.decompress(next(stream))
+        self.assertEqual(first, BODY)
+        self.assertEqual(produced, [0])
+        rest = b''.join(decompressor.decompress(chunk) for chunk in stream)
+        self.assertEqual(first + rest, BODY * 3)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    @unittest.skipIf(middleware.brotli is None, 'brotli is not installed')
+    def test_brotli_preferred(self):
+        """Test brotli is used when both client and server support it"""
+        response = self._call(HttpResponse(BODY), accept='gzip, br')
+
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(middleware.brotli.decompress(response.content), BODY)
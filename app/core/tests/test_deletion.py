@@ -0,0 +1,113 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from core import models
+from core.deletion import delete_recipes, request_account_deletion
+from core.jobs import Worker
+
+
+def sample_user(email='test@pokemail.net'):
+    return get_user_model().objects.create_user(email, 'pass3')
+
+
+def sample_recipe(user, time_minutes=10, price=5.50):
+    return models.Recipe.objects.create(
+        user=user,
+        title='beef fry',
+        time_minutes=time_minutes,
+        price=price
+    )
+
+
+class DeletionTests(TestCase):
+    """Tests for the set based deletion of recipes and accounts"""
+
+    def setUp(self):
+        self.user = sample_user()
+        self.tag = models.Tag.objects.create(user=self.user, name='vegan')
+        self.ingredient = models.Ingredient.objects.create(
+            user=self.user,
+            name='salt'
+        )
+
+    def _tagged_recipe(self, *args):
+        recipe = sample_recipe(self.user, *args)
+        recipe.tags.add(self.tag)
+        recipe.ingredient.add(self.ingredient)
+        return recipe
+
+    def test_delete_recipes_updates_related(self):
+        """Test bulk deleted recipes leave stats and feed consistent"""
+        deleted = self._tagged_recipe(10, 5.50)
+        kept = self._tagged_recipe(20, 4.25)
+        other = sample_recipe(sample_user('other@pokemail.net'))
+
+        ids = delete_recipes(self.user.id, [deleted.id, other.id])
+
+        self.assertEqual(ids, [deleted.id])
+        self.assertEqual(
+            list(models.Recipe.objects.order_by('id')),
+            [kept, other]
+        )
+        self.assertEqual(
+            models.Recipe.tags.through.objects.get().recipe_id,
+            kept.id
+        )
+        stats = models.UserRecipeStats.objects.get(user=self.user)
+        self.assertEqual(
+            (stats.recipe_count, stats.total_time_minutes, stats.total_price),
+            (1, 20, Decimal('4.25'))
+        )
+        self.assertEqual(
+            models.UserTagStats.objects.get(tag=self.tag).recipe_count,
+            1
+        )
+        tombstone = models.Tombstone.objects.get()
+        self.assertEqual(
+            (tombstone.kind, tombstone.object_id),
+            ('recipe', deleted.id)
+        )
+
+    def test_account_deletion_runs_as_job(self):
+        """Test a requested account deletion is run by a queue worker and
+        removes the account"""
+        for _ in range(3):
+            self._tagged_recipe()
+        other_user = sample_user('other@pokemail.net')
+        other = sample_recipe(other_user)
+
+        job = request_account_deletion(self.user)
+        self.assertEqual(job.task, 'delete_account')
+        self.assertEqual(job.payload, {'user_id': self.user.pk, 'total': 5})
+
+        Worker().run_once()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, models.Job.DONE)
+        self.assertEqual(job.result, {'deleted': 5, 'total': 5})
+        self.assertIsNone(job.user)
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(list(get_user_model().objects.all()), [other_user])
+        self.assertEqual(list(models.Recipe.objects.all()), [other])
+        self.assertFalse(models.Tag.objects.exists())
+        self.assertFalse(models.Ingredient.objects.exists())
+        self.assertFalse(models.UserTagStats.objects.exists())
+        self.assertFalse(models.Tombstone.objects.exists())
+
+    def test_account_deletion_resumes(self):
+        """Test a retried deletion counts on from the progress reported
+        by the failed attempt"""
+        for _ in range(2):
+            self._tagged_recipe()
+        job = request_account_deletion(self.user)
+        job.result = {'total': 4, 'deleted': 1}
+        job.save(update_fields=['result'])
+
+        with self.settings(DELETION_BATCH_SIZE=1):
+            Worker().run_once()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, models.Job.DONE)
+        self.assertEqual(job.result, {'deleted': 5, 'total': 4})
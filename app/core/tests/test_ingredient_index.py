@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core import models
+from core.ingredient_index import IngredientIndex, IngredientIndexCache
+
+
+class IngredientIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        self.index = IngredientIndex('v1', [
+            (1, [10, 11]),
+            (2, [10, 12, 13]),
+            (3, []),
+            (4, [11]),
+        ])
+
+    def test_cookable_subsets(self):
+        """Test recipes needing only the given ingredients are found"""
+        self.assertEqual(
+            self.index.cookable([10, 11, 99]),
+            [(4, []), (3, []), (1, [])]
+        )
+
+    def test_cookable_ranked_by_missing(self):
+        """Test recipes missing a few ingredients come after, fewest first"""
+        self.assertEqual(
+            self.index.cookable([10], max_missing=2),
+            [(3, []), (4, [11]), (1, [11]), (2, [12, 13])]
+        )
+        self.assertEqual(
+            self.index.cookable([10], max_missing=2, limit=2),
+            [(3, []), (4, [11])]
+        )
+
+
+class IngredientIndexCacheTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@pokemail.net',
+            'pass3'
+        )
+        self.salt = models.Ingredient.objects.create(
+            user=self.user,
+            name='salt'
+        )
+        self.recipe = models.Recipe.objects.create(
+            user=self.user,
+            title='beef fry',
+            time_minutes=5,
+            price=5.90
+        )
+        self.cache = IngredientIndexCache()
+
+    def test_index_reused_until_changed(self):
+        """Test the index is built once and rebuilt after m2m changes"""
+        index = self.cache.get(self.user.id)
+        self.assertIs(self.cache.get(self.user.id), index)
+        self.assertEqual(index.cookable([]), [(self.recipe.id, [])])
+
+        self.recipe.ingredient.add(self.salt)
+
+        index = self.cache.get(self.user.id)
+        self.assertEqual(index.cookable([]), [])
+        self.assertEqual(index.cookable([self.salt.id]),
+                         [(self.recipe.id, [])])
+
+    def test_index_rebuilt_after_recipe_deleted(self):
+        """Test a deleted recipe without ingredients leaves the index"""
+        self.cache.get(self.user.id)
+
+        self.recipe.delete()
+
+        self.assertEqual(self.cache.get(self.user.id).cookable([]), [])
+
+    @override_settings(INGREDIENT_INDEX_MAX_BYTES=1)
+    def test_oversized_index_not_kept(self):
+        """Test indexes over the memory bound are not cached"""
+        index = self.cache.get(self.user.id)
+
+        self.assertIsNot(self.cache.get(self.user.id), index)
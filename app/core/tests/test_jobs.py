@@ -0,0 +1,141 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from core import jobs
+from core.models import Job
+
+
+calls = []
+
+
+@jobs.task('tests.record', max_attempts=2)
+def record(value):
+    calls.append(value)
+    if value == 'fail':
+        raise ValueError('failed')
+    return {'value': value}
+
+
+class JobTests(TestCase):
+    """Tests for the database backed job queue"""
+
+    def setUp(self):
+        calls.clear()
+        self.worker = jobs.Worker('test-worker')
+
+    def test_enqueue_and_run(self):
+        """Test a queued job is claimed, run and its result stored"""
+        job = jobs.enqueue('tests.record', {'value': 'a'})
+        self.assertEqual((job.status, job.max_attempts), (Job.QUEUED, 2))
+
+        ran = self.worker.run_once()
+
+        self.assertEqual(ran.pk, job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.result, {'value': 'a'})
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual((job.locked_at, job.locked_by), (None, ''))
+        self.assertIsNone(self.worker.run_once())
+
+    def test_priority_and_delay(self):
+        """Test higher priorities run first and delayed jobs wait"""
+        jobs.enqueue('tests.record', {'value': 'low'})
+        jobs.enqueue('tests.record', {'value': 'later'}, priority=9,
+                     delay=60)
+        jobs.enqueue('tests.record', {'value': 'high'}, priority=5)
+
+        while self.worker.run_once():
+            pass
+
+        self.assertEqual(calls, ['high', 'low'])
+
+    def test_dedup_key(self):
+        """Test a key has at most one queued or running job"""
+        job = jobs.enqueue('tests.record', {'value': 'a'}, dedup_key='k')
+        again = jobs.enqueue('tests.record', {'value': 'b'}, dedup_key='k')
+        self.assertEqual(again.pk, job.pk)
+
+        self.worker.run_once()
+        later = jobs.enqueue('tests.record', {'value': 'c'}, dedup_key='k')
+
+        self.assertNotEqual(later.pk, job.pk)
+        self.assertEqual(Job.objects.count(), 2)
+
+    def test_retry_with_backoff(self):
+        """Test a failed job is retried later, then marked failed"""
+        job = jobs.enqueue('tests.record', {'value': 'fail'})
+
+        with self.assertLogs('core.jobs', 'ERROR'):
+            self.worker.run_once()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('ValueError', job.error)
+        self.assertIsNone(self.worker.run_once())
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('core.jobs', 'ERROR'):
+            self.worker.run_once()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertEqual(calls, ['fail', 'fail'])
+
+    def test_retry_delay_grows(self):
+        """Test the backoff doubles per attempt up to the maximum"""
+        with patch('core.jobs.random.uniform', return_value=1), \
+                self.settings(JOB_RETRY_BACKOFF=10,
+                              JOB_RETRY_BACKOFF_MAX=60):
+            delays = [jobs.retry_delay(attempt) for attempt in (1, 2, 3, 4)]
+
+        self.assertEqual(delays, [10, 20, 40, 60])
+
+    def test_requeue_stale_jobs(self):
+        """Test jobs of dead workers are queued again or failed"""
+        long_ago = timezone.now() - timedelta(days=1)
+        stale = Job.objects.create(task='tests.record', status=Job.RUNNING,
+                                   attempts=1, max_attempts=2,
+                                   locked_at=long_ago)
+        spent = Job.objects.create(task='tests.record', status=Job.RUNNING,
+                                   attempts=2, max_attempts=2,
+                                   locked_at=long_ago)
+        running = Job.objects.create(task='tests.record', status=Job.RUNNING,
+                                     locked_at=timezone.now())
+
+        self.assertEqual(jobs.requeue_stale_jobs(), (1, 1))
+
+        statuses = dict(Job.objects.values_list('id', 'status'))
+        self.assertEqual(statuses[stale.pk], Job.QUEUED)
+        self.assertEqual(statuses[spent.pk], Job.FAILED)
+        self.assertEqual(statuses[running.pk], Job.RUNNING)
+
+    def test_prune_jobs(self):
+        """Test finished jobs are deleted after the retention"""
+        Job.objects.create(task='tests.record', status=Job.DONE,
+                           finished_at=timezone.now() - timedelta(days=30))
+        kept = Job.objects.create(task='tests.record', status=Job.DONE,
+                                  finished_at=timezone.now())
+
+        self.assertEqual(jobs.prune_jobs(), 1)
+        self.assertEqual(list(Job.objects.all()), [kept])
+
+    def test_run_worker_burst(self):
+        """Test the worker command runs the due jobs and exits"""
+        user = get_user_model().objects.create_user('test@pokemail.net',
+                                                    'pass3')
+        for value in ('a', 'b'):
+            jobs.enqueue('tests.record', {'value': value}, user=user)
+
+        out = StringIO()
+        call_command('run_worker', concurrency=1, burst=True, stdout=out)
+
+        self.assertEqual(sorted(calls), ['a', 'b'])
+        self.assertFalse(Job.objects.exclude(status=Job.DONE).exists())
+        self.assertIn('Worker stopped', out.getvalue())
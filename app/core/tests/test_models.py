@@ -1,9 +1,14 @@
+from decimal import Decimal
 from unittest.mock import patch
 
 from core import models
+from core.relations import attach_relations, detach_relations, \
+                           resolve_names
 
+from django.db import connection
 from django.db.utils import IntegrityError
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 
 
@@ -70,6 +75,40 @@ class ModelTests(TestCase):
         )
         self.assertEqual(str(ingredient), ingredient.name)
 
+    def test_ingredients_share_canonical_name(self):
+        """Test ingredients of different users link to one canonical"""
+        user2 = sample_user('test2@pokemail.net')
+        ingredient = models.Ingredient.objects.create(
+            user=sample_user(),
+            name='Sea  Salt'
+        )
+        ingredient2, = resolve_names(models.Ingredient, user2, ['sea salt'])
+        ingredient2.refresh_from_db()
+
+        self.assertEqual(ingredient.canonical.name, 'sea salt')
+        self.assertEqual(ingredient2.canonical_id, ingredient.canonical_id)
+        self.assertEqual(models.CanonicalIngredient.objects.count(), 1)
+
+    def test_canonical_resolved_only_on_rename(self):
+        """Test saving an ingredient resolves its canonical name only when
+        created or renamed"""
+        ingredient = models.Ingredient.objects.create(
+            user=sample_user(),
+            name='Salt'
+        )
+
+        with patch('core.signals.canonical_ids') as canonical_ids:
+            ingredient.save()
+            models.Ingredient.objects.get(id=ingredient.id).save()
+            ingredient.name = 'Sea salt'
+            ingredient.save(update_fields=['user'])
+            canonical_ids.assert_not_called()
+
+        ingredient.save()
+        ingredient.refresh_from_db()
+        self.assertEqual(ingredient.name, 'Sea salt')
+        self.assertEqual(ingredient.canonical.name, 'sea salt')
+
     def test_recipe_str(self):
         """Test recipe string representation"""
         recipe = models.Recipe.objects.create(
@@ -89,3 +128,166 @@ class ModelTests(TestCase):
 
         exp_path = f'uploads/recipe/{uuid}.jpg'
         self.assertEqual(file_path, exp_path)
+
+
+class RecipeRelationIdsTests(TestCase):
+    """Tests for the denormalized tag and ingredient id arrays"""
+
+    def setUp(self):
+        self.user = sample_user()
+        self.recipe = models.Recipe.objects.create(
+            user=self.user,
+            title='beef fry',
+            time_minutes=5,
+            price=5.90
+        )
+        self.tag1 = models.Tag.objects.create(user=self.user, name='tag1')
+        self.tag2 = models.Tag.objects.create(user=self.user, name='tag2')
+
+    def _stored_tag_ids(self):
+        return models.Recipe.objects.get(id=self.recipe.id).tag_ids
+
+    def test_ids_follow_m2m_writes(self):
+        """Test adding, removing and clearing tags updates the array"""
+        self.recipe.tags.add(self.tag2, self.tag1)
+        expected = sorted([self.tag1.id, self.tag2.id])
+        self.assertEqual(self.recipe.tag_ids, expected)
+        self.assertEqual(self._stored_tag_ids(), expected)
+
+        self.recipe.tags.remove(self.tag1)
+        self.assertEqual(self._stored_tag_ids(), [self.tag2.id])
+
+        self.recipe.tags.clear()
+        self.assertEqual(self._stored_tag_ids(), [])
+
+    def test_ids_follow_reverse_m2m_writes(self):
+        """Test writes from the tag side update the recipe array"""
+        self.tag1.recipe_set.add(self.recipe)
+        self.assertEqual(self._stored_tag_ids(), [self.tag1.id])
+
+        self.tag1.recipe_set.clear()
+        self.assertEqual(self._stored_tag_ids(), [])
+
+    def test_ids_follow_deleted_objects(self):
+        """Test deleting a tag or ingredient drops it from the arrays"""
+        ingredient = models.Ingredient.objects.create(
+            user=self.user,
+            name='salt'
+        )
+        self.recipe.tags.add(self.tag1, self.tag2)
+        self.recipe.ingredient.add(ingredient)
+
+        self.tag1.delete()
+        ingredient.delete()
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.tag_ids, [self.tag2.id])
+        self.assertEqual(self.recipe.ingredient_ids, [])
+
+    def test_ids_follow_bulk_assignment(self):
+        """Test set-based assignment updates the array"""
+        attach_relations(self.user, 'tags', [self.recipe.id], [self.tag1.id])
+        self.assertEqual(self._stored_tag_ids(), [self.tag1.id])
+
+        detach_relations(self.user, 'tags', [self.recipe.id], [self.tag1.id])
+        self.assertEqual(self._stored_tag_ids(), [])
+
+    def test_stale_save_keeps_ids(self):
+        """Test saving an instance loaded before an attach keeps the ids"""
+        stale = models.Recipe.objects.get(id=self.recipe.id)
+        attach_relations(self.user, 'tags', [self.recipe.id], [self.tag1.id])
+
+        stale.title = 'beef stew'
+        stale.save()
+
+        self.assertEqual(self._stored_tag_ids(), [self.tag1.id])
+        self.assertEqual(
+            models.UserTagStats.objects.get(tag=self.tag1).recipe_count, 1
+        )
+
+    def test_partial_save_skips_deferred_fields(self):
+        """Test saving a partly loaded recipe writes only loaded fields"""
+        partial = models.Recipe.objects.only('id', 'user', 'title').get(
+            id=self.recipe.id
+        )
+
+        partial.title = 'beef stew'
+        with CaptureQueriesContext(connection) as queries:
+            partial.save()
+
+        update = next(
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE "core_recipe"')
+        )
+        self.assertIn('"title"', update)
+        self.assertNotIn('"price"', update)
+        self.assertNotIn('"link"', update)
+
+
+class RecipeStatsTests(TestCase):
+    """Tests for the incrementally maintained recipe statistics"""
+
+    def setUp(self):
+        self.user = sample_user()
+        self.tag = models.Tag.objects.create(user=self.user, name='vegan')
+
+    def _create_recipe(self, time_minutes, price):
+        return models.Recipe.objects.create(
+            user=self.user,
+            title='beef fry',
+            time_minutes=time_minutes,
+            price=price
+        )
+
+    def _stats(self):
+        stats = models.UserRecipeStats.objects.get(user=self.user)
+        return (stats.recipe_count, stats.total_time_minutes,
+                stats.total_price)
+
+    def _tag_count(self):
+        return models.UserTagStats.objects.get(tag=self.tag).recipe_count
+
+    def test_stats_follow_recipe_changes(self):
+        """Test creating, editing and deleting recipes updates the totals"""
+        recipe = self._create_recipe(10, 5.50)
+        self._create_recipe(20, 4.25)
+        self.assertEqual(self._stats(), (2, 30, Decimal('9.75')))
+
+        recipe.time_minutes = 15
+        recipe.save()
+        recipe = models.Recipe.objects.get(id=recipe.id)
+        recipe.price = Decimal('1.50')
+        recipe.save()
+        self.assertEqual(self._stats(), (2, 35, Decimal('5.75')))
+
+        recipe.delete()
+        self.assertEqual(self._stats(), (1, 20, Decimal('4.25')))
+
+    def test_tag_stats_follow_tag_changes(self):
+        """Test tagging, untagging and deleting recipes updates tag counts"""
+        recipe1 = self._create_recipe(10, 5.50)
+        recipe2 = self._create_recipe(20, 4.25)
+        recipe1.tags.add(self.tag)
+        self.tag.recipe_set.add(recipe2)
+        self.assertEqual(self._tag_count(), 2)
+
+        recipe1.tags.remove(self.tag)
+        self.assertEqual(self._tag_count(), 1)
+
+        recipe2.delete()
+        self.assertEqual(self._tag_count(), 0)
+
+    def test_tag_stats_removed_with_tag(self):
+        """Test deleting a tag drops its statistics"""
+        self._create_recipe(10, 5.50).tags.add(self.tag)
+        self.tag.delete()
+
+        self.assertFalse(models.UserTagStats.objects.exists())
+
+    def test_delete_user_with_stats(self):
+        """Test deleting a user cascades through recipes and stats"""
+        self._create_recipe(10, 5.50).tags.add(self.tag)
+        self.user.delete()
+
+        self.assertFalse(models.UserRecipeStats.objects.exists())
+        self.assertFalse(models.UserTagStats.objects.exists())
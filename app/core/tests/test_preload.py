@@ -0,0 +1,36 @@
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from core import preload
+
+
+class PreloadTests(SimpleTestCase):
+
+    @patch.dict('os.environ', {'APP_PRELOAD': ''})
+    @patch('core.preload.gc')
+    def test_disabled_by_default(self, gc):
+        """Test nothing is warmed or frozen without APP_PRELOAD"""
+        preload.begin()
+        preload.complete()
+
+        gc.disable.assert_not_called()
+        gc.freeze.assert_not_called()
+
+    @patch.dict('os.environ', {'APP_PRELOAD': '1'})
+    @patch('core.preload.gc')
+    def test_complete_freezes_warmed_objects(self, gc):
+        """Test the preloaded objects are moved out of collections"""
+        preload.begin()
+        preload.complete()
+
+        gc.disable.assert_called_once_with()
+        gc.freeze.assert_called_once_with()
+        gc.enable.assert_called_once_with()
+
+    def test_project_serializers(self):
+        """Test only the serializers of the project are warmed"""
+        names = {cls.__name__ for cls in preload._project_serializers()}
+
+        self.assertIn('RecipeSerializer', names)
+        self.assertNotIn('ModelSerializer', names)
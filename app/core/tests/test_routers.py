@@ -0,0 +1,66 @@
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import SimpleTestCase, RequestFactory, override_settings
+
+from core.middleware import ReplicaRoutingMiddleware
+from core.models import Recipe
+from core.routers import ReplicaRouter, choose_replica
+
+
+RECIPE_PATH = '/api/recipe/recipe/'
+
+
+@override_settings(DATABASE_REPLICAS={'replica': 1})
+class ReplicaRoutingTests(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = ReplicaRouter()
+        self.read_aliases = []
+        self.middleware = ReplicaRoutingMiddleware(self._view)
+        cache.clear()
+
+    def _view(self, request):
+        """records the alias reads are routed to"""
+        self.read_aliases.append(self.router.db_for_read(Recipe))
+        return HttpResponse()
+
+    def test_choose_replica_by_weight(self):
+        """Test replicas with zero weight are never chosen"""
+        with self.settings(DATABASE_REPLICAS={'a': 0, 'b': 1}):
+            self.assertEqual(choose_replica(), 'b')
+        with self.settings(DATABASE_REPLICAS={}):
+            self.assertIsNone(choose_replica())
+
+    def test_reads_routed_to_replica(self):
+        """Test safe requests on api paths read from a replica"""
+        self.middleware(self.factory.get(RECIPE_PATH))
+        self.middleware(self.factory.get('/admin/'))
+
+        self.assertEqual(self.read_aliases, ['replica', None])
+        self.assertIsNone(self.router.db_for_read(Recipe))
+
+    def test_writes_pin_cookie_to_primary(self):
+        """Test a client that wrote recently reads from the primary"""
+        response = self.middleware(self.factory.post(RECIPE_PATH))
+        self.assertIn('db_pin', response.cookies)
+        self.factory.cookies['db_pin'] = '1'
+
+        self.middleware(self.factory.get(RECIPE_PATH))
+
+        self.assertEqual(self.read_aliases, [None, None])
+
+    def test_writes_pin_token_to_primary(self):
+        """Test pinning follows the auth token without cookies"""
+        auth = {'HTTP_AUTHORIZATION': 'Token abc'}
+        self.middleware(self.factory.post(RECIPE_PATH, **auth))
+
+        self.middleware(self.factory.get(RECIPE_PATH, **auth))
+        self.middleware(self.factory.get(RECIPE_PATH))
+
+        self.assertEqual(self.read_aliases, [None, None, 'replica'])
+
+    def test_replicas_not_migrated(self):
+        """Test migrations only run against the primary"""
+        self.assertFalse(self.router.allow_migrate('replica', 'core'))
+        self.assertIsNone(self.router.allow_migrate('default', 'core'))
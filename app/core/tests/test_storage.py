@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core.models import Recipe
+from core.storage import ContentAddressedStorage
+
+
+class StorageTestCase(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.storage = ContentAddressedStorage()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def _age(self, name, seconds):
+        """Backdates the file so it is outside the gc grace period"""
+        past = time.time() - seconds
+        os.utime(self.storage.path(name), (past, past))
+
+
+class ContentAddressedStorageTests(StorageTestCase):
+
+    def test_identical_content_stored_once(self):
+        """Test saving the same content twice returns the same file"""
+        first = self.storage.save('uploads/recipe/a.JPG', ContentFile(b'x'))
+        second = self.storage.save('uploads/recipe/b.jpg', ContentFile(b'x'))
+
+        self.assertEqual(first, second)
+        self.assertTrue(first.startswith('uploads/recipe/'))
+        self.assertTrue(first.endswith('.jpg'))
+        directory = os.path.dirname(self.storage.path(first))
+        self.assertEqual(os.listdir(directory), [os.path.basename(first)])
+
+    def test_different_content_stored_apart(self):
+        """Test different content is stored in different files"""
+        first = self.storage.save('uploads/recipe/a.jpg', ContentFile(b'x'))
+        second = self.storage.save('uploads/recipe/a.jpg', ContentFile(b'y'))
+
+        self.assertNotEqual(first, second)
+        with self.storage.open(second) as f:
+            self.assertEqual(f.read(), b'y')
+
+    def test_reuse_refreshes_modified_time(self):
+        """Test reusing a stored file protects it from the gc"""
+        name = self.storage.save('uploads/recipe/a.jpg', ContentFile(b'x'))
+        self._age(name, 7200)
+
+        self.storage.save('uploads/recipe/b.jpg', ContentFile(b'x'))
+
+        mtime = os.stat(self.storage.path(name)).st_mtime
+        self.assertGreater(mtime, time.time() - 60)
+
+
+class GcMediaCommandTests(StorageTestCase):
+
+    def setUp(self):
+        super().setUp()
+        user = get_user_model().objects.create_user(
+            'test@pokemail.net',
+            'pass3'
+        )
+        self.recipe = Recipe.objects.create(
+            user=user,
+            title='beef fry',
+            time_minutes=5,
+            price=5.90
+        )
+
+    def test_unreferenced_files_deleted(self):
+        """Test only old files no recipe refers to are deleted"""
+        used = self.storage.save('uploads/recipe/a.jpg', ContentFile(b'a'))
+        unused = self.storage.save('uploads/recipe/b.jpg', ContentFile(b'b'))
+        recent = self.storage.save('uploads/recipe/c.jpg', ContentFile(b'c'))
+        Recipe.objects.filter(id=self.recipe.id).update(image=used)
+        self._age(used, 7200)
+        self._age(unused, 7200)
+
+        out = StringIO()
+        call_command('gc_media', stdout=out)
+
+        self.assertTrue(self.storage.exists(used))
+        self.assertFalse(self.storage.exists(unused))
+        self.assertTrue(self.storage.exists(recent))
+        self.assertIn('Scanned 3 files, deleted 1', out.getvalue())
+
+    def test_dry_run_keeps_files(self):
+        """Test a dry run only reports what it would delete"""
+        unused = self.storage.save('uploads/recipe/b.jpg', ContentFile(b'b'))
+        self._age(unused, 7200)
+
+        out = StringIO()
+        call_command('gc_media', '--dry-run', '--batch-size=1', stdout=out)
+
+        self.assertTrue(self.storage.exists(unused))
+        self.assertIn('would delete 1', out.getvalue())
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Upload is too large.'
+    default_code = 'upload_too_large'
+
+
+class BoundedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """Streams uploads to a temporary file in chunks and aborts as soon as
+    a request or file grows past MAX_UPLOAD_SIZE"""
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        if content_length > settings.MAX_UPLOAD_SIZE + 64 * 1024:
+            raise UploadTooLarge()
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.MAX_UPLOAD_SIZE:
+            self.file.close()
+            raise UploadTooLarge()
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        self.received = 0
+        return super().file_complete(file_size)
@@ -0,0 +1,5 @@
+"""Load generator driving a running server over HTTP, standard library only.
+
+    python -m loadtest loadtest/scenarios/mixed.json \\
+        --base-url http://127.0.0.1:8000 --rate 200 --concurrency 32
+"""
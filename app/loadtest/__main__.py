@@ -0,0 +1,58 @@
+import argparse
+import asyncio
+import json
+import sys
+
+from loadtest.client import HTTPError
+from loadtest.runner import report, run, summary
+from loadtest.scenario import ScenarioError, load_scenario
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m loadtest',
+        description='Send the request mix of a scenario to a running server'
+    )
+    parser.add_argument('scenario', help='JSON scenario file')
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--rate', type=float,
+                        help='Target requests per second over all '
+                             'connections, omit to send back to back')
+    parser.add_argument('--concurrency', type=int,
+                        help='Number of connections')
+    parser.add_argument('--duration', type=float, help='Seconds measured')
+    parser.add_argument('--warmup', type=float,
+                        help='Seconds sent before measuring')
+    parser.add_argument('--interval', type=float, default=1.0,
+                        help='Seconds between throughput lines')
+    parser.add_argument('--json', dest='json_path',
+                        help='Also write the results to this file')
+    args = parser.parse_args(argv)
+
+    try:
+        scenario = load_scenario(
+            args.scenario,
+            rate=args.rate,
+            concurrency=args.concurrency,
+            duration=args.duration,
+            warmup=args.warmup
+        )
+    except (OSError, ScenarioError) as exc:
+        parser.error(str(exc))
+
+    try:
+        stats = asyncio.run(run(scenario, args.base_url,
+                                report_interval=args.interval))
+    except (OSError, RuntimeError, HTTPError) as exc:
+        sys.stderr.write(f'{exc}\n')
+        return 1
+
+    sys.stdout.write('\n' + summary(stats, scenario))
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report(stats, scenario), f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import ssl
+import struct
+import uuid
+import zlib
+from urllib.parse import urlsplit
+
+
+class HTTPError(Exception):
+    """The request failed before a complete response arrived"""
+
+
+class Response:
+    __slots__ = ('status', 'headers', 'body')
+
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body.decode())
+
+
+class Connection:
+    """Keep-alive HTTP/1.1 connection sending one request at a time"""
+
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        secure = parts.scheme == 'https'
+        self.host = parts.hostname
+        self.port = parts.port or (443 if secure else 80)
+        self.ssl = ssl.create_default_context() if secure else None
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self._reader = self._writer = None
+
+    async def close(self):
+        writer, self._reader, self._writer = self._writer, None, None
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def request(self, method, path, headers=None, body=b''):
+        try:
+            return await asyncio.wait_for(
+                self._request(method, path, headers or {}, body),
+                self.timeout
+            )
+        except (OSError, EOFError, ValueError, asyncio.TimeoutError,
+                asyncio.LimitOverrunError) as exc:
+            await self.close()
+            raise HTTPError(str(exc) or type(exc).__name__) from exc
+
+    async def _request(self, method, path, headers, body):
+        head = [
+            f'{method} {self.prefix}{path} HTTP/1.1',
+            f'Host: {self.netloc}',
+            f'Content-Length: {len(body)}',
+        ]
+        head += [f'{name}: {value}' for name, value in headers.items()]
+        message = ('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body
+
+        reused = self._writer is not None
+        while True:
+            if self._writer is None:
+                self._reader, self._writer = await asyncio.open_connection(
+                    self.host, self.port, ssl=self.ssl
+                )
+            try:
+                self._writer.write(message)
+                await self._writer.drain()
+                return await self._read_response(method)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                await self.close()
+                # the server may have closed an idle connection, retry once
+                # on a fresh one
+                if not reused:
+                    raise
+                reused = False
+
+    async def _read_response(self, method):
+        head = await self._reader.readuntil(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        status = int(lines[0].split(' ', 2)[1])
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+        keep_alive = headers.get('connection', '').lower() != 'close'
+        if method == 'HEAD' or status in (204, 304) or status < 200:
+            body = b''
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = await self._read_chunked()
+        elif 'content-length' in headers:
+            body = await self._reader.readexactly(
+                int(headers['content-length'])
+            )
+        else:
+            body = await self._reader.read()
+            keep_alive = False
+
+        if not keep_alive:
+            await self.close()
+        return Response(status, headers, body)
+
+    async def _read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self._reader.readuntil(b'\r\n')).split(b';')[0],
+                       16)
+            if not size:
+                while await self._reader.readuntil(b'\r\n') != b'\r\n':
+                    pass
+                return b''.join(chunks)
+            chunks.append(await self._reader.readexactly(size))
+            await self._reader.readexactly(2)
+
+
+def json_body(data):
+    """Returns the headers and body of a JSON request"""
+    return {'Content-Type': 'application/json'}, json.dumps(data).encode()
+
+
+def multipart_body(fields, files):
+    """Returns the headers and body of a multipart/form-data request, files
+    map a field to (filename, content type, content)"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; '
+            f'name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    for name, (filename, content_type, content) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; '
+            f'name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'.encode() +
+            content + b'\r\n'
+        )
+    parts.append(f'--{boundary}--\r\n'.encode())
+    content_type = f'multipart/form-data; boundary={boundary}'
+    return {'Content-Type': content_type}, b''.join(parts)
+
+
+def png_image(width, height, rgb):
+    """Returns a single colour RGB PNG"""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + \
+            struct.pack('>I', zlib.crc32(kind + data))
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    rows = (b'\x00' + bytes(rgb) * width) * height
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + \
+        chunk(b'IDAT', zlib.compress(rows)) + chunk(b'IEND', b'')
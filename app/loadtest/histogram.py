@@ -0,0 +1,55 @@
+import math
+
+
+class Histogram:
+    """Log-linear histogram of integer values, microseconds here, in the
+    manner of HdrHistogram: every value is kept to within 1% whatever its
+    magnitude, in a handful of buckets that merge cheaply"""
+    sub_bucket_bits = 8
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+        self.sum = 0
+        self.min = None
+        self.max = 0
+
+    def _key(self, value):
+        shift = max(value.bit_length() - self.sub_bucket_bits, 0)
+        return shift, value >> shift
+
+    def record(self, value, count=1):
+        value = max(int(value), 0)
+        key = self._key(value)
+        self.counts[key] = self.counts.get(key, 0) + count
+        self.total += count
+        self.sum += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+        self.total += other.total
+        self.sum += other.sum
+        if other.min is not None:
+            self.min = other.min if self.min is None \
+                else min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self):
+        return self.sum / self.total if self.total else 0
+
+    def percentile(self, percent):
+        """Returns the highest value equivalent to the bucket holding the
+        given percentile, 0 when nothing was recorded"""
+        if not self.total:
+            return 0
+        rank = max(math.ceil(percent / 100 * self.total), 1)
+        seen = 0
+        for shift, mantissa in sorted(self.counts):
+            seen += self.counts[shift, mantissa]
+            if seen >= rank:
+                return min(((mantissa + 1) << shift) - 1, self.max)
+        return self.max
@@ -0,0 +1,268 @@
+import asyncio
+import itertools
+import sys
+
+from loadtest.client import Connection, HTTPError, json_body
+from loadtest.histogram import Histogram
+
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+class Session:
+    """A logged in user and the ids its requests can refer to"""
+
+    def __init__(self, token):
+        self.headers = {'Authorization': f'Token {token}'}
+        self.ids = {}
+
+    def collect(self, name, value):
+        self.ids.setdefault(name, []).append(value)
+
+
+class Window:
+    """Requests completed during one reporting interval"""
+
+    def __init__(self, started):
+        self.started = started
+        self.requests = 0
+        self.errors = 0
+        self.latency = Histogram()
+
+
+class Stats:
+    """Per step latency from the intended send time, which counts the time
+    a request waited behind slow ones, and service time from the actual
+    send, plus the completions of every reporting interval"""
+
+    def __init__(self, started):
+        self.latency = {}
+        self.service = {}
+        self.requests = {}
+        self.errors = {}
+        self.windows = []
+        self.window = Window(started)
+
+    def record(self, step, intended, sent, done, ok, measured=True):
+        latency = int((done - intended) * 1e6)
+        self.window.requests += 1
+        self.window.errors += not ok
+        self.window.latency.record(latency)
+        if not measured:
+            return
+        self.latency.setdefault(step, Histogram()).record(latency)
+        self.service.setdefault(step, Histogram()).record(
+            int((done - sent) * 1e6)
+        )
+        self.requests[step] = self.requests.get(step, 0) + 1
+        self.errors[step] = self.errors.get(step, 0) + (not ok)
+
+    def roll(self, now):
+        """Closes the current interval and returns it"""
+        window, self.window = self.window, Window(now)
+        self.windows.append(window)
+        return window
+
+    def total(self, histograms):
+        merged = Histogram()
+        for histogram in histograms.values():
+            merged.merge(histogram)
+        return merged
+
+
+async def execute(connection, session, step, n, run):
+    """Sends one request of the step, returns whether it succeeded"""
+    try:
+        method, path, headers, body = step.build(session, n, run)
+    except KeyError:
+        return False
+    try:
+        response = await connection.request(
+            method, path, dict(session.headers, **headers), body
+        )
+    except HTTPError:
+        return False
+    if response.status >= 400:
+        return False
+    if step.collect:
+        try:
+            session.collect(step.collect, response.json()['id'])
+        except (ValueError, KeyError, TypeError):
+            pass
+    return True
+
+
+async def login(connection, user, create):
+    if create:
+        await connection.request('POST', '/api/users/create',
+                                 *json_body(user))
+    response = await connection.request('POST', '/api/users/token', *json_body(
+        {'email': user['email'], 'password': user['password']}
+    ))
+    if response.status != 200:
+        raise RuntimeError(
+            f'Login of {user["email"]} failed with {response.status}'
+        )
+    return Session(response.json()['token'])
+
+
+async def prepare(base_url, scenario):
+    """Logs every user in and runs the setup steps of the scenario"""
+    connection = Connection(base_url)
+    sessions = []
+    try:
+        for n, user in enumerate(scenario.users):
+            session = await login(connection, user, scenario.create_users)
+            for step in scenario.setup:
+                for i in range(step.repeat):
+                    ok = await execute(connection, session, step,
+                                       n * step.repeat + i, scenario.run)
+                    if not ok:
+                        raise RuntimeError(f'Setup step {step.name} failed')
+            sessions.append(session)
+    finally:
+        await connection.close()
+    return sessions
+
+
+async def _worker(scenario, base_url, session, stats, counter, first_at,
+                  interval, measure_from, deadline):
+    """Sends requests over one connection, every interval seconds from
+    first_at or back to back without an interval"""
+    loop = asyncio.get_running_loop()
+    connection = Connection(base_url)
+    intended = first_at
+    try:
+        while True:
+            if interval:
+                await asyncio.sleep(max(intended - loop.time(), 0))
+            else:
+                intended = loop.time()
+            if intended >= deadline:
+                return
+            step = scenario.pick()
+            sent = loop.time()
+            ok = await execute(connection, session, step, next(counter),
+                               scenario.run)
+            stats.record(step.name, intended, sent, loop.time(), ok,
+                         intended >= measure_from)
+            intended += interval
+    finally:
+        await connection.close()
+
+
+def format_window(window, offset, seconds):
+    return (
+        f'[{offset:6.1f}s] {window.requests / seconds:9.1f} req/s  '
+        f'errors {window.errors:5d}  '
+        f'p50 {window.latency.percentile(50) / 1000:8.1f}ms  '
+        f'p99 {window.latency.percentile(99) / 1000:8.1f}ms\n'
+    )
+
+
+async def _report(stats, started, interval, out):
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        window = stats.roll(loop.time())
+        out.write(format_window(window, window.started - started, interval))
+        out.flush()
+
+
+async def run(scenario, base_url, out=sys.stdout, report_interval=1.0):
+    """Runs the scenario against the server and returns its Stats. With a
+    target rate every connection sends on a fixed schedule, so latency
+    counts from when a request was due and stays free of coordinated
+    omission, without one each connection sends back to back."""
+    sessions = await prepare(base_url, scenario)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    stats = Stats(started)
+    counter = itertools.count()
+    measure_from = started + scenario.warmup
+    deadline = measure_from + scenario.duration
+    interval = scenario.concurrency / scenario.rate if scenario.rate else 0
+
+    reporter = asyncio.ensure_future(
+        _report(stats, started, report_interval, out)
+    )
+    try:
+        await asyncio.gather(*(
+            _worker(
+                scenario, base_url, sessions[i % len(sessions)], stats,
+                counter, started + i * interval / scenario.concurrency,
+                interval, measure_from, deadline
+            )
+            for i in range(scenario.concurrency)
+        ))
+    finally:
+        reporter.cancel()
+    return stats
+
+
+def _table(title, histograms, stats, duration):
+    lines = [
+        title,
+        f'{"step":<16}{"requests":>10}{"errors":>8}{"req/s":>9}' +
+        ''.join(f'{"p" + format(p, "g"):>10}' for p in PERCENTILES) +
+        f'{"max":>10}',
+    ]
+    rows = sorted(histograms.items())
+    rows.append(('all', stats.total(histograms)))
+    for name, histogram in rows:
+        errors = sum(stats.errors.values()) if name == 'all' \
+            else stats.errors[name]
+        lines.append(
+            f'{name:<16}{histogram.total:>10}{errors:>8}'
+            f'{histogram.total / duration:>9.1f}' +
+            ''.join(f'{histogram.percentile(p) / 1000:>10.1f}'
+                    for p in PERCENTILES) +
+            f'{histogram.max / 1000:>10.1f}'
+        )
+    return '\n'.join(lines) + '\n'
+
+
+def summary(stats, scenario):
+    """Returns the latency tables of a finished run"""
+    if scenario.rate:
+        return _table('latency ms, from the intended send time',
+                      stats.latency, stats, scenario.duration) + '\n' + \
+            _table('service time ms, from the actual send time',
+                   stats.service, stats, scenario.duration)
+    return _table('latency ms, closed loop: set a rate to correct for '
+                  'coordinated omission',
+                  stats.latency, stats, scenario.duration)
+
+
+def report(stats, scenario):
+    """Returns the results of a run as JSON serializable data"""
+    def describe(histogram):
+        data = {f'p{p:g}': histogram.percentile(p) / 1000
+                for p in PERCENTILES}
+        data.update(mean=histogram.mean / 1000, max=histogram.max / 1000)
+        return data
+
+    steps = {
+        name: {
+            'requests': stats.requests[name],
+            'errors': stats.errors[name],
+            'latency_ms': describe(histogram),
+            'service_ms': describe(stats.service[name]),
+        }
+        for name, histogram in stats.latency.items()
+    }
+    return {
+        'rate': scenario.rate,
+        'concurrency': scenario.concurrency,
+        'duration': scenario.duration,
+        'steps': steps,
+        'intervals': [
+            {
+                'requests': window.requests,
+                'errors': window.errors,
+                'p50_ms': window.latency.percentile(50) / 1000,
+                'p99_ms': window.latency.percentile(99) / 1000,
+            }
+            for window in stats.windows
+        ],
+    }
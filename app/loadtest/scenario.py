@@ -0,0 +1,117 @@
+import itertools
+import json
+import random
+import re
+import uuid
+
+from loadtest.client import json_body, multipart_body, png_image
+
+
+PLACEHOLDER = re.compile(r'^\{(\w+)\}$')
+
+
+class ScenarioError(Exception):
+    """The scenario file is malformed"""
+
+
+class Placeholders(dict):
+    """Values of the {name} placeholders of a request: n counts requests,
+    run is unique to the run and any other name picks one of the ids the
+    session collected under it"""
+
+    def __init__(self, session, n, run):
+        super().__init__(n=n, run=run)
+        self.session = session
+
+    def __missing__(self, key):
+        ids = self.session.ids.get(key)
+        if not ids:
+            raise KeyError(key)
+        return random.choice(ids)
+
+    def fill(self, value):
+        """Fills the placeholders of a JSON value, a string that is a single
+        placeholder keeps the type of the value, 7 rather than "7" """
+        if isinstance(value, str):
+            match = PLACEHOLDER.match(value)
+            if match:
+                return self[match.group(1)]
+            return value.format_map(self)
+        if isinstance(value, list):
+            return [self.fill(item) for item in value]
+        if isinstance(value, dict):
+            return {key: self.fill(item) for key, item in value.items()}
+        return value
+
+
+class Step:
+    """One kind of request of a scenario"""
+
+    def __init__(self, name, path, method='GET', weight=1, json=None,
+                 image=None, collect=None, repeat=1):
+        self.name = name
+        self.path = path
+        self.method = method.upper()
+        self.weight = weight
+        self.json = json
+        self.image = image
+        self.collect = collect
+        self.repeat = repeat
+
+    def build(self, session, n, run):
+        """Returns the method, path, headers and body of a request, raises
+        KeyError while the session has no ids for a placeholder"""
+        placeholders = Placeholders(session, n, run)
+        path = self.path.format_map(placeholders)
+        headers, body = {}, b''
+        if self.json is not None:
+            headers, body = json_body(placeholders.fill(self.json))
+        elif self.image is not None:
+            size = self.image.get('size', 64)
+            color = [random.randrange(256) for _ in range(3)]
+            headers, body = multipart_body({}, {
+                self.image.get('field', 'image'): (
+                    'load.png', 'image/png', png_image(size, size, color)
+                ),
+            })
+        return self.method, path, headers, body
+
+
+class Scenario:
+    """Users to log in as, requests preparing their data and the weighted
+    mix of requests sent at the target rate or concurrency"""
+
+    def __init__(self, config):
+        try:
+            self.users = list(config['users'])
+            self.create_users = bool(config.get('create_users', False))
+            self.setup = [Step(**step) for step in config.get('setup', [])]
+            self.steps = [Step(**step) for step in config['steps']]
+            self.rate = config.get('rate')
+            self.concurrency = int(config.get('concurrency', 1))
+            self.duration = float(config.get('duration', 30))
+            self.warmup = float(config.get('warmup', 0))
+        except (KeyError, TypeError, ValueError) as exc:
+            raise ScenarioError(f'Invalid scenario: {exc!r}') from exc
+        if not self.users or not self.steps:
+            raise ScenarioError('A scenario needs users and steps.')
+        self.run = uuid.uuid4().hex[:8]
+        self._cum_weights = list(
+            itertools.accumulate(step.weight for step in self.steps)
+        )
+
+    def pick(self):
+        return random.choices(self.steps, cum_weights=self._cum_weights)[0]
+
+
+def load_scenario(path, **overrides):
+    """Reads a JSON scenario file, overrides replace its settings"""
+    with open(path) as f:
+        try:
+            config = json.load(f)
+        except ValueError as exc:
+            raise ScenarioError(f'{path} is not valid JSON: {exc}') from exc
+    config.update(
+        (key, value) for key, value in overrides.items() if value is not None
+    )
+    return Scenario(config)
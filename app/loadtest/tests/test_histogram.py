@@ -0,0 +1,48 @@
+from unittest import TestCase
+
+from loadtest.histogram import Histogram
+
+
+class HistogramTests(TestCase):
+
+    def test_percentiles_within_precision(self):
+        """Test percentiles are exact when small and within 1% above"""
+        histogram = Histogram()
+        for value in range(1, 10001):
+            histogram.record(value * 100)
+
+        self.assertEqual(histogram.total, 10000)
+        self.assertEqual(histogram.min, 100)
+        self.assertEqual(histogram.max, 1000000)
+        for percent in (50, 90, 99, 99.9):
+            expected = percent / 100 * 1000000
+            self.assertAlmostEqual(
+                histogram.percentile(percent) / expected, 1, delta=0.01
+            )
+        self.assertEqual(histogram.percentile(100), 1000000)
+
+    def test_small_values_exact(self):
+        """Test values below the sub bucket count keep their value"""
+        histogram = Histogram()
+        for value in (3, 7, 7, 200):
+            histogram.record(value)
+
+        self.assertEqual(histogram.percentile(50), 7)
+        self.assertEqual(histogram.percentile(100), 200)
+
+    def test_merge(self):
+        """Test merged histograms count the values of both"""
+        first, second = Histogram(), Histogram()
+        first.record(10)
+        second.record(5000, count=3)
+
+        first.merge(second)
+
+        self.assertEqual(first.total, 4)
+        self.assertEqual((first.min, first.max), (10, 5000))
+        self.assertEqual(first.percentile(25), 10)
+        self.assertAlmostEqual(first.mean, 3752.5)
+
+    def test_empty(self):
+        """Test an empty histogram reports zero"""
+        self.assertEqual(Histogram().percentile(99), 0)
@@ -0,0 +1,102 @@
+import asyncio
+import io
+import json
+from unittest import TestCase
+
+from loadtest.client import Connection
+from loadtest.runner import report, run, summary
+from loadtest.scenario import Scenario
+
+
+async def stub_handler(reader, writer):
+    """Answers every request like the API would, chunked for /chunked"""
+    try:
+        while True:
+            head = await reader.readuntil(b'\r\n\r\n')
+            lines = head.decode().split('\r\n')
+            path = lines[0].split(' ')[1]
+            length = next(
+                int(line.split(':')[1]) for line in lines
+                if line.lower().startswith('content-length')
+            )
+            await reader.readexactly(length)
+
+            if path == '/api/users/token':
+                body = json.dumps({'token': 'abc'}).encode()
+            else:
+                body = json.dumps({'id': 1}).encode()
+            status = b'404 Not Found' if path == '/missing/' else b'200 OK'
+            if path == '/chunked/':
+                writer.write(
+                    b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n' +
+                    b'%x\r\n%s\r\n0\r\n\r\n' % (len(body), body)
+                )
+            else:
+                writer.write(
+                    b'HTTP/1.1 %s\r\nContent-Length: %d\r\n\r\n%s'
+                    % (status, len(body), body)
+                )
+            await writer.drain()
+    except asyncio.IncompleteReadError:
+        writer.close()
+
+
+class RunnerTests(TestCase):
+
+    def _run(self, coroutine_function):
+        async def main():
+            server = await asyncio.start_server(stub_handler, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            try:
+                return await coroutine_function(f'http://127.0.0.1:{port}')
+            finally:
+                server.close()
+                await server.wait_closed()
+        return asyncio.run(main())
+
+    def test_connection_reads_responses(self):
+        """Test sized and chunked responses share one connection"""
+        async def requests(base_url):
+            connection = Connection(base_url)
+            try:
+                return [
+                    await connection.request('GET', path)
+                    for path in ('/chunked/', '/sized/', '/missing/')
+                ]
+            finally:
+                await connection.close()
+
+        responses = self._run(requests)
+
+        self.assertEqual([r.status for r in responses], [200, 200, 404])
+        self.assertEqual(responses[0].json(), {'id': 1})
+        self.assertEqual(responses[1].json(), {'id': 1})
+
+    def test_paced_run(self):
+        """Test a paced run logs in, holds the rate and counts errors"""
+        scenario = Scenario({
+            'users': [{'email': 'load@pokemail.net', 'password': 'pass'}],
+            'setup': [{'name': 'tag', 'method': 'POST', 'path': '/tag/',
+                       'json': {'name': 'x'}, 'collect': 'tag_id'}],
+            'steps': [
+                {'name': 'detail', 'path': '/tag/{tag_id}/', 'weight': 3},
+                {'name': 'missing', 'path': '/missing/', 'weight': 1},
+            ],
+            'rate': 100,
+            'concurrency': 2,
+            'duration': 0.5,
+        })
+        out = io.StringIO()
+
+        stats = self._run(
+            lambda base_url: run(scenario, base_url, out, 0.25)
+        )
+
+        total = sum(stats.requests.values())
+        self.assertAlmostEqual(total, 50, delta=5)
+        self.assertEqual(stats.errors.get('detail', 0), 0)
+        self.assertEqual(stats.errors.get('missing', 0),
+                         stats.requests.get('missing', 0))
+        self.assertIn('req/s', out.getvalue())
+        self.assertIn('intended send time', summary(stats, scenario))
+        self.assertEqual(report(stats, scenario)['concurrency'], 2)
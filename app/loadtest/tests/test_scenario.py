@@ -0,0 +1,89 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from loadtest.runner import Session
+from loadtest.scenario import Scenario, ScenarioError, Step, load_scenario
+
+
+def sample_config(**params):
+    config = {
+        'users': [{'email': 'load@pokemail.net', 'password': 'loadpass1'}],
+        'steps': [{'name': 'list', 'path': '/api/recipe/recipe/'}],
+    }
+    config.update(params)
+    return config
+
+
+class ScenarioTests(TestCase):
+
+    def setUp(self):
+        self.session = Session('token')
+        self.session.collect('tag_id', 7)
+
+    def test_step_fills_placeholders(self):
+        """Test paths and JSON bodies are filled from the session"""
+        step = Step(
+            name='create',
+            method='post',
+            path='/api/recipe/tag/{tag_id}/?n={n}',
+            json={'title': 'load {run} {n}', 'tags': ['{tag_id}']}
+        )
+
+        method, path, headers, body = step.build(self.session, 3, 'abc')
+
+        self.assertEqual(method, 'POST')
+        self.assertEqual(path, '/api/recipe/tag/7/?n=3')
+        self.assertEqual(headers['Content-Type'], 'application/json')
+        self.assertEqual(
+            json.loads(body),
+            {'title': 'load abc 3', 'tags': [7]}
+        )
+
+    def test_step_without_ids(self):
+        """Test a step fails while no ids were collected for it"""
+        step = Step(name='detail', path='/api/recipe/recipe/{recipe_id}/')
+
+        with self.assertRaises(KeyError):
+            step.build(self.session, 0, 'abc')
+
+    def test_image_step_builds_png_upload(self):
+        """Test image steps upload a generated PNG as multipart"""
+        step = Step(name='upload', method='POST', path='/upload/',
+                    image={'size': 8})
+
+        _, _, headers, body = step.build(self.session, 0, 'abc')
+
+        self.assertTrue(
+            headers['Content-Type'].startswith('multipart/form-data')
+        )
+        self.assertIn(b'filename="load.png"', body)
+        self.assertIn(b'\x89PNG', body)
+
+    def test_pick_follows_weights(self):
+        """Test steps without weight are never picked"""
+        scenario = Scenario(sample_config(steps=[
+            {'name': 'list', 'path': '/', 'weight': 1},
+            {'name': 'never', 'path': '/', 'weight': 0},
+        ]))
+
+        self.assertEqual({scenario.pick().name for _ in range(50)}, {'list'})
+
+    def test_load_scenario_overrides(self):
+        """Test command line values replace the file's settings"""
+        fd, path = tempfile.mkstemp(suffix='.json')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(sample_config(rate=10, concurrency=2), f)
+
+        scenario = load_scenario(path, rate=50, concurrency=None)
+
+        self.assertEqual((scenario.rate, scenario.concurrency), (50, 2))
+
+    def test_invalid_scenario(self):
+        """Test scenarios without steps are rejected"""
+        with self.assertRaises(ScenarioError):
+            Scenario({'users': []})
+        with self.assertRaises(ScenarioError):
+            Scenario(sample_config(steps=[{'name': 'list'}]))
@@ -0,0 +1,226 @@
+import csv
+import json
+
+from django.conf import settings
+from django.db import connection, transaction
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import BaseParser
+from rest_framework.serializers import as_serializer_error
+from rest_framework.settings import api_settings
+
+from core.ingredient_index import invalidate_ingredient_index
+from core.models import Tag, Ingredient, Recipe
+from core.relations import ID_ARRAY_FIELDS, m2m_tables, \
+                           relations_changed, resolve_names
+from core.stats import adjust_recipe_stats, as_stats_values
+from recipe.serializers import RecipeImportSerializer
+
+
+NDJSON = 'ndjson'
+CSV = 'csv'
+
+# CSV cells holding several names separate them with this
+CSV_NAME_SEPARATOR = ';'
+
+
+class ImportAborted(Exception):
+    pass
+
+
+class StreamParser(BaseParser):
+    """Hands the request body over unread, the import parses it while it
+    arrives instead of buffering the whole upload"""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return stream
+
+
+class NDJSONStreamParser(StreamParser):
+    media_type = 'application/x-ndjson'
+    format = NDJSON
+
+
+class CSVStreamParser(StreamParser):
+    media_type = 'text/csv'
+    format = CSV
+
+
+def read_lines(stream, max_length=None):
+    """Yields the decoded lines of a binary stream one at a time"""
+    max_length = max_length or settings.IMPORT_MAX_LINE_BYTES
+    number = 0
+    while True:
+        line = stream.readline(max_length + 1)
+        if not line:
+            return
+        number += 1
+        if len(line) > max_length:
+            raise ImportAborted(
+                f'Line {number} is longer than {max_length} bytes.'
+            )
+        if number == 1 and line.startswith(b'\xef\xbb\xbf'):
+            line = line[3:]
+        yield line.decode('utf-8', errors='replace')
+
+
+def _row_error(message):
+    return {api_settings.NON_FIELD_ERRORS_KEY: [message]}
+
+
+def _ndjson_rows(lines):
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as exc:
+            yield number, None, _row_error(f'Invalid JSON: {exc}')
+            continue
+        if not isinstance(data, dict):
+            yield number, None, _row_error('Expected a JSON object.')
+            continue
+        yield number, data, None
+
+
+def _csv_rows(lines):
+    reader = csv.DictReader(lines)
+    try:
+        for row in reader:
+            data = {
+                key: value for key, value in row.items()
+                if key is not None and value is not None
+            }
+            for field in ('tag_names', 'ingredient_names'):
+                if field in data:
+                    data[field] = [
+                        name
+                        for name in data[field].split(CSV_NAME_SEPARATOR)
+                        if name.strip()
+                    ]
+            yield reader.line_num, data, None
+    except csv.Error as exc:
+        raise ImportAborted(f'Line {reader.line_num}: {exc}')
+
+
+def parse_rows(lines, format):
+    """Yields (row number, data, error) for each row of an NDJSON or CSV
+    file, CSV rows name their tags and ingredients separated by ;"""
+    if format == NDJSON:
+        return _ndjson_rows(lines)
+    if format == CSV:
+        return _csv_rows(lines)
+    raise ValueError(f'Unknown import format {format}')
+
+
+def _insert_links(cursor, relation, recipes):
+    """Inserts the through rows of the recipes' id array in one statement"""
+    array = ID_ARRAY_FIELDS[relation]
+    links = [
+        (recipe.id, target_id)
+        for recipe in recipes for target_id in getattr(recipe, array)
+    ]
+    if links:
+        cursor.execute(
+            """
+            INSERT INTO {through} ({recipe_col}, {target_col})
+            SELECT * FROM unnest(%s::integer[], %s::integer[])
+            """.format(**m2m_tables(relation)),
+            [list(ids) for ids in zip(*links)]
+        )
+
+
+@transaction.atomic
+def write_recipes(user, chunk):
+    """Creates a chunk of validated recipes with batched inserts, resolving
+    the names of all of them at once, and updates what the signals of
+    single creates would. Returns the number of recipes created."""
+    ids = {}
+    for field, model in (('tag_names', Tag),
+                         ('ingredient_names', Ingredient)):
+        names = [name for data in chunk for name in data.get(field, [])]
+        ids[field] = {
+            obj.name: obj.id for obj in resolve_names(model, user, names)
+        }
+
+    recipes = [
+        Recipe(
+            user=user,
+            title=data['title'],
+            time_minutes=data['time_minutes'],
+            price=data['price'],
+            link=data.get('link', ''),
+            tag_ids=sorted({
+                ids['tag_names'][name.strip()]
+                for name in data.get('tag_names', []) if name.strip()
+            }),
+            ingredient_ids=sorted({
+                ids['ingredient_names'][name.strip()]
+                for name in data.get('ingredient_names', []) if name.strip()
+            })
+        )
+        for data in chunk
+    ]
+    Recipe.objects.bulk_create(recipes)
+    with connection.cursor() as cursor:
+        for relation in ID_ARRAY_FIELDS:
+            _insert_links(cursor, relation, recipes)
+
+    values = [as_stats_values(recipe.time_minutes, recipe.price)
+              for recipe in recipes]
+    adjust_recipe_stats(
+        user.id,
+        len(recipes),
+        sum(time_minutes for time_minutes, price in values),
+        sum(price for time_minutes, price in values)
+    )
+    for relation, array in ID_ARRAY_FIELDS.items():
+        changes = [
+            (recipe.id, user.id, [], getattr(recipe, array))
+            for recipe in recipes if getattr(recipe, array)
+        ]
+        if changes:
+            relations_changed.send(
+                sender=Recipe,
+                relation=relation,
+                changes=changes
+            )
+    invalidate_ingredient_index([user.id])
+    return len(recipes)
+
+
+def import_recipes(user, rows, chunk_size=None, max_rows=None):
+    """Validates the parsed rows against the recipe serializer rules and
+    writes the valid ones chunk by chunk. Returns a report of the created
+    recipes and the errors of the rejected rows, of which only the first
+    IMPORT_MAX_ERRORS are kept."""
+    chunk_size = chunk_size or settings.IMPORT_CHUNK_SIZE
+    report = {'created': 0, 'failed': 0, 'errors': []}
+    # validated with one serializer, building one per row is slow
+    serializer = RecipeImportSerializer()
+    chunk = []
+    seen = 0
+
+    try:
+        for number, data, errors in rows:
+            seen += 1
+            if max_rows is not None and seen > max_rows:
+                raise ImportAborted(
+                    f'Row {number} is past the limit of {max_rows} rows.'
+                )
+            if errors is None:
+                try:
+                    chunk.append(serializer.run_validation(data))
+                except ValidationError as exc:
+                    errors = as_serializer_error(exc)
+            if errors is not None:
+                report['failed'] += 1
+                if len(report['errors']) < settings.IMPORT_MAX_ERRORS:
+                    report['errors'].append({'row': number, 'errors': errors})
+            elif len(chunk) >= chunk_size:
+                report['created'] += write_recipes(user, chunk)
+                chunk = []
+    except ImportAborted as exc:
+        report['aborted'] = str(exc)
+    if chunk:
+        report['created'] += write_recipes(user, chunk)
+    return report
@@ -0,0 +1,51 @@
+import json
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe import imports
+
+
+class Command(BaseCommand):
+    """command to import recipes of a user from an NDJSON or CSV file"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import')
+        parser.add_argument('--user', required=True,
+                            help='Email of the user the recipes belong to')
+        parser.add_argument(
+            '--format', choices=(imports.NDJSON, imports.CSV),
+            help='Format of the file, by default from its extension'
+        )
+        parser.add_argument('--chunk-size', type=int)
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No user with email {options["user"]}')
+        format = options['format'] or \
+            os.path.splitext(options['path'])[1].lstrip('.').lower()
+        if format == 'jsonl':
+            format = imports.NDJSON
+        if format not in (imports.NDJSON, imports.CSV):
+            raise CommandError('Pass --format, the extension is unknown')
+
+        with open(options['path'], 'rb') as stream:
+            report = imports.import_recipes(
+                user,
+                imports.parse_rows(imports.read_lines(stream), format),
+                chunk_size=options['chunk_size']
+            )
+
+        for error in report['errors']:
+            self.stdout.write(
+                f'row {error["row"]}: {json.dumps(error["errors"])}'
+            )
+        if 'aborted' in report:
+            self.stdout.write(self.style.ERROR(report['aborted']))
+        self.stdout.write(
+            f'{report["created"]} recipes created, {report["failed"]} rows '
+            f'rejected'
+        )
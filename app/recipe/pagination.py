@@ -0,0 +1,89 @@
+from django.core import signing
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Opt-in pagination continuing after the last row of the previous page
+    on the (ordering field, id) index, deep pages cost as much as the first.
+    Requests without ?limit= or ?cursor= get the whole list as before."""
+    limit_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    default_limit = 50
+    max_limit = 200
+    cursor_salt = 'recipe.keyset'
+
+    def _limit(self, request):
+        try:
+            limit = int(request.query_params.get(self.limit_query_param,
+                                                 self.default_limit))
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            raise ValidationError({'limit': 'Expected a positive number.'})
+        return min(limit, self.max_limit)
+
+    def _decode_cursor(self, cursor, field, model):
+        try:
+            data = signing.loads(cursor, salt=self.cursor_salt)
+            if data['order'] != self.ordering:
+                raise ValueError
+            return model._meta.get_field(field).to_python(data['value']), \
+                int(data['id'])
+        except (signing.BadSignature, KeyError, TypeError, ValueError):
+            raise ValidationError({'cursor': 'Invalid cursor.'})
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if (self.limit_query_param not in params and
+                self.cursor_query_param not in params):
+            return None
+
+        self.request = request
+        self.limit = self._limit(request)
+        self.ordering = list(queryset.query.order_by)
+        self.field = self.ordering[0].lstrip('-')
+        descending = self.ordering[0].startswith('-')
+
+        cursor = params.get(self.cursor_query_param)
+        if cursor:
+            value, pk = self._decode_cursor(cursor, self.field,
+                                            queryset.model)
+            after = 'lt' if descending else 'gt'
+            position = Q(**{f'{self.field}__{after}': value})
+            if self.field != 'id':
+                position |= Q(**{self.field: value, f'id__{after}': pk})
+                # the OR alone is no index range, the bound starts the
+                # scan at the cursor value instead of the first row
+                bound = 'lte' if descending else 'gte'
+                position &= Q(**{f'{self.field}__{bound}': value})
+            queryset = queryset.filter(position)
+
+        rows = list(queryset[:self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        self.page = rows[:self.limit]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        cursor = signing.dumps(
+            {
+                'order': self.ordering,
+                'value': str(getattr(last, self.field)),
+                'id': last.id,
+            },
+            salt=self.cursor_salt
+        )
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            cursor
+        )
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
@@ -1,8 +1,106 @@
+from django.core.files.uploadedfile import UploadedFile
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
-from core.models import Tag, Ingredient, Recipe
+from core.images import prepare_image
+from core.models import Tag, Ingredient, Recipe, UserRecipeStats, \
+                        UserTagStats, CanonicalIngredient
+from core.relations import resolve_names
 
 
-class TagSerializer(serializers.ModelSerializer):
+def _query_param_set(request, param):
+    """Returns the comma separated names of a read's query param"""
+    if request is None or request.method != 'GET':
+        return set()
+    names = request.query_params.get(param, '')
+    return {name.strip() for name in names.split(',') if name.strip()}
+
+
+def requested_fields(request):
+    """Returns the set of field names in ?fields=, or None for all"""
+    return _query_param_set(request, 'fields') or None
+
+
+def requested_expansions(request):
+    """Returns the set of relation names in ?expand="""
+    return _query_param_set(request, 'expand')
+
+
+class DynamicFieldsMixin:
+    """Serializes only the fields asked for with ?fields= on reads"""
+    # serializer fields read from a differently named column, None for
+    # fields that are not a column at all
+    field_columns = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = requested_fields(self.context.get('request'))
+        if fields is not None:
+            readable = [
+                name for name, field in self.fields.items()
+                if not field.write_only
+            ]
+            unknown = fields - set(readable)
+            if unknown:
+                raise serializers.ValidationError({
+                    'fields': 'Unknown fields: {}. Expected any of: {}.'
+                              .format(', '.join(sorted(unknown)),
+                                      ', '.join(readable))
+                })
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
+
+    @classmethod
+    def columns_for(cls, fields):
+        """Returns the model columns needed to serialize the fields"""
+        columns = {'id'}
+        for name in fields & set(cls.Meta.fields):
+            column = cls.field_columns.get(name, name)
+            if column is not None:
+                columns.add(column)
+        return columns
+
+
+class UniqueNameMixin:
+    """Rejects names the requesting user already has an object for"""
+
+    def validate_name(self, name):
+        queryset = self.Meta.model.objects.filter(
+            user=self.context['request'].user,
+            name=name
+        )
+        if self.instance is not None:
+            queryset = queryset.exclude(id=self.instance.id)
+        if queryset.exists():
+            raise serializers.ValidationError(self._name_taken_message())
+        return name
+
+    def _name_taken_message(self):
+        return f'{self.Meta.model.__name__} with this name already exists.'
+
+    def _save_unique(self, save, *args):
+        """Runs the save, reporting a concurrent save of the same name that
+        won the race past validate_name as a validation error"""
+        constraints = [c.name for c in self.Meta.model._meta.constraints]
+        try:
+            with transaction.atomic():
+                return save(*args)
+        except IntegrityError as exc:
+            if not any(name in str(exc) for name in constraints):
+                raise
+            raise serializers.ValidationError(
+                {'name': [self._name_taken_message()]}
+            )
+
+    def create(self, validated_data):
+        return self._save_unique(super().create, validated_data)
+
+    def update(self, instance, validated_data):
+        return self._save_unique(super().update, instance, validated_data)
+
+
+class TagSerializer(UniqueNameMixin,
+                    DynamicFieldsMixin,
+                    serializers.ModelSerializer):
     """Serializer for tag model"""
 
     class Meta:
@@ -11,7 +109,9 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(UniqueNameMixin,
+                           DynamicFieldsMixin,
+                           serializers.ModelSerializer):
     """Serializer for ingredient model"""
 
     class Meta:
@@ -20,15 +120,102 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class CanonicalIngredientSerializer(serializers.ModelSerializer):
+    """Serializer for the ingredient names shared across users"""
+
+    class Meta:
+        model = CanonicalIngredient
+        fields = ('id', 'name', 'alias_count')
+        read_only_fields = fields
+
+
+class UserPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key relation limited to objects of the requesting user"""
+
+    def get_queryset(self):
+        user = self.context['request'].user
+        return super().get_queryset().filter(user=user)
+
+
+class IdArrayRelatedField(serializers.ManyRelatedField):
+    """Many primary key relation read from a denormalized id array and
+    validated with a single query for all ids"""
+
+    def __init__(self, array_attr, **kwargs):
+        self.array_attr = array_attr
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        return getattr(instance, self.array_attr)
+
+    def to_representation(self, ids):
+        return list(ids)
+
+    def _to_pk(self, value):
+        """Returns the id given, rejecting what PrimaryKeyRelatedField
+        rejects such as booleans and fractions"""
+        try:
+            if isinstance(value, bool) or \
+                    isinstance(value, float) and not value.is_integer():
+                raise TypeError
+            return int(value)
+        except (TypeError, ValueError):
+            self.child_relation.fail(
+                'incorrect_type', data_type=type(value).__name__
+            )
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        child = self.child_relation
+        ids = list(dict.fromkeys(self._to_pk(pk) for pk in data))
+        objects = child.get_queryset().in_bulk(ids)
+        for pk in ids:
+            if pk not in objects:
+                child.fail('does_not_exist', pk_value=pk)
+        return [objects[pk] for pk in ids]
+
+
+class RecipeSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for recipe model"""
-    ingredient = serializers.PrimaryKeyRelatedField(
-        many=True,
-        queryset=Ingredient.objects.all()
+    field_columns = {
+        'tags': 'tag_ids',
+        'ingredient': 'ingredient_ids',
+        'tag_names': None,
+        'ingredient_names': None,
+    }
+    # relations ?expand= inlines as nested objects
+    expandable_fields = {
+        'tags': TagSerializer,
+        'ingredient': IngredientSerializer,
+    }
+    ingredient = IdArrayRelatedField(
+        'ingredient_ids',
+        required=False,
+        child_relation=UserPrimaryKeyRelatedField(
+            queryset=Ingredient.objects.all()
+        )
+    )
+    tags = IdArrayRelatedField(
+        'tag_ids',
+        required=False,
+        child_relation=UserPrimaryKeyRelatedField(
+            queryset=Tag.objects.all()
+        )
     )
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True,
-        queryset=Tag.objects.all()
+    # names of tags and ingredients to link, created when missing
+    tag_names = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        write_only=True,
+        required=False
+    )
+    ingredient_names = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        write_only=True,
+        required=False
     )
     price = serializers.DecimalField(
         max_digits=5,
@@ -39,20 +226,129 @@ class RecipeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = ('id', 'title', 'ingredient', 'tags', 'time_minutes',
-                  'price', 'link')
+                  'price', 'link', 'tag_names', 'ingredient_names')
         read_only_fields = ('id',)
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        expand = requested_expansions(self.context.get('request'))
+        for name in expand & set(self.expandable_fields) & set(self.fields):
+            self.fields[name] = self.expandable_fields[name](
+                many=True,
+                read_only=True
+            )
+
+    def _resolve_names(self, user, validated_data):
+        """Adds the objects named in the names fields to their relation"""
+        for names_field, relation, model in (
+                ('tag_names', 'tags', Tag),
+                ('ingredient_names', 'ingredient', Ingredient)):
+            names = validated_data.pop(names_field, None)
+            if names is not None:
+                objects = validated_data.get(relation, [])
+                objects += resolve_names(model, user, names)
+                validated_data[relation] = objects
+
+    @transaction.atomic
+    def create(self, validated_data):
+        self._resolve_names(validated_data['user'], validated_data)
+        return super().create(validated_data)
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        self._resolve_names(instance.user, validated_data)
+        return super().update(instance, validated_data)
+
+
+class RecipeImportSerializer(RecipeSerializer):
+    """Validates one row of a recipe import, relations are named"""
+
+    class Meta(RecipeSerializer.Meta):
+        fields = ('title', 'time_minutes', 'price', 'link', 'tag_names',
+                  'ingredient_names')
+
 
 class RecipeDetailSerializer(RecipeSerializer):
     """Serializer for a recipe detail"""
+    field_columns = dict(
+        RecipeSerializer.field_columns,
+        tags=None,
+        ingredient=None
+    )
     ingredient = IngredientSerializer(many=True, read_only=True)
     tags = TagSerializer(many=True, read_only=True)
 
 
+class BoundedImageField(serializers.ImageField):
+    """Image field that checks size and pixels before Pillow decodes"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, UploadedFile):
+            data = prepare_image(data)
+        return super().to_internal_value(data)
+
+
 class RecipeImageSerializer(serializers.ModelSerializer):
     """Serializer for uploading image to recipe"""
+    image = BoundedImageField(allow_null=True, max_length=100, required=False)
 
     class Meta:
         model = Recipe
         fields = ('id', 'image')
         read_only_fields = ('id',)
+
+
+class RecipeAssignmentSerializer(serializers.Serializer):
+    """Serializer for attaching objects to many recipes at once"""
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=1000
+    )
+
+
+class TagAssignmentSerializer(RecipeAssignmentSerializer):
+    """Serializer for assigning tags to many recipes"""
+    tags = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100
+    )
+
+
+class IngredientAssignmentSerializer(RecipeAssignmentSerializer):
+    """Serializer for assigning ingredients to many recipes"""
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100
+    )
+
+
+class RecipeStatsSerializer(serializers.ModelSerializer):
+    """Serializer for the running recipe statistics of a user"""
+    average_time_minutes = serializers.FloatField(read_only=True)
+    average_price = serializers.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        coerce_to_string=False,
+        read_only=True
+    )
+    tags = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UserRecipeStats
+        fields = ('recipe_count', 'average_time_minutes', 'average_price',
+                  'tags')
+
+    def get_tags(self, stats):
+        tag_stats = UserTagStats.objects.filter(
+            user_id=stats.user_id,
+            recipe_count__gt=0
+        ).select_related('tag').order_by('-recipe_count', 'tag_id')
+
+        return [
+            {'id': row.tag_id, 'name': row.tag.name,
+             'recipe_count': row.recipe_count}
+            for row in tag_stats
+        ]
@@ -0,0 +1,144 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from core.models import Tag, Ingredient, Recipe, Tombstone
+
+
+logger = logging.getLogger(__name__)
+
+CURSOR_SALT = 'recipe.sync'
+
+# feed key: (model, timestamp field), the last one lists the deletions
+STREAMS = {
+    'tags': (Tag, 'updated_at'),
+    'ingredients': (Ingredient, 'updated_at'),
+    'recipes': (Recipe, 'updated_at'),
+    'deleted': (Tombstone, 'deleted_at'),
+}
+
+
+class CursorExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = 'Deletions since this cursor were pruned, sync again ' \
+                     'without a cursor.'
+    default_code = 'cursor_expired'
+
+
+def encode_cursor(positions):
+    return signing.dumps(
+        {
+            stream: [ts.isoformat(), pk]
+            for stream, (ts, pk) in positions.items()
+        },
+        salt=CURSOR_SALT
+    )
+
+
+def decode_cursor(cursor):
+    """Returns the (timestamp, id) position of every stream in the cursor"""
+    try:
+        data = signing.loads(cursor, salt=CURSOR_SALT)
+        positions = {
+            stream: (parse_datetime(data[stream][0]), int(data[stream][1]))
+            for stream in STREAMS
+        }
+    except (signing.BadSignature, KeyError, IndexError, TypeError,
+            ValueError):
+        raise ValidationError({'since': 'Invalid cursor.'})
+    if None in (ts for ts, pk in positions.values()):
+        raise ValidationError({'since': 'Invalid cursor.'})
+
+    retention = timedelta(seconds=settings.SYNC_TOMBSTONE_RETENTION)
+    if positions['deleted'][0] < timezone.now() - retention:
+        raise CursorExpired()
+    return positions
+
+
+def sync_horizon(using):
+    """Returns the time before which no more changes can commit, the start
+    of the oldest client transaction still running or else the current
+    time, but at most SYNC_HORIZON_MAX_LAG seconds back"""
+    # autovacuum and other background workers never write our rows, and
+    # idle sessions have no transaction to commit
+    with connections[using].cursor() as cursor:
+        cursor.execute("""
+            SELECT clock_timestamp(), MIN(xact_start)
+            FROM pg_stat_activity
+            WHERE datname = current_database() AND pid <> pg_backend_pid()
+                AND backend_type = 'client backend' AND state <> 'idle'
+        """)
+        now, oldest = cursor.fetchone()
+    if oldest is None or oldest > now:
+        return now
+    # a forgotten open transaction would otherwise hold every feed back
+    # until it ends. Past the cap the feed moves on, and the changes that
+    # transaction commits later carry older times than cursors already
+    # handed out, so clients miss them until the objects change again.
+    floor = now - timedelta(seconds=settings.SYNC_HORIZON_MAX_LAG)
+    if oldest < floor:
+        logger.warning(
+            'A transaction open since %s holds the sync horizon back, '
+            'capped at %s seconds', oldest, settings.SYNC_HORIZON_MAX_LAG
+        )
+        return floor
+    return oldest
+
+
+def _page(queryset, field, position, horizon, size):
+    """Returns up to size objects changed after the position and before the
+    horizon, oldest first, and the position to continue from"""
+    if position is not None:
+        ts, pk = position
+        queryset = queryset.filter(
+            Q(**{f'{field}__gt': ts}) | Q(**{field: ts, 'id__gt': pk})
+        )
+    objects = list(
+        queryset.filter(**{f'{field}__lt': horizon})
+                .order_by(field, 'id')[:size + 1]
+    )
+    if len(objects) > size:
+        last = objects[size - 1]
+        return objects[:size], (getattr(last, field), last.id)
+    return objects, None
+
+
+def changes_since(user, cursor=None, size=None):
+    """Returns the objects of the user changed and deleted since the cursor,
+    the cursor to continue from and whether more changes are waiting.
+    Without a cursor every object is returned and no deletions."""
+    size = size or settings.SYNC_PAGE_SIZE
+    # replicas lag behind and do not see the transactions of the primary
+    using = DEFAULT_DB_ALIAS
+    horizon = sync_horizon(using)
+    if cursor is None:
+        positions = dict.fromkeys(STREAMS)
+        positions['deleted'] = (horizon, 0)
+    else:
+        positions = decode_cursor(cursor)
+
+    changes = {}
+    has_more = False
+    for stream, (model, field) in STREAMS.items():
+        changes[stream], position = _page(
+            model.objects.using(using).filter(user=user),
+            field,
+            positions[stream],
+            horizon,
+            size
+        )
+        if position is None:
+            position = (horizon, 0)
+        else:
+            has_more = True
+        positions[stream] = position
+
+    return changes, encode_cursor(positions), has_more
@@ -1,15 +1,22 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.urls import reverse
 from django.test import TestCase
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Ingredient, Recipe
+from core.models import CanonicalIngredient, Ingredient, Recipe
 from recipe.serializers import IngredientSerializer
 
 
 INGREDIENT_URL = reverse('recipe:ingredient-list')
+ASSIGN_URL = reverse('recipe:ingredient-assign')
+UNASSIGN_URL = reverse('recipe:ingredient-unassign')
+POPULAR_URL = reverse('recipe:ingredient-popular')
+SEARCH_URL = reverse('recipe:ingredient-search')
 
 
 class PublicIngredientApiTests(TestCase):
@@ -101,3 +108,84 @@ class PrivateIngredientApiTests(TestCase):
         )
         self.assertIn(serializer1.data, res.data)
         self.assertNotIn(serializer2.data, res.data)
+
+    def test_assign_and_unassign_ingredients(self):
+        """Attach and detach ingredients to many recipes in one call"""
+        ingredient = Ingredient.objects.create(user=self.user, name='salt')
+        recipes = [
+            Recipe.objects.create(
+                user=self.user,
+                title=f'recipe{i}',
+                time_minutes=6,
+                price=9.23
+            )
+            for i in range(3)
+        ]
+        payload = {
+            'recipes': [recipe.id for recipe in recipes],
+            'ingredients': [ingredient.id]
+        }
+
+        res = self.client.post(ASSIGN_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'added': 3, 'recipes': 3})
+        self.assertEqual(ingredient.recipe_set.count(), 3)
+
+        payload['recipes'] = payload['recipes'][:2]
+        res = self.client.post(UNASSIGN_URL, payload, format='json')
+        self.assertEqual(res.data, {'removed': 2, 'recipes': 2})
+        self.assertEqual(list(ingredient.recipe_set.all()), [recipes[2]])
+
+    def _create_catalogue(self):
+        """Creates salt for three users, sage for two and saffron for one"""
+        for i, names in enumerate([('Salt', 'sage', 'saffron'),
+                                   ('salt', 'Sage'), ('SALT',)]):
+            user = get_user_model().objects.create_user(
+                email=f'cook{i}@pokemail.net',
+                password='pass3'
+            )
+            for name in names:
+                Ingredient.objects.create(user=user, name=name)
+        call_command('canonicalize_ingredients', stdout=StringIO())
+
+    def test_popular_ingredients(self):
+        """Test the names shared by most users are listed first"""
+        self._create_catalogue()
+
+        res = self.client.get(POPULAR_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(row['name'], row['alias_count']) for row in res.data],
+            [('salt', 3), ('sage', 2)]
+        )
+
+    def test_search_ingredients(self):
+        """Test searching the catalogue by name prefix"""
+        self._create_catalogue()
+
+        res = self.client.get(SEARCH_URL, {'q': 'SA'})
+        self.assertEqual([row['name'] for row in res.data], ['salt', 'sage'])
+
+        res = self.client.get(SEARCH_URL, {'q': 'sag'})
+        self.assertEqual([row['name'] for row in res.data], ['sage'])
+
+        res = self.client.get(SEARCH_URL)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_canonicalize_unlinked_ingredients(self):
+        """Test the backfill links ingredients created without a canonical"""
+        Ingredient.objects.bulk_create([
+            Ingredient(user=self.user, name='Kale'),
+            Ingredient(user=self.user, name='kale '),
+        ])
+        self.assertTrue(Ingredient.objects.filter(canonical=None).exists())
+
+        out = StringIO()
+        call_command('canonicalize_ingredients', batch_size=1, stdout=out)
+
+        canonical = CanonicalIngredient.objects.get()
+        self.assertEqual(canonical.name, 'kale')
+        self.assertEqual(canonical.alias_count, 2)
+        self.assertFalse(Ingredient.objects.filter(canonical=None).exists())
+        self.assertIn('2 ingredients linked', out.getvalue())
@@ -1,21 +1,33 @@
 import tempfile
 import os
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
 
 from PIL import Image
 
+from django.core.cache import cache
+from django.db import connection, transaction
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 
 from decimal import Decimal
-from rest_framework.test import APIClient
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
 from rest_framework import status
 
 from core.models import Recipe, Tag, Ingredient
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+from recipe.views import RecipeViewSet
 
 
 RECIPE_URL = reverse('recipe:recipe-list')
+STATS_URL = reverse('recipe:recipe-stats')
+MULTI_URL = reverse('recipe:recipe-multi-get')
+BULK_URL = reverse('recipe:recipe-bulk-delete')
+COOKABLE_URL = reverse('recipe:recipe-cookable')
+SHOPPING_URL = reverse('recipe:recipe-shopping-list')
 
 
 def image_url(recipe_id):
@@ -30,12 +42,12 @@ def detail_url(recipe_id):
 
 def sample_tag(user, name='cold drink'):
     """returns a sample tag"""
-    return Tag.objects.create(user=user, name=name)
+    return Tag.objects.get_or_create(user=user, name=name)[0]
 
 
 def sample_ingredient(user, name='water'):
     """returns a sample ingredient"""
-    return Ingredient.objects.create(user=user, name=name)
+    return Ingredient.objects.get_or_create(user=user, name=name)[0]
 
 
 def sample_recipe(user, **params):
@@ -203,6 +215,484 @@ class PrivateRecipeApiTests(TestCase):
         tags = recipe.tags.all()
         self.assertEqual(len(tags), 0)
 
+    def test_list_sparse_fields(self):
+        """Test ?fields= limits the fields of the listed recipes"""
+        recipe = sample_recipe(user=self.user)
+
+        res = self.client.get(RECIPE_URL, {'fields': 'id,title,tags'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [{
+            'id': recipe.id,
+            'title': recipe.title,
+            'tags': recipe.tag_ids,
+        }])
+
+    def test_list_sparse_fields_unknown(self):
+        """Test ?fields= with a misspelt field is rejected by name"""
+        sample_recipe(user=self.user)
+
+        res = self.client.get(RECIPE_URL, {'fields': 'id,titel'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('titel', res.data['fields'])
+        self.assertIn('title', res.data['fields'])
+        self.assertNotIn('tag_names', res.data['fields'])
+
+    def test_list_sparse_fields_loads_only_columns(self):
+        """Test ?fields= narrows the columns read from the database"""
+        sample_recipe(user=self.user)
+        request = APIRequestFactory().get(RECIPE_URL, {'fields': 'title'})
+        request = Request(request)
+        request.user = self.user
+        view = RecipeViewSet(action='list', request=request)
+
+        queryset = view.get_queryset()
+
+        self.assertEqual(
+            queryset.query.deferred_loading,
+            ({'id', 'title'}, False)
+        )
+
+    def test_detail_sparse_fields(self):
+        """Test ?fields= on a recipe detail"""
+        recipe = sample_recipe(user=self.user)
+
+        res = self.client.get(detail_url(recipe.id), {'fields': 'price,tags'})
+
+        self.assertEqual(set(res.data), {'price', 'tags'})
+        self.assertEqual(res.data['tags'][0]['name'], 'cold drink')
+
+    def test_list_expand_relations(self):
+        """Test ?expand= inlines tags and ingredients in the list"""
+        recipe = sample_recipe(user=self.user)
+
+        res = self.client.get(RECIPE_URL, {'expand': 'tags,ingredient'})
+
+        serializer = RecipeDetailSerializer(recipe)
+        self.assertEqual(res.data, [serializer.data])
+
+    def test_list_expand_constant_queries(self):
+        """Test expanding relations costs the same queries for any size"""
+        sample_recipe(user=self.user)
+        with self.assertNumQueries(3):
+            self.client.get(RECIPE_URL, {'expand': 'tags,ingredient'})
+
+        for i in range(4):
+            sample_recipe(user=self.user, title=f'recipe{i}')
+        with self.assertNumQueries(3):
+            res = self.client.get(RECIPE_URL, {'expand': 'tags,ingredient'})
+        self.assertEqual(len(res.data), 5)
+
+    def test_multi_get_recipes(self):
+        """Test fetching many recipe details in the requested order"""
+        user2 = get_user_model().objects.create_user(
+            email='test2@pokemail.net',
+            password='pass2'
+        )
+        recipe1 = sample_recipe(user=self.user)
+        recipe2 = sample_recipe(user=self.user, title='recipe2')
+        other = sample_recipe(user=user2)
+
+        ids = [recipe2.id, other.id, recipe1.id, 999999]
+        res = self.client.get(MULTI_URL, {'ids': ','.join(map(str, ids))})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [
+            RecipeDetailSerializer(recipe2).data,
+            RecipeDetailSerializer(recipe1).data,
+        ])
+        self.assertEqual(res.data['missing'], [other.id, 999999])
+
+    def test_multi_get_constant_queries(self):
+        """Test multi-get loads relations in batches"""
+        ids = [sample_recipe(user=self.user, title=f'r{i}').id
+               for i in range(5)]
+
+        with self.assertNumQueries(3):
+            self.client.get(MULTI_URL, {'ids': ','.join(map(str, ids))})
+
+    def test_multi_get_invalid_ids(self):
+        """Test multi-get rejects malformed and too many ids"""
+        res = self.client.get(MULTI_URL, {'ids': '1,a'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        with self.settings(RECIPE_MULTI_GET_MAX=2):
+            res = self.client.get(MULTI_URL, {'ids': '1,2,3'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_shopping_list(self):
+        """Test the ingredients of many recipes are merged and counted"""
+        user2 = get_user_model().objects.create_user(
+            email='test2@pokemail.net',
+            password='pass2'
+        )
+        salt = sample_ingredient(user=self.user, name='salt')
+        recipe1 = sample_recipe(user=self.user)
+        recipe2 = sample_recipe(user=self.user, title='recipe2')
+        recipe1.ingredient.add(salt)
+        recipe2.ingredient.add(salt)
+        sample_recipe(user=self.user, title='not chosen').ingredient.add(
+            sample_ingredient(user=self.user, name='kale')
+        )
+        other = sample_recipe(user=user2)
+
+        ids = [recipe1.id, recipe2.id, other.id, recipe1.id]
+        with self.assertNumQueries(1):
+            res = self.client.get(
+                SHOPPING_URL,
+                {'ids': ','.join(map(str, ids))}
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        water = sample_ingredient(user=self.user)
+        self.assertEqual(res.data, [
+            {'id': salt.id, 'name': 'salt', 'recipe_count': 2},
+            {'id': water.id, 'name': 'water', 'recipe_count': 2},
+        ])
+
+    def test_shopping_list_too_many_ids(self):
+        """Test the shopping list rejects more recipes than allowed"""
+        with self.settings(RECIPE_SHOPPING_LIST_MAX=2):
+            res = self.client.get(SHOPPING_URL, {'ids': '1,2,3'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_recipes_by_range(self):
+        """Test filtering recipes by time and price ranges"""
+        quick = sample_recipe(user=self.user, time_minutes=10, price=4.00)
+        sample_recipe(user=self.user, time_minutes=45, price=4.00)
+        sample_recipe(user=self.user, time_minutes=20, price=9.00)
+
+        res = self.client.get(
+            RECIPE_URL,
+            {'max_time': 30, 'max_price': '5.00'}
+        )
+
+        self.assertEqual([r['id'] for r in res.data], [quick.id])
+
+        res = self.client.get(RECIPE_URL, {'min_price': 'cheap'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_order_recipes(self):
+        """Test ordering recipes by an indexed field, ties by id"""
+        first = sample_recipe(user=self.user, price=5.00)
+        second = sample_recipe(user=self.user, price=3.00)
+        third = sample_recipe(user=self.user, price=5.00)
+
+        res = self.client.get(RECIPE_URL, {'ordering': 'price'})
+        self.assertEqual([r['id'] for r in res.data],
+                         [second.id, first.id, third.id])
+
+        res = self.client.get(RECIPE_URL, {'ordering': '-price'})
+        self.assertEqual([r['id'] for r in res.data],
+                         [third.id, first.id, second.id])
+
+        res = self.client.get(RECIPE_URL, {'ordering': 'title'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_keyset_pagination(self):
+        """Test paging through recipes from cursor to cursor"""
+        prices = [5.00, 3.00, 5.00, 4.00, 5.00]
+        for price in prices:
+            sample_recipe(user=self.user, price=price)
+        expected = list(
+            Recipe.objects.order_by('price', 'id')
+                          .values_list('id', flat=True)
+        )
+
+        ids = []
+        res = self.client.get(RECIPE_URL, {'ordering': 'price', 'limit': 2})
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            ids += [r['id'] for r in res.data['results']]
+            if res.data['next'] is None:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(ids, expected)
+
+    def test_keyset_cursor_is_index_range(self):
+        """Test the cursor of a later page bounds the index scan"""
+        for price in (5.00, 3.00, 5.00, 4.00):
+            sample_recipe(user=self.user, price=price)
+        res = self.client.get(RECIPE_URL, {'ordering': 'price', 'limit': 2})
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(res.data['next'])
+        page_sql = next(
+            query['sql'] for query in queries.captured_queries
+            if 'ORDER BY "core_recipe"."price"' in query['sql']
+        )
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('EXPLAIN ' + page_sql)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+
+        index_conditions = [
+            line for line in plan.splitlines() if 'Index Cond' in line
+        ]
+        self.assertTrue(
+            any('price >=' in line for line in index_conditions), plan
+        )
+
+    def test_keyset_cursor_bound_to_ordering(self):
+        """Test a cursor cannot be reused with another ordering"""
+        for _ in range(3):
+            sample_recipe(user=self.user)
+        res = self.client.get(RECIPE_URL, {'limit': 1})
+        cursor = parse_qs(urlparse(res.data['next']).query)['cursor'][0]
+        self.assertEqual(
+            self.client.get(RECIPE_URL, {'cursor': cursor}).status_code,
+            status.HTTP_200_OK
+        )
+
+        res = self.client.get(
+            RECIPE_URL,
+            {'cursor': cursor, 'ordering': 'price'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cookable_recipes(self):
+        """Test finding the recipes the given ingredients are enough for"""
+        salt = sample_ingredient(user=self.user, name='salt')
+        beef = sample_ingredient(user=self.user, name='beef')
+        fry = Recipe.objects.create(user=self.user, title='beef fry',
+                                    time_minutes=5, price=5.90)
+        fry.ingredient.add(salt, beef)
+        soup = Recipe.objects.create(user=self.user, title='salt soup',
+                                     time_minutes=5, price=5.90)
+        soup.ingredient.add(salt)
+
+        res = self.client.get(COOKABLE_URL, {'ingredients': salt.id})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['title'] for r in res.data], ['salt soup'])
+
+        res = self.client.get(
+            COOKABLE_URL,
+            {'ingredients': salt.id, 'max_missing': 1}
+        )
+
+        self.assertEqual(
+            [(r['title'], r['missing']) for r in res.data],
+            [('salt soup', []), ('beef fry', [beef.id])]
+        )
+
+    def test_cookable_invalid_params(self):
+        """Test the cookable search rejects malformed parameters"""
+        res = self.client.get(COOKABLE_URL, {'max_missing': '-1'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_delete_recipes(self):
+        """Test deleting many recipes of the user in one request"""
+        recipes = [sample_recipe(user=self.user) for _ in range(3)]
+        other = sample_recipe(user=get_user_model().objects.create_user(
+            'other@pokemail.net',
+            'pass3'
+        ))
+        ids = [recipes[0].id, recipes[1].id, other.id]
+
+        res = self.client.delete(f'{BULK_URL}?ids={",".join(map(str, ids))}')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'deleted': 2, 'missing': [other.id]})
+        self.assertEqual(
+            list(Recipe.objects.order_by('id')),
+            [recipes[2], other]
+        )
+
+    def test_recipe_stats(self):
+        """Test retrieving the running recipe statistics"""
+        sample_recipe(user=self.user, time_minutes=10, price=4.00)
+        recipe = sample_recipe(user=self.user, time_minutes=20, price=5.00)
+        tag = sample_tag(user=self.user, name='curry')
+        recipe.tags.add(tag)
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipe_count'], 2)
+        self.assertEqual(res.data['average_time_minutes'], 15)
+        self.assertEqual(res.data['average_price'], Decimal('4.50'))
+        self.assertEqual(
+            res.data['tags'][-1],
+            {'id': tag.id, 'name': 'curry', 'recipe_count': 1}
+        )
+
+    def test_recipe_stats_without_recipes(self):
+        """Test statistics of a user without recipes"""
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['recipe_count'], 0)
+        self.assertIsNone(res.data['average_price'])
+        self.assertEqual(res.data['tags'], [])
+
+    def test_create_recipe_with_names(self):
+        """Test creating a recipe with tag and ingredient names"""
+        tag = sample_tag(user=self.user, name='curry')
+        payload = {
+            'title': 'chicken curry',
+            'tags': [tag.id],
+            'tag_names': ['curry', 'spicy'],
+            'ingredient_names': ['chicken', 'salt', 'chicken'],
+            'time_minutes': 60,
+            'price': 23.89
+        }
+
+        res = self.client.post(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(
+            sorted(recipe.tags.values_list('name', flat=True)),
+            ['curry', 'spicy']
+        )
+        self.assertEqual(
+            sorted(recipe.ingredient.values_list('name', flat=True)),
+            ['chicken', 'salt']
+        )
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(res.data['tags'], recipe.tag_ids)
+        self.assertNotIn('tag_names', res.data)
+
+    def test_update_recipe_with_names(self):
+        """Test names replace the tags of a recipe like ids do"""
+        recipe = sample_recipe(user=self.user)
+
+        self.client.patch(
+            detail_url(recipe.id),
+            {'tag_names': ['new tag']},
+            format='json'
+        )
+
+        self.assertEqual(
+            list(recipe.tags.values_list('name', flat=True)),
+            ['new tag']
+        )
+
+    def test_create_recipe_resolves_ids_in_one_query(self):
+        """Test tag ids are validated with a single query"""
+        tags = [sample_tag(user=self.user, name=f'tag{i}') for i in range(5)]
+        request = Request(APIRequestFactory().post(RECIPE_URL))
+        request.user = self.user
+        serializer = RecipeSerializer(
+            data={
+                'title': 'soup',
+                'tags': [tag.id for tag in tags],
+                'time_minutes': 5,
+                'price': 2.5
+            },
+            context={'request': request}
+        )
+
+        with self.assertNumQueries(1):
+            self.assertTrue(serializer.is_valid())
+
+    def test_create_recipe_with_foreign_tag(self):
+        """Test linking a tag of another user is rejected"""
+        user2 = get_user_model().objects.create_user(
+            email='test2@pokemail.net',
+            password='pass2'
+        )
+        payload = {
+            'title': 'recipe with tags',
+            'tags': [sample_tag(user=user2).id],
+            'time_minutes': 60,
+            'price': 23.89
+        }
+
+        res = self.client.post(RECIPE_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_recipe_with_invalid_tag_ids(self):
+        """Test ids that are not whole numbers are rejected by type"""
+        tag = sample_tag(user=self.user)
+        for tags, type_name in (([True], 'bool'),
+                                ([tag.id + 0.5], 'float'),
+                                ([tag.id, 'one'], 'str')):
+            payload = {
+                'title': 'recipe with tags',
+                'tags': tags,
+                'time_minutes': 60,
+                'price': 23.89
+            }
+
+            res = self.client.post(RECIPE_URL, payload, format='json')
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(type_name, str(res.data['tags']))
+
+
+class IdempotencyTests(TestCase):
+    """Tests for retrying writes with an Idempotency-Key"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@pokemail.net',
+            'pass3'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.payload = {'title': 'soup', 'time_minutes': 5, 'price': 2.5}
+        cache.clear()
+
+    def test_retry_replays_response(self):
+        """Test a retried create returns the first response"""
+        res1 = self.client.post(RECIPE_URL, self.payload,
+                                HTTP_IDEMPOTENCY_KEY='key1')
+        with self.assertNumQueries(0):
+            res2 = self.client.post(RECIPE_URL, self.payload,
+                                    HTTP_IDEMPOTENCY_KEY='key1')
+
+        self.assertEqual(res2.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res2.data, res1.data)
+        self.assertEqual(res2['Idempotent-Replayed'], 'true')
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_keys_scoped_to_user(self):
+        """Test another user's request with the same key runs"""
+        self.client.post(RECIPE_URL, self.payload,
+                         HTTP_IDEMPOTENCY_KEY='key1')
+        user2 = get_user_model().objects.create_user(
+            'test2@pokemail.net',
+            'pass3'
+        )
+        self.client.force_authenticate(user2)
+        self.client.post(RECIPE_URL, self.payload,
+                         HTTP_IDEMPOTENCY_KEY='key1')
+
+        self.assertEqual(Recipe.objects.count(), 2)
+
+    def test_key_reused_for_other_request(self):
+        """Test a key sent with a different payload is rejected"""
+        self.client.post(RECIPE_URL, self.payload,
+                         HTTP_IDEMPOTENCY_KEY='key1')
+        self.payload['title'] = 'stew'
+        res = self.client.post(RECIPE_URL, self.payload,
+                               HTTP_IDEMPOTENCY_KEY='key1')
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_key_in_flight(self):
+        """Test a retry waiting on a request that does not finish"""
+        self.client.post(RECIPE_URL, self.payload,
+                         HTTP_IDEMPOTENCY_KEY='key1')
+        cache.clear()
+        with patch('django.core.cache.cache.add', return_value=False), \
+                patch('django.core.cache.cache.get', return_value=None), \
+                self.settings(IDEMPOTENCY_WAIT_SECONDS=0):
+            res = self.client.post(RECIPE_URL, self.payload,
+                                   HTTP_IDEMPOTENCY_KEY='key1')
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Recipe.objects.count(), 1)
+
 
 class RecipeImageUploadTests(TestCase):
 
@@ -232,6 +722,67 @@ class RecipeImageUploadTests(TestCase):
         self.assertIn('image', res.data)
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
+    def test_upload_image_retry_replayed(self):
+        """Test a retried upload does not save the image again"""
+        url = image_url(self.recipe.id)
+        cache.clear()
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.new('RGB', (100, 100)).save(ntf, format='JPEG')
+            ntf.seek(0)
+            res1 = self.client.post(url, {'image': ntf}, format='multipart',
+                                    HTTP_IDEMPOTENCY_KEY='upload1')
+            ntf.seek(0)
+            with patch('recipe.serializers.RecipeImageSerializer.save') \
+                    as save:
+                res2 = self.client.post(url, {'image': ntf},
+                                        format='multipart',
+                                        HTTP_IDEMPOTENCY_KEY='upload1')
+
+        save.assert_not_called()
+        self.assertEqual(res2.status_code, status.HTTP_200_OK)
+        self.assertEqual(res2.data, res1.data)
+
+    def _upload(self, size=(100, 100), image_format='JPEG'):
+        url = image_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.new('RGB', size).save(ntf, format=image_format)
+            ntf.seek(0)
+            return self.client.post(url, {'image': ntf}, format='multipart')
+
+    def test_upload_too_large_rejected(self):
+        """Test uploads over the byte limit are refused before saving"""
+        with self.settings(MAX_UPLOAD_SIZE=100):
+            res = self._upload()
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    def test_upload_too_many_pixels_rejected(self):
+        """Test images over the pixel limit are refused undecoded"""
+        with self.settings(MAX_IMAGE_PIXELS=5000):
+            res = self._upload()
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_upload_unsupported_format_rejected(self):
+        """Test images in formats other than the web ones are refused"""
+        res = self._upload(image_format='BMP')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_upload_large_image_downscaled(self):
+        """Test images over the maximum dimension are downscaled"""
+        with self.settings(RECIPE_IMAGE_MAX_DIMENSION=50):
+            res = self._upload(size=(200, 100))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        with Image.open(self.recipe.image.path) as image:
+            self.assertEqual(image.size, (50, 25))
+            self.assertEqual(image.format, 'JPEG')
+
     def test_upload_invalid_image_to_recipe(self):
         """Test uploading invalid image to recipe"""
         url = image_url(self.recipe.id)
@@ -300,3 +851,14 @@ class FilteringTests(TestCase):
         self.assertIn(self.serializer2.data, res.data)
         self.assertNotIn(self.serializer3.data, res.data)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_filter_recipes_matching_many_tags_once(self):
+        """Recipes matching several requested tags are returned once"""
+        self.recipe1.tags.add(self.tag2)
+        res = self.client.get(
+            RECIPE_URL,
+            {'tags': f'{self.tag1.id},{self.tag2.id}'}
+        )
+
+        ids = [recipe['id'] for recipe in res.data]
+        self.assertEqual(sorted(ids), [self.recipe1.id, self.recipe2.id])
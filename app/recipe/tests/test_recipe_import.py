@@ -0,0 +1,161 @@
+import json
+import os
+import tempfile
+from decimal import Decimal
+from io import BytesIO, StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient, UserRecipeStats, \
+                        UserTagStats
+from recipe import imports
+
+
+IMPORT_URL = reverse('recipe:recipe-import-recipes')
+
+
+def ndjson(*rows):
+    """Returns the rows as an NDJSON body, strings are taken as they are"""
+    return '\n'.join(
+        row if isinstance(row, str) else json.dumps(row) for row in rows
+    ).encode()
+
+
+class RecipeImportTests(TestCase):
+    """Test importing recipes from NDJSON and CSV"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@pokemail.net',
+            'pass3'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _import(self, body, content_type='application/x-ndjson'):
+        return self.client.generic('POST', IMPORT_URL, body, content_type)
+
+    def test_import_ndjson(self):
+        """Test valid rows are created and invalid ones reported"""
+        vegan = Tag.objects.create(user=self.user, name='vegan')
+        body = ndjson(
+            {'title': 'soup', 'time_minutes': 20, 'price': '4.50',
+             'tag_names': ['vegan', 'hot'], 'ingredient_names': ['kale']},
+            '',
+            {'title': 'salad', 'time_minutes': 5, 'price': '3.00',
+             'tag_names': ['vegan']},
+            '{"title": ',
+            {'title': 'cake', 'time_minutes': 60, 'price': '1234.00'},
+            '[1, 2]',
+        )
+
+        res = self._import(body)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual((res.data['created'], res.data['failed']), (2, 3))
+        self.assertEqual([error['row'] for error in res.data['errors']],
+                         [4, 5, 6])
+        self.assertIn('price', res.data['errors'][1]['errors'])
+
+        soup = Recipe.objects.get(title='soup')
+        hot = Tag.objects.get(user=self.user, name='hot')
+        kale = Ingredient.objects.get(user=self.user, name='kale')
+        self.assertEqual(soup.tag_ids, sorted([vegan.id, hot.id]))
+        self.assertEqual(list(soup.tags.order_by('id')), [vegan, hot])
+        self.assertEqual(list(soup.ingredient.all()), [kale])
+        stats = UserRecipeStats.objects.get(user=self.user)
+        self.assertEqual((stats.recipe_count, stats.total_price),
+                         (2, Decimal('7.50')))
+        self.assertEqual(
+            UserTagStats.objects.get(tag=vegan).recipe_count,
+            2
+        )
+
+    def test_import_csv(self):
+        """Test CSV rows name their tags and ingredients with ;"""
+        body = (
+            'title,time_minutes,price,link,tag_names,ingredient_names\r\n'
+            'soup,20,4.50,,vegan;hot,kale; salt\r\n'
+            '"pie, apple",40,6.00,http://x.org/pie,,\r\n'
+            'bread,slow,2.00,,,\r\n'
+        ).encode()
+
+        res = self._import(body, 'text/csv')
+
+        self.assertEqual((res.data['created'], res.data['failed']), (2, 1))
+        self.assertEqual(res.data['errors'][0]['row'], 4)
+        self.assertIn('time_minutes', res.data['errors'][0]['errors'])
+        soup = Recipe.objects.get(title='soup')
+        self.assertEqual(
+            sorted(soup.ingredient.values_list('name', flat=True)),
+            ['kale', 'salt']
+        )
+        pie = Recipe.objects.get(title='pie, apple')
+        self.assertEqual((pie.link, pie.tag_ids), ('http://x.org/pie', []))
+
+    def test_import_queries_per_chunk(self):
+        """Test the queries grow with the chunks, not the rows"""
+        def rows(count):
+            return [
+                (i, {'title': f'r{i}', 'time_minutes': 5, 'price': '1.00',
+                     'tag_names': ['vegan', f't{i}']}, None)
+                for i in range(count)
+            ]
+
+        imports.import_recipes(self.user, rows(1), chunk_size=50)
+        with self.assertNumQueries(8):
+            imports.import_recipes(self.user, rows(5), chunk_size=50)
+        with self.assertNumQueries(8):
+            report = imports.import_recipes(self.user, rows(40),
+                                            chunk_size=50)
+
+        self.assertEqual(report['created'], 40)
+        self.assertEqual(Recipe.objects.count(), 46)
+
+    def test_import_limits(self):
+        """Test empty bodies, unknown types and too many rows"""
+        res = self._import(b'')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self._import(b'{}', 'application/xml')
+        self.assertEqual(res.status_code,
+                         status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+        row = {'title': 'soup', 'time_minutes': 20, 'price': '4.50'}
+        with self.settings(IMPORT_MAX_ROWS=2):
+            res = self._import(ndjson(row, row, row))
+        self.assertEqual(res.data['created'], 2)
+        self.assertIn('limit of 2 rows', res.data['aborted'])
+
+    def test_long_line_aborts(self):
+        """Test a line past the length limit stops reading the stream"""
+        stream = BytesIO(b'short\n' + b'x' * 100 + b'\nnever read\n')
+        lines = imports.read_lines(stream, max_length=50)
+
+        self.assertEqual(next(lines), 'short\n')
+        with self.assertRaises(imports.ImportAborted):
+            next(lines)
+
+    def test_import_command(self):
+        """Test importing a file from the command line"""
+        with tempfile.NamedTemporaryFile(suffix='.ndjson',
+                                         delete=False) as file:
+            file.write(ndjson(
+                {'title': 'soup', 'time_minutes': 20, 'price': '4.50'},
+                {'title': '', 'time_minutes': 20, 'price': '4.50'},
+            ))
+        self.addCleanup(os.remove, file.name)
+
+        out = StringIO()
+        call_command('import_recipes', file.name, user=self.user.email,
+                     stdout=out)
+
+        self.assertTrue(Recipe.objects.filter(title='soup').exists())
+        self.assertIn('row 2: {"title"', out.getvalue())
+        self.assertIn('1 recipes created, 1 rows rejected', out.getvalue())
@@ -0,0 +1,212 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient, Recipe, Tombstone
+from recipe.sync import encode_cursor, sync_horizon
+
+
+SYNC_URL = reverse('recipe:sync')
+
+
+def sample_recipe(user, title='test recipe'):
+    """creates a sample recipe"""
+    return Recipe.objects.create(
+        user=user,
+        title=title,
+        time_minutes=3,
+        price=34.82
+    )
+
+
+class PublicSyncApiTests(TestCase):
+
+    def test_login_required(self):
+        """Test that login is required for syncing"""
+        res = APIClient().get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateSyncApiTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@pokemail.net',
+            password='pass3'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _sync(self, cursor=None):
+        res = self.client.get(SYNC_URL, {'since': cursor} if cursor else {})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_expand_constant_queries(self):
+        """Test expanded relations of synced recipes are loaded in one query
+        each for any number of recipes"""
+        tag = Tag.objects.create(user=self.user, name='vegan')
+        ingredient = Ingredient.objects.create(user=self.user, name='salt')
+        for i in range(5):
+            recipe = sample_recipe(self.user, title=f'recipe{i}')
+            recipe.tags.add(tag)
+            recipe.ingredient.add(ingredient)
+
+        with self.assertNumQueries(7):
+            res = self.client.get(SYNC_URL, {'expand': 'tags,ingredient'})
+
+        self.assertEqual(len(res.data['recipes']), 5)
+        for recipe in res.data['recipes']:
+            self.assertEqual(recipe['tags'][0]['name'], 'vegan')
+            self.assertEqual(recipe['ingredient'][0]['name'], 'salt')
+
+    def test_initial_sync_returns_everything(self):
+        """Test syncing without a cursor returns all objects of the user"""
+        tag = Tag.objects.create(user=self.user, name='vegan')
+        Ingredient.objects.create(user=self.user, name='salt')
+        recipe = sample_recipe(self.user)
+        recipe.tags.add(tag)
+        other = get_user_model().objects.create_user(
+            'other@pokemail.net',
+            'pass3'
+        )
+        sample_recipe(other)
+
+        data = self._sync()
+
+        self.assertEqual([t['name'] for t in data['tags']], ['vegan'])
+        self.assertEqual([i['name'] for i in data['ingredients']], ['salt'])
+        self.assertEqual(len(data['recipes']), 1)
+        self.assertEqual(data['recipes'][0]['tags'], [tag.id])
+        self.assertEqual(
+            data['deleted'],
+            {'recipes': [], 'tags': [], 'ingredients': []}
+        )
+        self.assertFalse(data['has_more'])
+
+    def test_sync_returns_changes_since_cursor(self):
+        """Test only changes and deletions after the cursor are returned"""
+        tag = Tag.objects.create(user=self.user, name='vegan')
+        changed = sample_recipe(self.user, 'changed')
+        sample_recipe(self.user, 'unchanged')
+        deleted = sample_recipe(self.user, 'deleted')
+        cursor = self._sync()['cursor']
+
+        changed.title = 'renamed'
+        changed.save()
+        deleted_id, tag_id = deleted.id, tag.id
+        deleted.delete()
+        tag.delete()
+        data = self._sync(cursor)
+
+        self.assertEqual([r['title'] for r in data['recipes']], ['renamed'])
+        self.assertEqual(data['tags'], [])
+        self.assertEqual(data['deleted']['recipes'], [deleted_id])
+        self.assertEqual(data['deleted']['tags'], [tag_id])
+        self.assertEqual(self._sync(data['cursor'])['recipes'], [])
+
+    def test_changes_stamped_by_database_clock(self):
+        """Test a save on a server whose clock lags behind is synced"""
+        tag = Tag.objects.create(user=self.user, name='vegan')
+        recipe = sample_recipe(self.user)
+        cursor = self._sync()['cursor']
+
+        lagging = timezone.now() - timedelta(hours=1)
+        with mock.patch('django.utils.timezone.now', return_value=lagging):
+            tag.name = 'vegetarian'
+            tag.save()
+            recipe.title = 'renamed'
+            recipe.save()
+            Ingredient.objects.create(user=self.user, name='salt')
+            recipe_id = recipe.id
+            recipe.delete()
+        data = self._sync(cursor)
+
+        self.assertEqual([t['name'] for t in data['tags']], ['vegetarian'])
+        self.assertEqual([i['name'] for i in data['ingredients']], ['salt'])
+        self.assertEqual(data['deleted']['recipes'], [recipe_id])
+        self.assertGreater(tag.updated_at, lagging)
+
+    def test_relation_change_included(self):
+        """Test a recipe whose tags changed is synced again"""
+        recipe = sample_recipe(self.user)
+        cursor = self._sync()['cursor']
+
+        recipe.tags.add(Tag.objects.create(user=self.user, name='vegan'))
+        data = self._sync(cursor)
+
+        self.assertEqual(len(data['tags']), 1)
+        self.assertEqual(data['recipes'][0]['tags'], [data['tags'][0]['id']])
+
+    @override_settings(SYNC_PAGE_SIZE=2)
+    def test_sync_paged(self):
+        """Test changes are returned in pages following the cursor"""
+        recipes = [sample_recipe(self.user, str(n)) for n in range(5)]
+
+        synced = []
+        data = {'cursor': None, 'has_more': True}
+        while data['has_more']:
+            data = self._sync(data['cursor'])
+            synced += [r['id'] for r in data['recipes']]
+
+        self.assertEqual(synced, [recipe.id for recipe in recipes])
+
+    def test_invalid_cursor(self):
+        """Test a tampered cursor is rejected"""
+        res = self.client.get(SYNC_URL, {'since': 'garbage'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_expired_cursor(self):
+        """Test a cursor older than the kept deletions must resync"""
+        old = (timezone.now() - timedelta(days=365), 0)
+        cursor = encode_cursor({
+            'tags': old, 'ingredients': old, 'recipes': old, 'deleted': old
+        })
+
+        res = self.client.get(SYNC_URL, {'since': cursor})
+
+        self.assertEqual(res.status_code, status.HTTP_410_GONE)
+
+    def test_deleted_user_leaves_no_tombstones(self):
+        """Test deleting a user removes the tombstones of its objects"""
+        sample_recipe(self.user).tags.add(
+            Tag.objects.create(user=self.user, name='vegan')
+        )
+
+        self.user.delete()
+
+        self.assertFalse(Tombstone.objects.exists())
+
+
+class SyncHorizonTests(TestCase):
+
+    def setUp(self):
+        # a session left idle in an open transaction
+        self.other = connection.copy()
+        self.addCleanup(self.other.close)
+        with self.other.cursor() as cursor:
+            cursor.execute('BEGIN')
+            cursor.execute('SELECT now()')
+            self.started = cursor.fetchone()[0]
+
+    def test_horizon_waits_for_open_transactions(self):
+        """Test the horizon stays before an open transaction's start"""
+        self.assertLessEqual(sync_horizon(DEFAULT_DB_ALIAS), self.started)
+
+    @override_settings(SYNC_HORIZON_MAX_LAG=0)
+    def test_horizon_lag_capped(self):
+        """Test a transaction open too long no longer holds the feed"""
+        with self.assertLogs('recipe.sync', 'WARNING'):
+            horizon = sync_horizon(DEFAULT_DB_ALIAS)
+
+        self.assertGreater(horizon, self.started)
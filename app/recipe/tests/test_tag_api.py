@@ -1,4 +1,7 @@
+from unittest.mock import patch
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
 from django.test import TestCase
 
@@ -10,6 +13,18 @@ from recipe.serializers import TagSerializer
 
 
 TAGS_URL = reverse('recipe:tag-list')
+ASSIGN_URL = reverse('recipe:tag-assign')
+UNASSIGN_URL = reverse('recipe:tag-unassign')
+
+
+def sample_recipe(user, title='test recipe'):
+    """creates a sample recipe"""
+    return Recipe.objects.create(
+        user=user,
+        title=title,
+        time_minutes=3,
+        price=34.82
+    )
 
 
 class PublicTagApiTests(TestCase):
@@ -65,6 +80,14 @@ class PrivateTAGApiTests(TestCase):
         self.assertEqual(res.data[0]['name'], 'vegan')
         self.assertEqual(res.data[1]['name'], 'desert')
 
+    def test_retrieve_tags_sparse_fields(self):
+        """Test ?fields= limits the fields of listed tags"""
+        tag = Tag.objects.create(user=self.user, name='vegan')
+
+        res = self.client.get(TAGS_URL, {'fields': 'id'})
+
+        self.assertEqual(res.data, [{'id': tag.id}])
+
     def test_create_tags(self):
         """test creating tags"""
         payload = {'name': 'test tag'}
@@ -77,6 +100,36 @@ class PrivateTAGApiTests(TestCase):
         ).exists()
         self.assertTrue(exists)
 
+    def test_create_tag_retry_replayed(self):
+        """test retrying a tag create with an Idempotency-Key"""
+        cache.clear()
+        res1 = self.client.post(TAGS_URL, {'name': 'vegan'},
+                                HTTP_IDEMPOTENCY_KEY='tag1')
+        res2 = self.client.post(TAGS_URL, {'name': 'vegan'},
+                                HTTP_IDEMPOTENCY_KEY='tag1')
+
+        self.assertEqual(res2.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res2.data, res1.data)
+
+    def test_create_tag_duplicate_name(self):
+        """test creating a tag with a name the user already has"""
+        Tag.objects.create(user=self.user, name='vegan')
+        res = self.client.post(TAGS_URL, {'name': 'vegan'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_tag_duplicate_name_race(self):
+        """test a duplicate name passing validation concurrently is still
+        rejected as invalid"""
+        Tag.objects.create(user=self.user, name='vegan')
+        with patch.object(TagSerializer, 'validate_name',
+                          side_effect=lambda name: name):
+            res = self.client.post(TAGS_URL, {'name': 'vegan'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('name', res.data)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+
     def test_crete_tag_invalid(self):
         """test creating tag with invalid data"""
         payload = {'name': ''}
@@ -107,3 +160,62 @@ class PrivateTAGApiTests(TestCase):
 
         self.assertIn(serializer1.data, res.data)
         self.assertNotIn(serializer2.data, res.data)
+
+    def test_assign_tags_to_many_recipes(self):
+        """test attaching tags to many recipes in one call"""
+        tag1 = Tag.objects.create(user=self.user, name='tag1')
+        tag2 = Tag.objects.create(user=self.user, name='tag2')
+        recipe1 = sample_recipe(self.user, 'recipe1')
+        recipe2 = sample_recipe(self.user, 'recipe2')
+        recipe1.tags.add(tag1)
+
+        payload = {'recipes': [recipe1.id, recipe2.id],
+                   'tags': [tag1.id, tag2.id]}
+        res = self.client.post(ASSIGN_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'added': 3, 'recipes': 2})
+        self.assertEqual(recipe1.tags.count(), 2)
+        self.assertEqual(recipe2.tags.count(), 2)
+
+    def test_assign_tags_limited_to_user(self):
+        """test assigning ignores recipes and tags of other users"""
+        user2 = get_user_model().objects.create_user(
+            email='test2@pokemail.net',
+            password='pass5'
+        )
+        tag = Tag.objects.create(user=self.user, name='tag1')
+        other_tag = Tag.objects.create(user=user2, name='tag2')
+        recipe = sample_recipe(self.user)
+        other_recipe = sample_recipe(user2)
+
+        payload = {'recipes': [recipe.id, other_recipe.id],
+                   'tags': [tag.id, other_tag.id]}
+        res = self.client.post(ASSIGN_URL, payload, format='json')
+
+        self.assertEqual(res.data, {'added': 1, 'recipes': 1})
+        self.assertEqual(list(recipe.tags.all()), [tag])
+        self.assertEqual(other_recipe.tags.count(), 0)
+
+    def test_unassign_tags_from_many_recipes(self):
+        """test detaching tags from many recipes in one call"""
+        tag1 = Tag.objects.create(user=self.user, name='tag1')
+        tag2 = Tag.objects.create(user=self.user, name='tag2')
+        recipe1 = sample_recipe(self.user, 'recipe1')
+        recipe2 = sample_recipe(self.user, 'recipe2')
+        recipe1.tags.add(tag1, tag2)
+        recipe2.tags.add(tag1)
+
+        payload = {'recipes': [recipe1.id, recipe2.id], 'tags': [tag1.id]}
+        res = self.client.post(UNASSIGN_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'removed': 2, 'recipes': 2})
+        self.assertEqual(list(recipe1.tags.all()), [tag2])
+        self.assertEqual(recipe2.tags.count(), 0)
+
+    def test_assign_tags_invalid(self):
+        """test assigning without recipes fails"""
+        res = self.client.post(ASSIGN_URL, {'tags': [1]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
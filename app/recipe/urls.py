@@ -1,7 +1,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from recipe.views import TagViewSet, IngredientViewSet, RecipeViewSet
+from recipe.views import TagViewSet, IngredientViewSet, RecipeViewSet, \
+                         SyncView
 
 
 app_name = 'recipe'
@@ -13,4 +14,5 @@ router.register('recipe', RecipeViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('sync/', SyncView.as_view(), name='sync'),
 ]
@@ -1,14 +1,99 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Count, Prefetch, prefetch_related_objects
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.views import APIView
 from rest_framework import viewsets, mixins, status
 from rest_framework import authentication, permissions
-from core.models import Tag, Ingredient, Recipe
+from core.canonical import normalize_name
+from core.deletion import delete_recipes
+from core.idempotency import idempotent
+from core.ingredient_index import index_cache
+from core.models import Tag, Ingredient, Recipe, UserRecipeStats, \
+                        CanonicalIngredient
+from core.relations import attach_relations, detach_relations
 from recipe.serializers import TagSerializer, IngredientSerializer
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
-from recipe import serializers
+from recipe import imports, serializers
+from recipe.pagination import KeysetPagination
+from recipe.sync import changes_since
 
 
-class TagViewSet(viewsets.GenericViewSet,
+def relation_prefetches(names):
+    """Returns the prefetches loading each named recipe relation in one
+    query"""
+    prefetches = []
+    for name in names:
+        model = Recipe._meta.get_field(name).related_model
+        prefetches.append(
+            Prefetch(name, queryset=model.objects.order_by('id'))
+        )
+    return prefetches
+
+
+def expansion_prefetches(request):
+    """Returns the prefetches of the relations ?expand= inlines"""
+    return relation_prefetches(
+        serializers.requested_expansions(request) &
+        set(RecipeSerializer.expandable_fields)
+    )
+
+
+class SparseFieldsMixin:
+    """Loads only the columns the ?fields= of a read serializes"""
+
+    sparse_field_actions = ('list', 'retrieve')
+
+    def narrow_queryset(self, queryset):
+        fields = serializers.requested_fields(self.request)
+        if fields is None or self.action not in self.sparse_field_actions:
+            return queryset
+        columns = self.get_serializer_class().columns_for(fields)
+        return queryset.only(*columns)
+
+
+class RecipeAssignmentMixin:
+    """Attach or detach objects to or from many recipes at once"""
+    recipe_relation = None
+    assignment_field = None
+    assignment_serializer_class = None
+
+    def get_serializer_class(self):
+        if self.action in ('assign', 'unassign'):
+            return self.assignment_serializer_class
+        return super().get_serializer_class()
+
+    def _change_assignment(self, request, change, count_key):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = change(
+            request.user,
+            self.recipe_relation,
+            serializer.validated_data['recipes'],
+            serializer.validated_data[self.assignment_field]
+        )
+
+        return Response(
+            {count_key: len(recipe_ids), 'recipes': len(set(recipe_ids))},
+            status=status.HTTP_200_OK
+        )
+
+    @action(methods=['POST'], detail=False)
+    def assign(self, request):
+        """attach the given objects to the given recipes"""
+        return self._change_assignment(request, attach_relations, 'added')
+
+    @action(methods=['POST'], detail=False)
+    def unassign(self, request):
+        """detach the given objects from the given recipes"""
+        return self._change_assignment(request, detach_relations, 'removed')
+
+
+class TagViewSet(SparseFieldsMixin,
+                 RecipeAssignmentMixin,
+                 viewsets.GenericViewSet,
                  mixins.ListModelMixin,
                  mixins.CreateModelMixin):
     """Manage tags in the database"""
@@ -16,20 +101,29 @@ class TagViewSet(viewsets.GenericViewSet,
     permission_classes = (permissions.IsAuthenticated,)
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    recipe_relation = 'tags'
+    assignment_field = 'tags'
+    assignment_serializer_class = serializers.TagAssignmentSerializer
 
     def get_queryset(self):
         assigned_only = bool(self.request.query_params.get('assigned_only'))
-        queryset = self.queryset
+        queryset = self.narrow_queryset(self.queryset)
         if assigned_only:
             queryset = queryset.filter(recipe__isnull=False)
 
         return queryset.filter(user=self.request.user).order_by('-name')
 
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
 
-class IngredientViewSet(viewsets.GenericViewSet,
+class IngredientViewSet(SparseFieldsMixin,
+                        RecipeAssignmentMixin,
+                        viewsets.GenericViewSet,
                         mixins.ListModelMixin,
                         mixins.CreateModelMixin):
     """Manage Ingredient in the database"""
@@ -37,57 +131,294 @@ class IngredientViewSet(viewsets.GenericViewSet,
     permission_classes = (permissions.IsAuthenticated,)
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
+    recipe_relation = 'ingredient'
+    assignment_field = 'ingredients'
+    assignment_serializer_class = serializers.IngredientAssignmentSerializer
 
     def get_queryset(self):
         assigned_only = bool(self.request.query_params.get('assigned_only'))
-        queryset = self.queryset
+        queryset = self.narrow_queryset(self.queryset)
         if assigned_only:
             queryset = queryset.filter(recipe__isnull=False)
 
         return queryset.filter(user=self.request.user).order_by('-name')
 
+    def get_serializer_class(self):
+        if self.action in ('popular', 'search'):
+            return serializers.CanonicalIngredientSerializer
+        return super().get_serializer_class()
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def _catalogue(self, queryset):
+        """Serializes the most used canonical ingredients of the queryset,
+        names too rare to be shared by several users are left out"""
+        queryset = queryset.filter(
+            alias_count__gte=settings.INGREDIENT_CATALOGUE_MIN_ALIASES
+        ).order_by('-alias_count', 'name')
+        serializer = self.get_serializer(
+            queryset[:settings.INGREDIENT_CATALOGUE_MAX],
+            many=True
+        )
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @action(methods=['GET'], detail=False)
+    def popular(self, request):
+        """return the ingredient names most users have"""
+        return self._catalogue(CanonicalIngredient.objects.all())
+
+    @action(methods=['GET'], detail=False)
+    def search(self, request):
+        """return the popular ingredient names starting with ?q="""
+        query = normalize_name(request.query_params.get('q', ''))
+        if not query:
+            raise ValidationError({'q': 'This parameter is required.'})
+        return self._catalogue(
+            CanonicalIngredient.objects.filter(name__startswith=query)
+        )
 
-class RecipeViewSet(viewsets.ModelViewSet):
+
+class RecipeViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     """Manage Recipe in database"""
     serializer_class = RecipeSerializer
     queryset = Recipe.objects.all()
     authentication_classes = (authentication.TokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
+    sparse_field_actions = ('list', 'retrieve', 'multi_get')
+    pagination_class = KeysetPagination
+    # query parameter: lookup, each backed by a (user, field, id) index
+    range_filters = {
+        'min_time': 'time_minutes__gte',
+        'max_time': 'time_minutes__lte',
+        'min_price': 'price__gte',
+        'max_price': 'price__lte',
+    }
+    ordering_fields = ('id', 'time_minutes', 'price')
 
     def _params_to_ints(self, qs):
         """converts string list to int list"""
         return [int(str_id) for str_id in qs.split(',')]
 
+    def _range_filters(self):
+        """converts the range parameters to validated lookups"""
+        lookups = {}
+        for param, lookup in self.range_filters.items():
+            value = self.request.query_params.get(param)
+            if value is None:
+                continue
+            field = Recipe._meta.get_field(lookup.split('__')[0])
+            try:
+                lookups[lookup] = field.to_python(value)
+            except DjangoValidationError:
+                raise ValidationError({param: 'Expected a number.'})
+        return lookups
+
+    def _ordering(self):
+        """returns the requested ordering with id breaking ties"""
+        ordering = self.request.query_params.get('ordering', '-id')
+        field = ordering.lstrip('-')
+        if field not in self.ordering_fields or ordering.count('-') > 1:
+            fields = ', '.join(self.ordering_fields)
+            raise ValidationError({
+                'ordering': f'Expected one of {fields}, optionally prefixed '
+                            f'with -.'
+            })
+        if field == 'id':
+            return (ordering,)
+        return (ordering, ordering.replace(field, 'id'))
+
+    def _requested_ids(self, maximum):
+        """returns the distinct ?ids= of the request in their order"""
+        try:
+            ids = self._params_to_ints(
+                self.request.query_params.get('ids', '')
+            )
+        except ValueError:
+            raise ValidationError({'ids': 'Expected comma separated ids.'})
+        ids = list(dict.fromkeys(ids))
+        if len(ids) > maximum:
+            raise ValidationError({'ids': f'At most {maximum} ids.'})
+        return ids
+
     def get_queryset(self):
         """"Retrieving the recipes for the authenticated user"""
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
-        queryset = self.queryset
+        queryset = self.narrow_queryset(self.queryset)
+        if self.action == 'list':
+            queryset = queryset.prefetch_related(
+                *expansion_prefetches(self.request)
+            )
 
         if tags:
             tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            queryset = queryset.filter(tag_ids__overlap=tag_ids)
         if ingredients:
             ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredient__id__in=ingredient_ids)
+            queryset = queryset.filter(
+                ingredient_ids__overlap=ingredient_ids
+            )
 
-        return queryset.filter(user=self.request.user).order_by('-id')
+        queryset = queryset.filter(**self._range_filters())
+
+        return queryset.filter(user=self.request.user) \
+                       .order_by(*self._ordering())
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""
-        if self.action == 'retrieve':
+        if self.action in ('retrieve', 'multi_get'):
             return RecipeDetailSerializer
         elif self.action == 'upload_image':
             return serializers.RecipeImageSerializer
+        elif self.action == 'stats':
+            return serializers.RecipeStatsSerializer
         return self.serializer_class
 
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(methods=['GET'], detail=False)
+    def stats(self, request):
+        """return the running recipe statistics of the user"""
+        stats = UserRecipeStats.objects.filter(user=request.user).first()
+        if stats is None:
+            stats = UserRecipeStats(user=request.user)
+        serializer = self.get_serializer(stats)
+
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @action(methods=['GET'], detail=False, url_path='multi')
+    def multi_get(self, request):
+        """return the details of many recipes in the requested order"""
+        ids = self._requested_ids(settings.RECIPE_MULTI_GET_MAX)
+
+        fields = serializers.requested_fields(request) or {'tags',
+                                                           'ingredient'}
+        queryset = self.get_queryset().filter(id__in=ids).prefetch_related(
+            *relation_prefetches(fields & {'tags', 'ingredient'})
+        )
+        recipes = {recipe.id: recipe for recipe in queryset}
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in ids if pk in recipes],
+            many=True
+        )
+
+        return Response(
+            {
+                'results': serializer.data,
+                'missing': [pk for pk in ids if pk not in recipes],
+            },
+            status=status.HTTP_200_OK
+        )
+
+    @action(methods=['GET'], detail=False, url_path='shopping-list')
+    def shopping_list(self, request):
+        """return the distinct ingredients of the given recipes with the
+        number of recipes needing each, grouped in one query"""
+        ids = self._requested_ids(settings.RECIPE_SHOPPING_LIST_MAX)
+
+        rows = Recipe.ingredient.through.objects.filter(
+            recipe__user=request.user,
+            recipe_id__in=ids
+        ).values('ingredient_id', 'ingredient__name').annotate(
+            recipe_count=Count('recipe_id')
+        ).order_by('ingredient__name', 'ingredient_id')
+
+        return Response(
+            [
+                {'id': row['ingredient_id'], 'name': row['ingredient__name'],
+                 'recipe_count': row['recipe_count']}
+                for row in rows
+            ],
+            status=status.HTTP_200_OK
+        )
+
+    @action(methods=['GET'], detail=False)
+    def cookable(self, request):
+        """return the recipes the given ingredients are enough for, fewest
+        missing ingredients first"""
+        ingredients = request.query_params.get('ingredients')
+        try:
+            ingredient_ids = self._params_to_ints(ingredients) \
+                if ingredients else []
+        except ValueError:
+            raise ValidationError({
+                'ingredients': 'Expected comma separated ids.'
+            })
+        try:
+            max_missing = int(request.query_params.get('max_missing', 0))
+        except ValueError:
+            max_missing = -1
+        if max_missing < 0:
+            raise ValidationError({'max_missing': 'Expected a count.'})
+
+        matches = index_cache.get(request.user.id).cookable(
+            ingredient_ids,
+            max_missing,
+            settings.RECIPE_COOKABLE_MAX
+        )
+        recipes = Recipe.objects.filter(
+            user=request.user,
+            id__in=[recipe_id for recipe_id, missing in matches]
+        ).prefetch_related(*expansion_prefetches(request)).in_bulk()
+        results = []
+        for recipe_id, missing in matches:
+            if recipe_id in recipes:
+                data = self.get_serializer(recipes[recipe_id]).data
+                data['missing'] = missing
+                results.append(data)
+
+        return Response(results, status=status.HTTP_200_OK)
+
+    @action(methods=['DELETE'], detail=False, url_path='bulk')
+    def bulk_delete(self, request):
+        """delete many recipes with set based statements"""
+        ids = self._requested_ids(settings.RECIPE_BULK_DELETE_MAX)
+
+        deleted = set(delete_recipes(request.user.id, ids))
+
+        return Response(
+            {
+                'deleted': len(deleted),
+                'missing': [pk for pk in ids if pk not in deleted],
+            },
+            status=status.HTTP_200_OK
+        )
+
+    @action(methods=['POST'], detail=False, url_path='import',
+            parser_classes=(imports.NDJSONStreamParser,
+                            imports.CSVStreamParser))
+    def import_recipes(self, request):
+        """create recipes from an NDJSON or CSV body parsed as it streams
+        in, returns the rows that were rejected and why"""
+        if not hasattr(request.data, 'readline'):
+            raise ValidationError({'detail': 'The request body is empty.'})
+        rows = imports.parse_rows(
+            imports.read_lines(request.data),
+            request.negotiator.select_parser(
+                request,
+                request.parsers
+            ).format
+        )
+        report = imports.import_recipes(
+            request.user,
+            rows,
+            max_rows=settings.IMPORT_MAX_ROWS
+        )
+
+        return Response(report, status=status.HTTP_200_OK)
+
     @action(methods=['POST'], detail=True, url_path='upload-image')
+    @idempotent
     def upload_image(self, request, pk=None):
         """upload an image to a recipe"""
         recipe = self.get_object()
@@ -106,3 +437,40 @@ class RecipeViewSet(viewsets.ModelViewSet):
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
         )
+
+
+class SyncView(APIView):
+    """Return the objects changed and deleted since a sync cursor"""
+    authentication_classes = (authentication.TokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get(self, request):
+        changes, cursor, has_more = changes_since(
+            request.user,
+            request.query_params.get('since') or None
+        )
+        prefetch_related_objects(
+            changes['recipes'], *expansion_prefetches(request)
+        )
+        context = {'request': request}
+        deleted = {'recipes': [], 'tags': [], 'ingredients': []}
+        for tombstone in changes['deleted']:
+            deleted[tombstone.kind + 's'].append(tombstone.object_id)
+
+        return Response(
+            {
+                'tags': TagSerializer(
+                    changes['tags'], many=True, context=context
+                ).data,
+                'ingredients': IngredientSerializer(
+                    changes['ingredients'], many=True, context=context
+                ).data,
+                'recipes': RecipeSerializer(
+                    changes['recipes'], many=True, context=context
+                ).data,
+                'deleted': deleted,
+                'cursor': cursor,
+                'has_more': has_more,
+            },
+            status=status.HTTP_200_OK
+        )
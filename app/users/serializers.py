@@ -2,6 +2,8 @@ from django.contrib.auth import get_user_model, authenticate
 from rest_framework import serializers
 from django.utils.translation import ugettext_lazy as _
 
+from core.models import Job
+
 
 class UsersSerializer(serializers.ModelSerializer):
     """Serializer for users object"""
@@ -55,3 +57,39 @@ class AuthTokenSerializer(serializers.Serializer):
 
         attrs['user'] = user
         return attrs
+
+
+class DeletionJobSerializer(serializers.ModelSerializer):
+    """Serializer for the progress of an account deletion job"""
+    # the deletion status names of before deletions ran as queued jobs
+    status_names = {Job.QUEUED: 'pending'}
+
+    status = serializers.SerializerMethodField()
+    total = serializers.SerializerMethodField()
+    deleted = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = ('id', 'status', 'total', 'deleted', 'created_at',
+                  'finished_at')
+        read_only_fields = fields
+
+    def get_status(self, job):
+        return self.status_names.get(job.status, job.status)
+
+    def get_total(self, job):
+        return job.payload.get('total', 0)
+
+    def get_deleted(self, job):
+        return (job.result or {}).get('deleted', 0)
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """Serializer for the status of a background job"""
+
+    class Meta:
+        model = Job
+        fields = ('id', 'task', 'status', 'priority', 'attempts',
+                  'max_attempts', 'run_at', 'result', 'created_at',
+                  'finished_at')
+        read_only_fields = fields
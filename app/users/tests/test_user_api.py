@@ -5,10 +5,13 @@ from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core.models import Job
+
 
 CREATE_USER_API = reverse('users:create')
 TOKEN_URL = reverse('users:token')
 ME_URL = reverse('users:me')
+JOBS_URL = reverse('users:jobs')
 
 
 def create_user(**params):
@@ -137,3 +140,37 @@ class PrivateUserAPITests(TestCase):
         self.assertEqual(self.user.email, payload['email'])
         self.assertEqual(self.user.name, payload['name'])
         self.assertTrue(self.user.check_password(payload['password']))
+
+    def test_delete_user_starts_deletion(self):
+        """Test deleting the user deactivates it and reports progress"""
+        res = self.client.delete(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        job = Job.objects.get(task='delete_account', user=self.user)
+        self.assertEqual(res.data['id'], str(job.id))
+
+        res = APIClient().get(reverse('users:deletion', args=[job.id]))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['status'], 'pending')
+        self.assertEqual(res.data['deleted'], 0)
+
+    def test_job_status(self):
+        """Test listing and retrieving the user's own background jobs"""
+        other = create_user(email='other@pokemail.net', password='pass3')
+        job = Job.objects.create(user=self.user, task='delete_account')
+        Job.objects.create(user=self.user, task='export', status=Job.DONE)
+        other_job = Job.objects.create(user=other, task='delete_account')
+
+        res = self.client.get(JOBS_URL, {'status': Job.QUEUED})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['id'] for row in res.data], [str(job.id)])
+
+        res = self.client.get(reverse('users:job', args=[job.id]))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['status'], Job.QUEUED)
+
+        res = self.client.get(reverse('users:job', args=[other_job.id]))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -8,4 +8,11 @@ urlpatterns = [
     path('create', views.CreateUsersView.as_view(), name='create'),
     path('token', views.CreateTokenView.as_view(), name='token'),
     path('me', views.ManageUserView.as_view(), name='me'),
+    path(
+        'deletion/<uuid:pk>',
+        views.DeletionJobView.as_view(),
+        name='deletion'
+    ),
+    path('jobs', views.JobListView.as_view(), name='jobs'),
+    path('jobs/<uuid:pk>', views.JobView.as_view(), name='job'),
 ]
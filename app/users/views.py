@@ -1,5 +1,10 @@
-from rest_framework import generics, authentication, permissions
-from users.serializers import UsersSerializer, AuthTokenSerializer
+from django.conf import settings
+from rest_framework import generics, authentication, permissions, status
+from rest_framework.response import Response
+from core.deletion import request_account_deletion
+from core.models import Job
+from users.serializers import UsersSerializer, AuthTokenSerializer, \
+                              DeletionJobSerializer, JobSerializer
 from rest_framework.settings import api_settings
 from rest_framework.authtoken.views import ObtainAuthToken
 
@@ -16,7 +21,7 @@ class CreateTokenView(ObtainAuthToken):
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(generics.RetrieveUpdateDestroyAPIView):
     """Manage authenticated user model"""
     serializer_class = UsersSerializer
     authentication_classes = (authentication.TokenAuthentication,)
@@ -25,3 +30,41 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
     def get_object(self):
         """get and return authenticated user"""
         return self.request.user
+
+    def destroy(self, request, *args, **kwargs):
+        """deactivate the user and delete the account in the background"""
+        job = request_account_deletion(self.get_object())
+        serializer = DeletionJobSerializer(job)
+
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+
+class DeletionJobView(generics.RetrieveAPIView):
+    """Report the progress of an account deletion, the deleted user can no
+    longer authenticate so the unguessable job id is the credential"""
+    serializer_class = DeletionJobSerializer
+    queryset = Job.objects.filter(task='delete_account')
+
+
+class JobListView(generics.ListAPIView):
+    """List the latest background jobs of the authenticated user"""
+    serializer_class = JobSerializer
+    authentication_classes = (authentication.TokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get_queryset(self):
+        queryset = Job.objects.filter(user=self.request.user)
+        status = self.request.query_params.get('status')
+        if status:
+            queryset = queryset.filter(status=status)
+        return queryset.order_by('-created_at')[:settings.JOB_LIST_MAX]
+
+
+class JobView(generics.RetrieveAPIView):
+    """Report the status of a background job of the authenticated user"""
+    serializer_class = JobSerializer
+    authentication_classes = (authentication.TokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get_queryset(self):
+        return Job.objects.filter(user=self.request.user)